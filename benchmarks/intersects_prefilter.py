@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Compares BoolUtils.intersects, which rejects or accepts most candidates with bounding box, distance and point
+classification checks, with computing the boolean common of every candidate.
+
+    python3 benchmarks/intersects_prefilter.py --iterations 50
+"""
+import argparse
+import time
+import typing
+
+import OCC.Core.BRepAlgoAPI
+
+import ezocc.occutils_python as op
+from ezocc.part_manager import Part, PartFactory, NoOpPartCache
+
+
+def _time_per_call(fn: typing.Callable[[], typing.Any], iterations: int) -> float:
+    """
+    @return: mean wall time of fn, in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+
+    return (time.perf_counter() - start) * 1e6 / iterations
+
+
+def _common_is_empty(part: Part, other: Part) -> bool:
+    return op.InterrogateUtils.is_empty_compound(OCC.Core.BRepAlgoAPI.BRepAlgoAPI_Common(part.shape, other.shape).Shape())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    factory = PartFactory(NoOpPartCache.instance())
+    part = factory.cylinder(5, 10)
+
+    candidates = {
+        "disjoint": part.tr.mv(dx=50),
+        "near": part.tr.mv(dx=10.5),
+        "touching": part.tr.mv(dz=10),
+        "overlapping": part.tr.mv(dx=3, dz=3),
+        "edge inside": factory.x_line(30).tr.mv(-15, 0, 5)
+    }
+
+    print(f"{'candidate':<14} {'intersects (us)':>16} {'common (us)':>16}")
+
+    for name, other in candidates.items():
+        intersects_us = _time_per_call(lambda: op.BoolUtils.intersects(part.shape, other.shape), args.iterations)
+        common_us = _time_per_call(lambda: _common_is_empty(part, other), args.iterations)
+
+        print(f"{name:<14} {intersects_us:>16.1f} {common_us:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
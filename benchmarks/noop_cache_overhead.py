@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Measures the per-operation overhead of the cache machinery for fluent Part calls, with the no-op cache (where token
+arguments are never evaluated) and with an in-memory cache.
+
+    python3 benchmarks/noop_cache_overhead.py --iterations 2000
+"""
+import argparse
+import time
+import typing
+
+import OCC.Core.gp
+
+from ezocc.part_cache import InMemoryPartCache
+from ezocc.part_manager import PartCache, PartFactory, NoOpPartCache
+
+
+def _time_per_call(fn: typing.Callable[[], typing.Any], iterations: int) -> float:
+    """
+    @return: mean wall time of fn, in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+
+    return (time.perf_counter() - start) * 1e6 / iterations
+
+
+def _trsf_token_args(trsf: OCC.Core.gp.gp_Trsf) -> typing.List:
+    return ["trsf"] + [trsf.Value(int(i / 4) + 1, i % 4 + 1) for i in range(0, 12)]
+
+
+def benchmark_cache(name: str, cache: PartCache, iterations: int):
+    part = PartFactory(cache).vertex(0, 0, 0)
+    token = part.cache_token
+
+    trsf = OCC.Core.gp.gp_Trsf()
+    trsf.SetTranslation(OCC.Core.gp.gp_Vec(1, 0, 0))
+
+    # token creation alone: eagerly evaluated arguments, as before lazy token arguments, vs lazily evaluated ones
+    eager_us = _time_per_call(lambda: token.mutated(*_trsf_token_args(trsf)), iterations)
+    lazy_us = _time_per_call(lambda: token.mutated_lazy(lambda: _trsf_token_args(trsf)), iterations)
+
+    # a full fluent call, including the transform itself
+    translate_us = _time_per_call(lambda: part.tr.mv(dx=1), iterations)
+
+    print(f"{name:<10} {eager_us:>14.2f} {lazy_us:>14.2f} {translate_us:>14.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'cache':<10} {'eager (us)':>14} {'lazy (us)':>14} {'tr.mv (us)':>14}")
+
+    benchmark_cache("no-op", NoOpPartCache.instance(), args.iterations)
+
+    # repeated calls hit the cache after the first, so tr.mv measures the token and lookup cost rather than the transform
+    benchmark_cache("in-memory", InMemoryPartCache(), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
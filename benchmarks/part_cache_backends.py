@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compares save/load times and file sizes of the part cache backends (OCAF documents vs the binary part format), using
+the parts built by the examples.
+
+    python3 benchmarks/part_cache_backends.py --repeats 5
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import typing
+
+from examples import bolt, enclosure, chess_piece, gears, dish
+
+from ezocc.part_cache import InMemoryPartCache, PartCacheBackend
+from ezocc.part_manager import Part, NoOpPartCache
+
+EXAMPLES = [bolt, enclosure, chess_piece, gears, dish]
+
+
+def _time(fn: typing.Callable[[], typing.Any], repeats: int) -> float:
+    """
+    @return: median wall time of fn, in milliseconds
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(timings)
+
+
+def _load_fully(backend: PartCacheBackend, path: str) -> Part:
+    part = backend.load(path, NoOpPartCache.instance())
+
+    # labelled subshapes are loaded lazily, touch them so the full load is measured
+    for _ in part.subshapes.items():
+        pass
+
+    return part
+
+
+def benchmark_part(name: str, part: Part, directory: str, repeats: int):
+    for backend in PartCacheBackend:
+        path = os.path.join(directory, f"{name}_{backend.value}")
+        layout = backend.layout(directory)
+
+        save_ms = _time(lambda: backend.save(part, path), repeats)
+        load_root_ms = _time(lambda: backend.load(path, NoOpPartCache.instance()).shape, repeats)
+        load_full_ms = _time(lambda: _load_fully(backend, path), repeats)
+        size_kb = os.path.getsize(path + layout.part_extension) / 1024
+
+        print(f"{name:<14} {backend.value:<8} {save_ms:>10.1f} {load_root_ms:>14.1f} {load_full_ms:>14.1f} "
+              f"{size_kb:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'part':<14} {'backend':<8} {'save (ms)':>10} {'load root (ms)':>14} {'load all (ms)':>14} "
+          f"{'size (kB)':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for example in EXAMPLES:
+            part = example.build(InMemoryPartCache())
+            benchmark_part(example.FILENAME, part, directory, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,14 @@
 %include "std_string.i"
 %include "/third_party/pythonocc-core/src/SWIG_files/common/OccHandle.i"
 
-%module(package="ocaf_wrapper") ocaf_wrapper
+%module(package="ocaf_wrapper", threads="1") ocaf_wrapper
 %feature("flatnested", "1");
 %feature("autodoc", "1");
+
+// the GIL is only released while loading/saving documents, so parts can be loaded on background threads
+%feature("nothread");
+%feature("nothread", "0") OcafWrapper::load;
+%feature("nothread", "0") OcafWrapper::save;
 %{
 #include <ocaf_wrapper.h>
 %}
@@ -0,0 +1,204 @@
+#ifndef BINARY_PART_H
+#define BINARY_PART_H
+
+#include <BinTools.hxx>
+#include <TopAbs_Orientation.hxx>
+#include <TopExp.hxx>
+#include <TopTools_IndexedMapOfShape.hxx>
+#include <TopoDS_Shape.hxx>
+#include <cstdint>
+#include <fstream>
+#include <istream>
+#include <streambuf>
+#include <optional>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+/**
+ * Reads/writes the binary part file format:
+ *
+ *  - 4 byte magic ("EZPB") and 4 byte format version
+ *  - 8 byte header length, followed by the header. The header is opaque to this class (ezocc stores JSON).
+ *  - the root shape, written with BinTools
+ *
+ * Subshapes are not written separately. Instead they are referred to by their index in the TopTools_IndexedMapOfShape
+ * of the root shape (see subshape_indices) and their orientation, so shared topology is only stored once.
+ **/
+class BinaryPartWrapper {
+public:
+    static constexpr char MAGIC[4] = { 'E', 'Z', 'P', 'B' };
+
+    static constexpr uint32_t VERSION = 1;
+
+    /**
+     * @return the 1-based index of each shape in the indexed map of root, or 0 if the shape is not a subshape of root
+     **/
+    static std::vector<int> subshape_indices(const TopoDS_Shape& root, const std::vector<TopoDS_Shape>& shapes) {
+        TopTools_IndexedMapOfShape map;
+        TopExp::MapShapes(root, map);
+
+        std::vector<int> result;
+        result.reserve(shapes.size());
+
+        for (const TopoDS_Shape& shape : shapes) {
+            result.push_back(map.FindIndex(shape));
+        }
+
+        return result;
+    }
+
+    static void write(const std::string& path, const std::string& header, const TopoDS_Shape& root) {
+        std::ofstream stream(path, std::ios::out | std::ios::binary | std::ios::trunc);
+
+        if (!stream) {
+            throw std::runtime_error("Could not open binary part file for writing: " + path);
+        }
+
+        uint64_t header_length = header.size();
+
+        stream.write(MAGIC, sizeof(MAGIC));
+        stream.write(reinterpret_cast<const char*>(&VERSION), sizeof(VERSION));
+        stream.write(reinterpret_cast<const char*>(&header_length), sizeof(header_length));
+        stream.write(header.data(), header.size());
+
+        BinTools::Write(root, stream);
+
+        stream.flush();
+        if (!stream) {
+            throw std::runtime_error("Failed to write binary part file: " + path);
+        }
+    }
+};
+
+/**
+ * Read-only stream buffer over a block of memory, so parts can be read from e.g. a memory mapped pack file without
+ * copying. Seeking is supported as BinTools may seek within the shape stream.
+ **/
+class MemoryStreamBuffer : public std::streambuf {
+public:
+    MemoryStreamBuffer(const char* data, size_t size) {
+        char* begin = const_cast<char*>(data);
+        setg(begin, begin, begin + size);
+    }
+
+protected:
+    pos_type seekoff(off_type off, std::ios_base::seekdir dir, std::ios_base::openmode which) override {
+        if (!(which & std::ios_base::in)) {
+            return pos_type(off_type(-1));
+        }
+
+        char* base = dir == std::ios_base::beg ? eback() : (dir == std::ios_base::cur ? gptr() : egptr());
+        char* target = base + off;
+
+        if (target < eback() || target > egptr()) {
+            return pos_type(off_type(-1));
+        }
+
+        setg(eback(), target, egptr());
+        return pos_type(target - eback());
+    }
+
+    pos_type seekpos(pos_type pos, std::ios_base::openmode which) override {
+        return seekoff(off_type(pos), std::ios_base::beg, which);
+    }
+};
+
+/**
+ * Reads a binary part file. The header and root shape are read on construction, the indexed map of the root shape
+ * is only built once subshapes are requested.
+ **/
+class BinaryPartReader {
+public:
+    explicit BinaryPartReader(const std::string& path) {
+        std::ifstream stream(path, std::ios::in | std::ios::binary);
+
+        if (!stream) {
+            throw std::runtime_error("Could not open binary part file: " + path);
+        }
+
+        read(stream, path);
+    }
+
+    /**
+     * Reads a part from an in-memory copy of a binary part file. The data is not referenced after this call returns.
+     **/
+    static BinaryPartReader from_buffer(const char* data, size_t size) {
+        MemoryStreamBuffer buffer(data, size);
+        std::istream stream(&buffer);
+
+        BinaryPartReader result;
+        result.read(stream, "<buffer>");
+        return result;
+    }
+
+    std::string header() const {
+        return _header;
+    }
+
+    TopoDS_Shape root_shape() const {
+        return _root;
+    }
+
+    std::vector<TopoDS_Shape> subshapes(const std::vector<int>& indices, const std::vector<int>& orientations) {
+        if (indices.size() != orientations.size()) {
+            throw std::runtime_error("Each subshape index requires an orientation");
+        }
+
+        if (!_map.has_value()) {
+            _map.emplace();
+            TopExp::MapShapes(_root, _map.value());
+        }
+
+        std::vector<TopoDS_Shape> result;
+        result.reserve(indices.size());
+
+        for (size_t i = 0; i < indices.size(); i++) {
+            if (indices[i] < 1 || indices[i] > _map->Extent()) {
+                throw std::runtime_error("Subshape index out of range");
+            }
+
+            result.push_back(_map.value()(indices[i]).Oriented(static_cast<TopAbs_Orientation>(orientations[i])));
+        }
+
+        return result;
+    }
+
+private:
+    BinaryPartReader() = default;
+
+    void read(std::istream& stream, const std::string& source) {
+        char magic[sizeof(BinaryPartWrapper::MAGIC)];
+        uint32_t version;
+        uint64_t header_length;
+
+        stream.read(magic, sizeof(magic));
+        stream.read(reinterpret_cast<char*>(&version), sizeof(version));
+        stream.read(reinterpret_cast<char*>(&header_length), sizeof(header_length));
+
+        if (!stream || std::string(magic, sizeof(magic)) != std::string(BinaryPartWrapper::MAGIC, sizeof(magic))) {
+            throw std::runtime_error("Not a binary part file: " + source);
+        }
+
+        if (version != BinaryPartWrapper::VERSION) {
+            throw std::runtime_error("Unsupported binary part file version: " + source);
+        }
+
+        _header.resize(header_length);
+        stream.read(_header.data(), header_length);
+
+        BinTools::Read(_root, stream);
+
+        if (_root.IsNull()) {
+            throw std::runtime_error("Failed to read binary part file: " + source);
+        }
+    }
+
+    std::string _header;
+
+    TopoDS_Shape _root;
+
+    std::optional<TopTools_IndexedMapOfShape> _map;
+};
+
+#endif
@@ -1,13 +1,23 @@
 #ifndef UTIL_WRAPPER_H
 #define UTIL_WRAPPER_H
 
+#include <BinTools.hxx>
+#include <BRepBuilderAPI_MakeShape.hxx>
+#include <BRepOffset_MakeOffset.hxx>
 #include <BRepTools.hxx>
+#include <BRepTools_History.hxx>
+#include <TopExp.hxx>
+#include <TopTools_IndexedMapOfShape.hxx>
+#include <TopTools_ListOfShape.hxx>
 #include <TopTools_ShapeMapHasher.hxx>
+#include <TopoDS_TShape.hxx>
 #include <sstream>
+#include <vector>
 #include <map>
 #include <stdexcept>
 #include <iostream>
 #include <optional>
+#include <unordered_map>
 
 class UtilWrapper {
 public:
@@ -26,6 +36,173 @@ public:
         TopTools_ShapeMapHasher hasher;
         return hasher(a, b);
     }
+
+    /**
+     * Equivalent to calling shape_map_hasher_hash_code on each shape, but requires only a single call from python.
+     **/
+    static std::vector<int> hash_many(const std::vector<TopoDS_Shape>& shapes) {
+        TopTools_ShapeMapHasher hasher;
+
+        std::vector<int> result;
+        result.reserve(shapes.size());
+
+        for (const TopoDS_Shape& shape : shapes) {
+            result.push_back(hasher(shape));
+        }
+
+        return result;
+    }
+
+    /**
+     * Returns the shape written with BinTools, without triangulations (which depend on whether the shape happens to
+     * have been meshed, not on its definition). The result is an exact, binary representation of the topology,
+     * geometry, tolerances and locations of the shape, and is cheaper to produce than shape_to_string.
+     **/
+    static std::string shape_to_binary(const TopoDS_Shape& shape) {
+        std::ostringstream ss(std::ios::out | std::ios::binary);
+        BinTools::Write(shape, ss, Standard_False, Standard_False, BinTools_FormatVersion_CURRENT);
+        return ss.str();
+    }
+
+    /**
+     * Returns the shape and all of its subshapes, each appearing once. Shapes are deduplicated by
+     * TopTools_ShapeMapHasher (i.e. IsSame), so shared edges/vertices are not repeated once per parent.
+     **/
+    static std::vector<TopoDS_Shape> map_subshapes(const TopoDS_Shape& shape) {
+        TopTools_IndexedMapOfShape map;
+        TopExp::MapShapes(shape, map);
+
+        std::vector<TopoDS_Shape> result;
+        result.reserve(map.Extent());
+
+        for (int i = 1; i <= map.Extent(); i++) {
+            result.push_back(map(i));
+        }
+
+        return result;
+    }
+
+    /**
+     * Tracks the history of each source shape through a modelling operation in a single call.
+     *
+     * For each source shape the returned list contains (in no particular order, possibly with repeats):
+     *  - nothing at all, if the source shape was deleted or is not a subshape of old_root
+     *  - the shapes it was Modified into or Generated
+     *  - the source shape itself, if it is still a subshape of new_root
+     *  - if map_is_same, the subshape of new_root which IsSame as the source
+     *  - if map_is_partner, all subshapes of new_root which are IsPartner with the source
+     **/
+    static std::vector<std::vector<TopoDS_Shape>> map_shape_history(
+            BRepBuilderAPI_MakeShape& mks,
+            const std::vector<TopoDS_Shape>& sources,
+            const TopoDS_Shape& old_root,
+            const TopoDS_Shape& new_root,
+            bool map_is_same,
+            bool map_is_partner) {
+        return map_shape_history_impl(
+            [&](const TopoDS_Shape& s) -> const TopTools_ListOfShape& { return mks.Modified(s); },
+            [&](const TopoDS_Shape& s) -> const TopTools_ListOfShape& { return mks.Generated(s); },
+            [&](const TopoDS_Shape& s) { return mks.IsDeleted(s); },
+            sources, old_root, new_root, map_is_same, map_is_partner);
+    }
+
+    static std::vector<std::vector<TopoDS_Shape>> map_shape_history(
+            BRepOffset_MakeOffset& mko,
+            const std::vector<TopoDS_Shape>& sources,
+            const TopoDS_Shape& old_root,
+            const TopoDS_Shape& new_root,
+            bool map_is_same,
+            bool map_is_partner) {
+        return map_shape_history_impl(
+            [&](const TopoDS_Shape& s) -> const TopTools_ListOfShape& { return mko.Modified(s); },
+            [&](const TopoDS_Shape& s) -> const TopTools_ListOfShape& { return mko.Generated(s); },
+            [&](const TopoDS_Shape& s) { return mko.IsDeleted(s); },
+            sources, old_root, new_root, map_is_same, map_is_partner);
+    }
+
+    static std::vector<std::vector<TopoDS_Shape>> map_shape_history(
+            BRepTools_History& history,
+            const std::vector<TopoDS_Shape>& sources,
+            const TopoDS_Shape& old_root,
+            const TopoDS_Shape& new_root,
+            bool map_is_same,
+            bool map_is_partner) {
+        return map_shape_history_impl(
+            [&](const TopoDS_Shape& s) -> const TopTools_ListOfShape& { return history.Modified(s); },
+            [&](const TopoDS_Shape& s) -> const TopTools_ListOfShape& { return history.Generated(s); },
+            [&](const TopoDS_Shape& s) { return history.IsRemoved(s); },
+            sources, old_root, new_root, map_is_same, map_is_partner);
+    }
+
+private:
+
+    template <typename ModifiedFn, typename GeneratedFn, typename IsDeletedFn>
+    static std::vector<std::vector<TopoDS_Shape>> map_shape_history_impl(
+            ModifiedFn modified,
+            GeneratedFn generated,
+            IsDeletedFn is_deleted,
+            const std::vector<TopoDS_Shape>& sources,
+            const TopoDS_Shape& old_root,
+            const TopoDS_Shape& new_root,
+            bool map_is_same,
+            bool map_is_partner) {
+        TopTools_IndexedMapOfShape old_subshapes;
+        TopExp::MapShapes(old_root, old_subshapes);
+
+        TopTools_IndexedMapOfShape new_subshapes;
+        TopExp::MapShapes(new_root, new_subshapes);
+
+        // partners share a TShape, so index the new subshapes by TShape rather than comparing every pair
+        std::unordered_map<const TopoDS_TShape*, std::vector<int>> new_subshapes_by_tshape;
+        if (map_is_partner) {
+            for (int i = 1; i <= new_subshapes.Extent(); i++) {
+                new_subshapes_by_tshape[new_subshapes(i).TShape().get()].push_back(i);
+            }
+        }
+
+        std::vector<std::vector<TopoDS_Shape>> result;
+        result.reserve(sources.size());
+
+        for (const TopoDS_Shape& source : sources) {
+            result.emplace_back();
+            std::vector<TopoDS_Shape>& mapped = result.back();
+
+            // orphan shapes cannot be mapped as the operation is only performed on the old root
+            if (is_deleted(source) || !old_subshapes.Contains(source)) {
+                continue;
+            }
+
+            if (map_is_same) {
+                int index = new_subshapes.FindIndex(source);
+                if (index > 0) {
+                    mapped.push_back(new_subshapes(index));
+                }
+            }
+
+            if (map_is_partner) {
+                auto it = new_subshapes_by_tshape.find(source.TShape().get());
+                if (it != new_subshapes_by_tshape.end()) {
+                    for (int index : it->second) {
+                        mapped.push_back(new_subshapes(index));
+                    }
+                }
+            }
+
+            for (const TopoDS_Shape& s : modified(source)) {
+                mapped.push_back(s);
+            }
+
+            for (const TopoDS_Shape& s : generated(source)) {
+                mapped.push_back(s);
+            }
+
+            if (new_subshapes.Contains(source)) {
+                mapped.push_back(source);
+            }
+        }
+
+        return result;
+    }
 };
 
 
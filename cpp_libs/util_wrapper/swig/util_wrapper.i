@@ -1,18 +1,44 @@
 %include "std_vector.i"
 %include "std_map.i"
 %include "std_string.i"
+%include "pybuffer.i"
+%include "exception.i"
 %include "/third_party/pythonocc-core/src/SWIG_files/common/OccHandle.i"
 
-%module(package="util_wrapper") util_wrapper
+%module(package="util_wrapper", threads="1") util_wrapper
 %feature("flatnested", "1");
 %feature("autodoc", "1");
+
+// the GIL is only released while reading binary parts, so parts can be loaded on background threads
+%feature("nothread");
+%feature("nothread", "0") BinaryPartReader::BinaryPartReader;
+%feature("nothread", "0") BinaryPartReader::from_buffer;
+%feature("nothread", "0") BinaryPartReader::subshapes;
+
+// e.g. BinaryPartReader failing to open or parse a part file, which would otherwise terminate the interpreter
+%exception {
+    try {
+        $action
+    } catch (const std::runtime_error& e) {
+        SWIG_exception(SWIG_RuntimeError, e.what());
+    }
+}
+
 %{
 #include <util_wrapper.h>
 #include <surface_mapper.h>
+#include <binary_part.h>
 %}
 
 %template(StringList) std::vector<std::string>;
 %template(ShapeList) std::vector<TopoDS_Shape>;
+%template(IntList) std::vector<int>;
+%template(ShapeListList) std::vector<std::vector<TopoDS_Shape>>;
+
+// shape_to_binary returns arbitrary bytes, which cannot be decoded as a python str
+%typemap(out) std::string shape_to_binary {
+    $result = PyBytes_FromStringAndSize($1.data(), $1.size());
+}
 
 class UtilWrapper {
 public:
@@ -21,6 +47,36 @@ public:
     static int shape_map_hasher_hash_code(const TopoDS_Shape& shape);
 
     static bool shape_map_hasher_equal(const TopoDS_Shape& a, const TopoDS_Shape& b);
+
+    static std::vector<int> hash_many(const std::vector<TopoDS_Shape>& shapes);
+
+    static std::string shape_to_binary(const TopoDS_Shape& shape);
+
+    static std::vector<TopoDS_Shape> map_subshapes(const TopoDS_Shape& shape);
+
+    static std::vector<std::vector<TopoDS_Shape>> map_shape_history(
+        BRepBuilderAPI_MakeShape& mks,
+        const std::vector<TopoDS_Shape>& sources,
+        const TopoDS_Shape& old_root,
+        const TopoDS_Shape& new_root,
+        bool map_is_same,
+        bool map_is_partner);
+
+    static std::vector<std::vector<TopoDS_Shape>> map_shape_history(
+        BRepOffset_MakeOffset& mko,
+        const std::vector<TopoDS_Shape>& sources,
+        const TopoDS_Shape& old_root,
+        const TopoDS_Shape& new_root,
+        bool map_is_same,
+        bool map_is_partner);
+
+    static std::vector<std::vector<TopoDS_Shape>> map_shape_history(
+        BRepTools_History& history,
+        const std::vector<TopoDS_Shape>& sources,
+        const TopoDS_Shape& old_root,
+        const TopoDS_Shape& new_root,
+        bool map_is_same,
+        bool map_is_partner);
 };
 
 class SurfaceMapperWrapper {
@@ -41,4 +97,27 @@ public:
     static gp_Pnt2d project_point_to_surface(
         const gp_Pnt& point,
         const BRepAdaptor_Surface& surf);
-};
\ No newline at end of file
+};
+
+class BinaryPartWrapper {
+public:
+    static std::vector<int> subshape_indices(const TopoDS_Shape& root, const std::vector<TopoDS_Shape>& shapes);
+
+    static void write(const std::string& path, const std::string& header, const TopoDS_Shape& root);
+};
+
+// allows any python buffer (bytes, memoryview over an mmap...) to be passed to from_buffer without a copy
+%pybuffer_binary(const char* data, size_t size);
+
+class BinaryPartReader {
+public:
+    BinaryPartReader(const std::string& path);
+
+    static BinaryPartReader from_buffer(const char* data, size_t size);
+
+    std::string header() const;
+
+    TopoDS_Shape root_shape() const;
+
+    std::vector<TopoDS_Shape> subshapes(const std::vector<int>& indices, const std::vector<int>& orientations);
+};
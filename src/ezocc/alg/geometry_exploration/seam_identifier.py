@@ -24,7 +24,6 @@ class SeamIdentifier:
     def is_seam(self, edge: OCC.Core.TopoDS.TopoDS_Edge):
         index = self._shape_map.FindIndex(edge)
         faces_list = self._shape_map.FindFromIndex(index)
-        faces_list = [f for f in ListUtils.iterate_list(faces_list)]
-        faces_list = [SetPlaceableShape(f) for f in faces_list]
+        faces_list = SetPlaceableShape.of_many(ListUtils.iterate_list(faces_list))
 
         return len(faces_list) == 2 and faces_list[0] == faces_list[1]
@@ -25,9 +25,8 @@ def poisson_disk_points(cache: PartCache,
     for p in points:
         pnt = gp.gp_Pnt()
         adaptor.D0(p[0], p[1], pnt)
-        vert = factory.vertex(pnt.X(), pnt.Y(), pnt.Z())
+        verts.append(factory.vertex(pnt.X(), pnt.Y(), pnt.Z()))
 
-        if vert.bool.intersects(face):
-            verts.append(vert)
+    verts = [v for v, intersects in zip(verts, face.bool.intersects_many(verts)) if intersects]
 
     return factory.compound(*verts)
@@ -198,8 +198,7 @@ def remove_internal_faces(solid: Part) -> InternalFaceRemovalResult:
 
         index = shape_map.FindIndex(e.shape)
         faces_list = shape_map.FindFromIndex(index)
-        faces_list = [f for f in ListUtils.iterate_list(faces_list)]
-        faces_list = [SetPlaceableShape(f) for f in faces_list]
+        faces_list = SetPlaceableShape.of_many(ListUtils.iterate_list(faces_list))
 
         # skip seam edges
         if len(faces_list) == 2 and faces_list[0] == faces_list[1]:
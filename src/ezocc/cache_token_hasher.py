@@ -0,0 +1,140 @@
+"""
+Streaming hash used to derive DefaultCacheToken UUIDs from token arguments.
+"""
+from __future__ import annotations
+
+import enum
+import hashlib
+import io
+import pickle
+import struct
+import typing
+import uuid
+
+import OCC.Core.TopoDS
+
+from util_wrapper_swig import UtilWrapper
+
+from ezocc.part_manager import Part, CacheToken
+
+
+class CacheTokenHasher:
+    """
+    Incrementally hashes token arguments with blake2b. Each value is written with a type tag, and variable length
+    values with their length, so that differently structured arguments cannot produce the same byte stream.
+
+    Values are hashed as follows:
+     - primitives (None, bool, int, float, str, bytes) and enums are written directly
+     - lists, tuples and dicts are hashed element by element. Sets are hashed order-independently.
+     - Parts and CacheTokens contribute their token digest, so a parent token's digest is reused rather than recomputed
+     - TopoDS_Shapes contribute their exact binary (BinTools) serialisation, see UtilWrapper.shape_to_binary. Sampling
+       the geometry would be cheaper, but shapes agreeing at the sample points would then share a UUID.
+     - anything else falls back to pickling (with the above types substituted by their digests)
+    """
+
+    DIGEST_SIZE = 16
+
+    PERSON = b"ezocc-token"
+
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=CacheTokenHasher.DIGEST_SIZE, person=CacheTokenHasher.PERSON)
+
+    def digest(self) -> bytes:
+        return self._hash.digest()
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(bytes=self.digest()))
+
+    def update(self, value: typing.Any) -> CacheTokenHasher:
+        # note bool is checked before int, as it is a subclass
+        if value is None:
+            self._write(b"N")
+        elif isinstance(value, bool):
+            self._write(b"B", b"\x01" if value else b"\x00")
+        elif isinstance(value, enum.Enum):
+            self._write(b"E", f"{type(value).__module__}.{type(value).__qualname__}".encode("utf-8"))
+            self.update(value.value)
+        elif isinstance(value, int):
+            self._write(b"I", str(value).encode("ascii"))
+        elif isinstance(value, float):
+            self._write(b"F", struct.pack("<d", value))
+        elif isinstance(value, str):
+            self._write(b"S", value.encode("utf-8"))
+        elif isinstance(value, (bytes, bytearray)):
+            self._write(b"Y", bytes(value))
+        elif isinstance(value, (Part, CacheToken)):
+            self._write(b"K", CacheTokenHasher.token_digest(value))
+        elif isinstance(value, OCC.Core.TopoDS.TopoDS_Shape):
+            self._write(b"G", UtilWrapper.shape_to_binary(value))
+        elif isinstance(value, (list, tuple)):
+            self._write(b"L" if isinstance(value, list) else b"T", struct.pack("<Q", len(value)))
+            for v in value:
+                self.update(v)
+        elif isinstance(value, dict):
+            self._write(b"D", struct.pack("<Q", len(value)))
+            for k, v in value.items():
+                self.update(k)
+                self.update(v)
+        elif isinstance(value, (set, frozenset)):
+            # iteration order of a set is not stable between processes
+            element_digests = sorted(CacheTokenHasher().update(v).digest() for v in value)
+            self._write(b"Z", b"".join(element_digests))
+        else:
+            self._write(b"P", CacheTokenHasher._pickle(value))
+
+        return self
+
+    def update_args(self, args: typing.Tuple, kwargs: typing.Dict[str, typing.Any]) -> CacheTokenHasher:
+        self.update(args)
+
+        # keyword argument order should not affect the digest
+        self.update({k: kwargs[k] for k in sorted(kwargs.keys())})
+
+        return self
+
+    @staticmethod
+    def token_digest(value: typing.Union[Part, CacheToken]) -> bytes:
+        token = value.cache_token if isinstance(value, Part) else value
+
+        # avoid a circular import, DefaultCacheToken depends on this module
+        from ezocc.part_cache import DefaultCacheToken
+
+        if isinstance(token, DefaultCacheToken):
+            return token.compute_digest()
+
+        return uuid.UUID(token.compute_uuid()).bytes
+
+    def _write(self, tag: bytes, data: bytes = b""):
+        self._hash.update(tag)
+        self._hash.update(struct.pack("<Q", len(data)))
+        self._hash.update(data)
+
+    @staticmethod
+    def _pickle(value: typing.Any) -> bytes:
+        f = io.BytesIO()
+        pickler = _DigestSubstitutingPickler(f)
+
+        try:
+            pickler.dump(value)
+        except Exception as e:
+            raise RuntimeError(f"Could not generate pickle for cache token argument: {value}", e)
+
+        return f.getvalue()
+
+
+class _DigestSubstitutingPickler(pickle.Pickler):
+    """
+    Pickles with a fixed protocol, substituting Parts, CacheTokens and shapes nested in the pickled value by their
+    digests.
+    """
+
+    PROTOCOL = 4
+
+    def __init__(self, file: typing.BinaryIO):
+        super().__init__(file, protocol=_DigestSubstitutingPickler.PROTOCOL)
+
+    def persistent_id(self, obj: typing.Any) -> typing.Optional[str]:
+        if isinstance(obj, (Part, CacheToken, OCC.Core.TopoDS.TopoDS_Shape)):
+            return CacheTokenHasher().update(obj).digest().hex()
+
+        return None
@@ -255,8 +255,8 @@ class VtkActorCollectionBuilder:
                     added_shapes.add(s.shape)
 
         logger.info("Processing verts....")
-        for v in Explorer.vertex_explorer(part.part.shape).get():
-            sp = SetPlaceableShape(v)
+        vertex_shapes = Explorer.vertex_explorer(part.part.shape).get()
+        for v, sp in zip(vertex_shapes, SetPlaceableShape.of_many(vertex_shapes)):
             if v in added_shapes:
                 continue
 
@@ -264,8 +264,8 @@ class VtkActorCollectionBuilder:
             added_shapes.add(v)
 
         logger.info("Processing faces....")
-        for f in Explorer.face_explorer(part.part.shape).get():
-            sp = SetPlaceableShape(f)
+        face_shapes = Explorer.face_explorer(part.part.shape).get()
+        for f, sp in zip(face_shapes, SetPlaceableShape.of_many(face_shapes)):
             if f in added_shapes:
                 continue
 
@@ -277,8 +277,8 @@ class VtkActorCollectionBuilder:
             added_shapes.add(f)
 
         logger.info("Processing edges....")
-        for e in Explorer.edge_explorer(part.part.shape).get():
-            sp = SetPlaceableShape(e)
+        edge_shapes = Explorer.edge_explorer(part.part.shape).get()
+        for e, sp in zip(edge_shapes, SetPlaceableShape.of_many(edge_shapes)):
             if e in added_shapes:
                 continue
 
@@ -1,4 +1,3 @@
-import inspect
 import logging
 import math
 
@@ -9,6 +8,7 @@ from ezocc.cad.visualization_widgets.visualization_widgets import PartWidgets
 from ezocc.constants import Constants
 from ezocc.enclosures.shadow_line import ShadowLine
 from ezocc.humanization import Humanize
+from ezocc.source_fingerprint import SourceFingerprints
 from ezocc.occutils_python import InterrogateUtils, WireSketcher
 from ezocc.part_cache import InMemoryPartCache
 from ezocc.part_manager import PartCache, Part, PartFactory
@@ -223,12 +223,12 @@ class EnclosureFactory:
                          fastener_tool: typing.Optional[FastenerTool],
                          extrusion_modifier: typing.Optional[ExtrusionModifier]):
 
-        fastener_tool_source = inspect.getsource(fastener_tool.__class__) if fastener_tool is not None else None
-        extrusion_modifier_source = inspect.getsource(extrusion_modifier.__class__) if extrusion_modifier is not None else None
+        fastener_tool_source = SourceFingerprints.of(fastener_tool.__class__) if fastener_tool is not None else None
+        extrusion_modifier_source = SourceFingerprints.of(extrusion_modifier.__class__) if extrusion_modifier is not None else None
 
-        token = self._cache.create_token(inspect.getsource(EnclosureFactory),
-                                         inspect.getsource(wall_spec.__class__),
-                                         inspect.getsource(EnclosureFactory._create_enclosure),
+        token = self._cache.create_token(SourceFingerprints.of(EnclosureFactory),
+                                         SourceFingerprints.of(wall_spec.__class__),
+                                         SourceFingerprints.of(EnclosureFactory._create_enclosure),
                                          fastener_tool_source,
                                          extrusion_modifier_source,
                          face,
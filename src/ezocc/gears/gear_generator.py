@@ -1,7 +1,6 @@
 import argparse
 import importlib
 import importlib.resources
-import inspect
 import logging
 import math
 import pdb
@@ -13,6 +12,7 @@ from OCC.Core.gp import gp_Pnt, gp_Vec, gp_Dir, gp_Ax1
 import ezocc.gears.gears_js_translated as gear
 from ezocc.occutils_python import WireSketcher, InterrogateUtils
 from ezocc.part_manager import Part, PartFactory, PartCache, PartDriver
+from ezocc.source_fingerprint import SourceFingerprints
 from ezocc.svg_parser import SVGPathParser
 
 gear_outline_fn = gear.var.own['createGearOutline']['value']
@@ -195,7 +195,7 @@ class InvoluteRackFactory:
 
     def create_involute_rack_profile(self, gear_spec: GearSpec):
 
-        token = self._cache.create_token(gear_spec, inspect.getsource(InvoluteRackFactory))
+        token = self._cache.create_token(gear_spec, SourceFingerprints.of(InvoluteRackFactory))
 
         def _do():
 
@@ -292,7 +292,7 @@ class InvoluteGearFactory:
 
     def create_int_involute_profile(self, gear_spec: GearSpec) -> Part:
         token = self._part_cache.create_token("involute_gear_factory", "int_involute_profile", gear_spec,
-                                              inspect.getsource(InvoluteGearFactory))
+                                              SourceFingerprints.of(InvoluteGearFactory))
 
         def _do():
             logger.info("Generating gear...")
@@ -320,7 +320,7 @@ class InvoluteGearFactory:
         token = self._part_cache.create_token("involute_gear_factory",
                                               "involute_profile",
                                               gear_spec,
-                                              inspect.getsource(InvoluteGearFactory))
+                                              SourceFingerprints.of(InvoluteGearFactory))
 
         def _do():
             if gear_spec.preview_mode:
@@ -351,7 +351,7 @@ class InvoluteGearFactory:
         token = self._part_cache.create_token("involute_gear_factory",
                                               "involute_gear",
                                               gear_spec, height,
-                                              inspect.getsource(InvoluteGearFactory))
+                                              SourceFingerprints.of(InvoluteGearFactory))
 
         def _do():
             return self._add_gear_local_axes(
@@ -366,7 +366,7 @@ class InvoluteGearFactory:
         token = self._part_cache.create_token("involute_gear_factory",
                                               "create_planetary_gear_set",
                                               gear_spec,
-                                              inspect.getsource(InvoluteGearFactory))
+                                              SourceFingerprints.of(InvoluteGearFactory))
 
         def _do():
             logger.info("Creating planetary gear: ring")
@@ -406,7 +406,7 @@ class InvoluteGearFactory:
                                               "involute_gear_pair",
                                               gear_pair_spec,
                                               height,
-                                              inspect.getsource(InvoluteGearFactory))
+                                              SourceFingerprints.of(InvoluteGearFactory))
 
         def _do():
             bull = self.create_involute_profile(gear_pair_spec.gear_spec_bull).sp("body").make.face().extrude.prism(dz=height).make.solid()\
@@ -436,7 +436,7 @@ class InvoluteGearFactory:
         token = self._part_cache.create_token("involute_gear_factory",
                                               "bevel_gear",
                                               [gear_spec, hypot_length, bevel_angle, target_module],
-                                              inspect.getsource(InvoluteGearFactory))
+                                              SourceFingerprints.of(InvoluteGearFactory))
 
         def _do():
             base_profile = self.create_involute_profile(gear_spec).sp("body")
@@ -471,7 +471,7 @@ class InvoluteGearFactory:
             hypot_length,
             bevel_angle_bull,
             bevel_angle_pinion,
-            inspect.getsource(InvoluteGearFactory))
+            SourceFingerprints.of(InvoluteGearFactory))
 
         def _do():
             bull_cone_height = gear_pair_spec.gear_spec_bull.pitch_diameter * 0.5 * math.tan(bevel_angle_bull)
@@ -546,7 +546,7 @@ class InvoluteGearFactory:
                                               helix_angle_deg,
                                               chamfer,
                                               make_solid,
-                                              inspect.getsource(InvoluteGearFactory))
+                                              SourceFingerprints.of(InvoluteGearFactory))
 
         def _do():
 
@@ -589,7 +589,7 @@ class InvoluteGearFactory:
                                               helix_angle_deg,
                                               chamfer,
                                               make_solid,
-                                              inspect.getsource(InvoluteGearFactory))
+                                              SourceFingerprints.of(InvoluteGearFactory))
 
         def extrude_gear_profile(gear: Part, sense: bool) -> Part:
             gear = gear.make.face()
@@ -11,9 +11,12 @@ import OCC
 import OCC.Core as oc
 import OCC.Core.BRep
 import OCC.Core.BRepAdaptor
+import OCC.Core.BOPAlgo
 import OCC.Core.BRepAlgoAPI
 import OCC.Core.BRepBndLib
 import OCC.Core.BRepBuilderAPI
+import OCC.Core.BRepClass3d
+import OCC.Core.BRepExtrema
 import OCC.Core.BRepFilletAPI
 import OCC.Core.BRepGProp
 import OCC.Core.BRepLib
@@ -23,6 +26,7 @@ import OCC.Core.BRepPrimAPI
 import OCC.Core.BRepTools
 import OCC.Core.BRepTools
 import OCC.Core.Bnd
+import OCC.Core.Extrema
 import OCC.Core.GC
 import OCC.Core.GCE2d
 import OCC.Core.GProp
@@ -46,6 +50,7 @@ import OCC.Core.TopTools
 import OCC.Core.TopTools
 import OCC.Core.TopoDS
 import OCC.Core.gp
+import numpy
 from OCC.Core.NCollection import NCollection_List
 from OCC.Core.TopTools import TopTools_ListIteratorOfListOfShape
 from OCC.Core.gp import gp_Dir
@@ -69,10 +74,18 @@ class Extents:
 
     swizzle_property_name = re.compile("[xyz]+_(mid|min|max|span)")
 
-    def __init__(self, shape=None):
+    def __init__(self, shape=None, optimal: bool = True):
+        """
+        @param optimal: if False, the (cheaper) box computed may be larger than the shape, e.g. by the shape tolerances
+        or the control points of curved surfaces
+        """
         if shape is not None:
             bnd_box = OCC.Core.Bnd.Bnd_Box()
-            OCC.Core.BRepBndLib.brepbndlib.AddOptimal(shape, bnd_box, False, False)
+
+            if optimal:
+                OCC.Core.BRepBndLib.brepbndlib.AddOptimal(shape, bnd_box, False, False)
+            else:
+                OCC.Core.BRepBndLib.brepbndlib.Add(shape, bnd_box, True)
 
             self._cache_bndbox_fields(bnd_box)
         else:
@@ -153,6 +166,56 @@ class Extents:
         result.z_max = self.z_max + amount_z_plus
         return result
 
+    def translated(self, dx: float = 0, dy: float = 0, dz: float = 0):
+        result = Extents()
+        result.x_min = self.x_min + dx
+        result.y_min = self.y_min + dy
+        result.z_min = self.z_min + dz
+        result.x_max = self.x_max + dx
+        result.y_max = self.y_max + dy
+        result.z_max = self.z_max + dz
+        return result
+
+    def transformed(self, trsf: OCC.Core.gp.gp_Trsf):
+        """
+        @return: extents enclosing these extents transformed by trsf. Exact for translations, otherwise the box
+        enclosing the transformed corners, which may be larger than the extents of the transformed shape.
+        """
+        if trsf.Form() in (OCC.Core.gp.gp_TrsfForm.gp_Identity, OCC.Core.gp.gp_TrsfForm.gp_Translation):
+            translation = trsf.TranslationPart()
+            return self.translated(translation.X(), translation.Y(), translation.Z())
+
+        corners = [gp_Pnt(x, y, z).Transformed(trsf)
+                   for x in (self.x_min, self.x_max)
+                   for y in (self.y_min, self.y_max)
+                   for z in (self.z_min, self.z_max)]
+
+        result = Extents()
+        result.x_min = min(p.X() for p in corners)
+        result.y_min = min(p.Y() for p in corners)
+        result.z_min = min(p.Z() for p in corners)
+        result.x_max = max(p.X() for p in corners)
+        result.y_max = max(p.Y() for p in corners)
+        result.z_max = max(p.Z() for p in corners)
+        return result
+
+    @staticmethod
+    def union(*extents: Extents):
+        """
+        @return: the extents enclosing all of the specified extents
+        """
+        if len(extents) == 0:
+            raise ValueError("At least one extents must be specified")
+
+        result = Extents()
+        result.x_min = min(e.x_min for e in extents)
+        result.y_min = min(e.y_min for e in extents)
+        result.z_min = min(e.z_min for e in extents)
+        result.x_max = max(e.x_max for e in extents)
+        result.y_max = max(e.y_max for e in extents)
+        result.z_max = max(e.z_max for e in extents)
+        return result
+
     def _cache_bndbox_fields(self, bnd_box):
         self.x_min, self.y_min, self.z_min, self.x_max, self.y_max, self.z_max = \
             bnd_box.Get()
@@ -1225,15 +1288,28 @@ class ListUtils:
 class IOUtils:
 
     @staticmethod
-    def save_shape_step(compound: OCC.Core.TopoDS.TopoDS_Shape, filename: str):
+    def save_shape_step(compound: OCC.Core.TopoDS.TopoDS_Shape, filename: str, assembly: bool = False):
+        """
+        @param assembly: if True, compounds are written as STEP assemblies. Shapes that share geometry (e.g. from
+        Part.instanced_pattern) are then written once and referenced by each instance.
+        """
         import OCC.Core.STEPControl
+        import OCC.Core.Interface
 
         writer = OCC.Core.STEPControl.STEPControl_Writer()
-        return_status = writer.Transfer(compound, OCC.Core.STEPControl.STEPControl_StepModelType.STEPControl_AsIs)
-        if return_status != OCC.Core.IFSelect.IFSelect_ReturnStatus.IFSelect_RetDone:
-            raise RuntimeError("Save shape failed")
 
-        writer.Write(filename)
+        # the assembly mode is a process wide setting, so is restored for other STEP writers once written
+        previous_assembly_mode = OCC.Core.Interface.Interface_Static.CVal("write.step.assembly")
+        OCC.Core.Interface.Interface_Static.SetCVal("write.step.assembly", "Auto" if assembly else "Off")
+
+        try:
+            return_status = writer.Transfer(compound, OCC.Core.STEPControl.STEPControl_StepModelType.STEPControl_AsIs)
+            if return_status != OCC.Core.IFSelect.IFSelect_ReturnStatus.IFSelect_RetDone:
+                raise RuntimeError("Save shape failed")
+
+            writer.Write(filename)
+        finally:
+            OCC.Core.Interface.Interface_Static.SetCVal("write.step.assembly", previous_assembly_mode)
 
     @staticmethod
     def save_shape_stl(shape: OCC.Core.TopoDS.TopoDS_Shape,
@@ -1292,6 +1368,206 @@ class BoolUtils:
 
         return result
 
+    @staticmethod
+    def cut(shape: oc.TopoDS.TopoDS_Shape, tools: typing.List[oc.TopoDS.TopoDS_Shape]) -> OCC.Core.TopoDS.TopoDS_Shape:
+        """
+        Cuts every tool from the shape in a single boolean operation, rather than one tool at a time as incremental_cut
+        does.
+        """
+        algo = OCC.Core.BRepAlgoAPI.BRepAlgoAPI_Cut()
+
+        algo.SetRunParallel(True)
+        algo.SetNonDestructive(True)
+        algo.SetArguments(ListUtils.list([shape]))
+        algo.SetTools(ListUtils.list(tools))
+
+        algo.Build()
+
+        if algo.HasErrors():
+            raise RuntimeError("bool op failed")
+
+        return algo.Shape()
+
+    @staticmethod
+    def bounding_box(shape: oc.TopoDS.TopoDS_Shape) -> typing.Tuple[float, float, float, float, float, float]:
+        """
+        @return: (x_min, y_min, z_min, x_max, y_max, z_max) of a box enclosing the shape. Cheaper than Extents, but may
+        be larger than the tightest box.
+        """
+        return BoolUtils._bnd_box(shape).Get()
+
+    @staticmethod
+    def _bnd_box(shape: oc.TopoDS.TopoDS_Shape) -> OCC.Core.Bnd.Bnd_Box:
+        bnd_box = OCC.Core.Bnd.Bnd_Box()
+        OCC.Core.BRepBndLib.brepbndlib.Add(shape, bnd_box, False)
+        return bnd_box
+
+    @staticmethod
+    def boxes_overlap(a: typing.Tuple[float, ...], b: typing.Tuple[float, ...], gap: float = 0) -> bool:
+        return all(a[i] <= b[i + 3] + gap and b[i] <= a[i + 3] + gap for i in range(0, 3))
+
+    @staticmethod
+    def group_overlapping(shapes: typing.List[oc.TopoDS.TopoDS_Shape], gap: float = 0) -> typing.List[typing.List[int]]:
+        """
+        Groups the shapes such that shapes in different groups have disjoint bounding boxes, so cannot intersect.
+
+        @param gap: boxes closer than this are considered to overlap
+        @return: the indices of the shapes in each group, in ascending order
+        """
+        boxes = [BoolUtils.bounding_box(s) for s in shapes]
+
+        parent = list(range(0, len(shapes)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+
+            return i
+
+        # sweep along x: only boxes whose x ranges overlap need to be compared
+        order = sorted(range(0, len(shapes)), key=lambda i: boxes[i][0])
+        active: typing.List[int] = []
+
+        for i in order:
+            active = [j for j in active if boxes[j][3] + gap >= boxes[i][0]]
+
+            for j in active:
+                if BoolUtils.boxes_overlap(boxes[i], boxes[j], gap):
+                    parent[find(i)] = find(j)
+
+            active.append(i)
+
+        groups: typing.Dict[int, typing.List[int]] = dict()
+        for i in range(0, len(shapes)):
+            groups.setdefault(find(i), []).append(i)
+
+        return sorted(groups.values(), key=lambda g: g[0])
+
+    @staticmethod
+    def intersects(shape: oc.TopoDS.TopoDS_Shape,
+                   other: oc.TopoDS.TopoDS_Shape,
+                   glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum] = None,
+                   tolerance: float = OCC.Core.Precision.precision.Confusion()) -> bool:
+        """
+        @return: True if the common of the shapes is not empty. Shapes with disjoint bounding boxes, or further apart
+        than the tolerance, are rejected without performing the boolean operation.
+        """
+        bnd_box = BoolUtils._bnd_box(shape)
+        other_bnd_box = BoolUtils._bnd_box(other)
+
+        if bnd_box.IsVoid() or other_bnd_box.IsVoid():
+            return False
+
+        if not BoolUtils.boxes_overlap(bnd_box.Get(), other_bnd_box.Get(), tolerance):
+            return False
+
+        return BoolUtils._intersects_exact(shape, other, glue, tolerance)
+
+    @staticmethod
+    def intersects_many(shape: oc.TopoDS.TopoDS_Shape,
+                        others: typing.List[oc.TopoDS.TopoDS_Shape],
+                        glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum] = None,
+                        tolerance: float = OCC.Core.Precision.precision.Confusion()) -> typing.List[bool]:
+        """
+        Equivalent to [intersects(shape, o) for o in others], but the bounding boxes of the others are checked against
+        that of the shape all at once.
+        """
+        bnd_box = BoolUtils._bnd_box(shape)
+
+        if bnd_box.IsVoid() or len(others) == 0:
+            return [False for _ in others]
+
+        other_bnd_boxes = [BoolUtils._bnd_box(o) for o in others]
+
+        # void boxes are NaN, which compare as not overlapping
+        boxes = numpy.array([b.Get() if not b.IsVoid() else (math.nan,) * 6 for b in other_bnd_boxes])
+        box = numpy.array(bnd_box.Get())
+
+        candidates = numpy.all((boxes[:, 0:3] <= box[3:6] + tolerance) & (box[0:3] <= boxes[:, 3:6] + tolerance),
+                               axis=1)
+
+        return [bool(c) and BoolUtils._intersects_exact(shape, o, glue, tolerance) for c, o in zip(candidates, others)]
+
+    @staticmethod
+    def _intersects_exact(shape: oc.TopoDS.TopoDS_Shape,
+                          other: oc.TopoDS.TopoDS_Shape,
+                          glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum],
+                          tolerance: float) -> bool:
+        dist = OCC.Core.BRepExtrema.BRepExtrema_DistShapeShape(shape, other, OCC.Core.Extrema.Extrema_ExtFlag_MIN)
+
+        if dist.IsDone():
+            if dist.Value() > tolerance:
+                return False
+
+            # the common of a vertex and a shape it touches is the vertex itself
+            if shape.ShapeType() == OCC.Core.TopAbs.TopAbs_VERTEX or other.ShapeType() == OCC.Core.TopAbs.TopAbs_VERTEX:
+                return True
+
+        # overlapping shapes (e.g. an edge passing into a solid) usually have a vertex or edge midpoint inside the other
+        for solid, candidate in ((shape, other), (other, shape)):
+            if solid.ShapeType() == OCC.Core.TopAbs.TopAbs_SOLID and \
+                    BoolUtils._has_point_inside(solid, candidate, tolerance):
+                return True
+
+        # touching shapes (e.g. solids sharing a face) may still have an empty common
+        algo = OCC.Core.BRepAlgoAPI.BRepAlgoAPI_Common()
+
+        algo.SetRunParallel(True)
+        algo.SetNonDestructive(True)
+        algo.SetArguments(ListUtils.list([shape]))
+        algo.SetTools(ListUtils.list([other]))
+
+        if glue is not None:
+            algo.SetGlue(glue)
+
+        algo.Build()
+
+        if algo.HasErrors():
+            raise RuntimeError("bool op failed")
+
+        return not InterrogateUtils.is_empty_compound(algo.Shape())
+
+    # number of points of a shape classified by _has_point_inside, beyond which the boolean operation is cheaper
+    INSIDE_POINT_SAMPLES = 64
+
+    @staticmethod
+    def _has_point_inside(solid: oc.TopoDS.TopoDS_Shape,
+                          shape: oc.TopoDS.TopoDS_Shape,
+                          tolerance: float) -> bool:
+        """
+        @return: True if a vertex or edge midpoint of the shape lies strictly inside the solid, so the common of the two
+        is not empty. Points on the boundary of the solid are not counted, as touching shapes may have an empty
+        common: False is inconclusive.
+        """
+        classifier = OCC.Core.BRepClass3d.BRepClass3d_SolidClassifier(solid)
+
+        points: typing.List[gp_Pnt] = []
+
+        vertices = OCC.Core.TopTools.TopTools_IndexedMapOfShape()
+        OCC.Core.TopExp.topexp.MapShapes(shape, OCC.Core.TopAbs.TopAbs_VERTEX, vertices)
+        for i in range(1, min(vertices.Extent(), BoolUtils.INSIDE_POINT_SAMPLES) + 1):
+            points.append(OCC.Core.BRep.BRep_Tool.Pnt(oc.TopoDS.topods.Vertex(vertices.FindKey(i))))
+
+        edges = OCC.Core.TopTools.TopTools_IndexedMapOfShape()
+        OCC.Core.TopExp.topexp.MapShapes(shape, OCC.Core.TopAbs.TopAbs_EDGE, edges)
+        for i in range(1, min(edges.Extent(), BoolUtils.INSIDE_POINT_SAMPLES) + 1):
+            edge = oc.TopoDS.topods.Edge(edges.FindKey(i))
+
+            if OCC.Core.BRep.BRep_Tool.Degenerated(edge):
+                continue
+
+            curve = OCC.Core.BRepAdaptor.BRepAdaptor_Curve(edge)
+            points.append(curve.Value((curve.FirstParameter() + curve.LastParameter()) / 2))
+
+        for point in points:
+            classifier.Perform(point, tolerance)
+
+            if classifier.State() == OCC.Core.TopAbs.TopAbs_IN:
+                return True
+
+        return False
+
     @staticmethod
     def fuse(shapes: typing.List[oc.TopoDS.TopoDS_Shape]) -> OCC.Core.TopoDS.TopoDS_Shape:
 
@@ -2053,6 +2329,17 @@ class InterrogateUtils:
 
             iterator.Next()
 
+    @staticmethod
+    def all_subshapes_set(shape: OCC.Core.TopoDS.TopoDS_Shape) -> typing.Set[SetPlaceableShape]:
+        """
+        @return: the shape and all of its subshapes. Unlike traverse_all_subshapes, shared subshapes are only visited
+        once, and the traversal is performed natively in a single call.
+        """
+        if not isinstance(shape, OCC.Core.TopoDS.TopoDS_Shape):
+            raise ValueError("TopoDS_Shape expected")
+
+        return set(SetPlaceableShape.of_many(UtilWrapper.map_subshapes(shape)))
+
     @staticmethod
     def linear_properties(shape: OCC.Core.TopoDS.TopoDS_Shape) -> OCC.Core.GProp.GProp_GProps:
         gprops = OCC.Core.GProp.GProp_GProps()
@@ -2541,11 +2828,21 @@ class Drill:
 
     def perform(self, shape: OCC.Core.TopoDS.TopoDS_Shape) -> OCC.Core.TopoDS.TopoDS_Shape:
         result = shape
+
+        # consecutive cuts are independent of each other, so are performed as a single boolean operation
+        pending_cut_tools = []
         for op in self.get_drill_ops(shape):
             if op.is_inverted:
+                if len(pending_cut_tools) > 0:
+                    result = BoolUtils.cut(result, pending_cut_tools)
+                    pending_cut_tools = []
+
                 result = BoolUtils.incremental_fuse([result] + op.shapes)
             else:
-                result = BoolUtils.incremental_cut(result, op.shapes)
+                pending_cut_tools += op.shapes
+
+        if len(pending_cut_tools) > 0:
+            result = BoolUtils.cut(result, pending_cut_tools)
 
         return result
 
@@ -2824,10 +3121,29 @@ class GPUtils:
 
 class SetPlaceableShape:
 
-    def __init__(self, shape: OCC.Core.TopoDS.TopoDS_Shape):
+    __slots__ = ("_shape", "_hash")
+
+    def __init__(self, shape: OCC.Core.TopoDS.TopoDS_Shape, shape_hash: typing.Optional[int] = None):
+        """
+        @param shape: the shape to wrap
+        @param shape_hash: the precomputed TopTools_ShapeMapHasher hash code of the shape, if already known
+        """
         TypeValidator.assert_is_any_shape(shape)
 
         self._shape = shape
+        self._hash = UtilWrapper.shape_map_hasher_hash_code(shape) if shape_hash is None else shape_hash
+
+    @staticmethod
+    def of_many(shapes: typing.Iterable[OCC.Core.TopoDS.TopoDS_Shape]) -> typing.List[SetPlaceableShape]:
+        """
+        Wraps all the specified shapes, computing their hash codes in a single native call.
+        """
+        shapes = list(shapes)
+
+        if len(shapes) == 0:
+            return []
+
+        return [SetPlaceableShape(s, h) for s, h in zip(shapes, UtilWrapper.hash_many(shapes))]
 
     @property
     def shape(self) -> OCC.Core.TopoDS.TopoDS_Shape:
@@ -2845,10 +3161,16 @@ class SetPlaceableShape:
         return str(self)
 
     def __hash__(self) -> int:
-        return UtilWrapper.shape_map_hasher_hash_code(self._shape)
+        return self._hash
 
     def __eq__(self, other: SetPlaceableShape) -> bool:
-        return UtilWrapper.shape_map_hasher_equal(self.shape, other.shape)
+        if self is other:
+            return True
+
+        if self._hash != other._hash:
+            return False
+
+        return UtilWrapper.shape_map_hasher_equal(self._shape, other._shape)
 
 
 class SetPlaceablePart:
@@ -8,17 +8,22 @@ import traceback
 Manages a cache of Part objects. Expensive operations (e.g. gear generation) can be persisted in the cache and only
 recomputed when necessary.
 """
-import copyreg
-import io
-import os.path
-import pickle
+import concurrent.futures
+import enum
+import os
+import sys
+import time
 import typing
 import uuid
-import OCC.Core.TopoDS
-
-from util_wrapper_swig import UtilWrapper
 
 import ezocc
+from ezocc.cache_token_hasher import CacheTokenHasher
+from ezocc.part_cache_blob_store import BlobStore
+from ezocc.part_cache_dedup import ContentAddressedPartStore
+from ezocc.part_cache_eviction import BoundedPartStore, EvictionPolicy, PartCacheStatistics
+from ezocc.part_cache_gc import GarbageCollectionReport, collect_garbage
+from ezocc.part_cache_layout import ShardedCacheLayout, BuildManifest
+from ezocc.part_cache_pack import PartPack
 from ezocc.part_manager import Part, PartFactory, PartSave, CacheToken, PartCache, LazyLoadedPart, \
     NoOpCacheToken
 
@@ -31,12 +36,16 @@ class DefaultCacheToken(CacheToken):
     UUID generation can occur on the fly or
     """
 
-    def __init__(self, cache, *args, **kwargs):
+    def __init__(self, cache, *args, label: typing.Optional[str] = None, **kwargs):
+        """
+        @param label: identifies the call site in instrumentation reports, not part of the token identity
+        """
         self._cache = cache
         self._args = args
         self._kwargs = kwargs
+        self._label = label
 
-        self._uuid = None
+        self._digest: typing.Optional[bytes] = None
 
     @staticmethod
     def with_uuid(uuid_value: str, part_cache: PartCache) -> CacheToken:
@@ -47,43 +56,51 @@ class DefaultCacheToken(CacheToken):
         result = DefaultCacheToken(part_cache)
         result._args = None
         result._kwargs = None
-        result._uuid = uuid_value
+        result._digest = uuid.UUID(uuid_value).bytes
         return result
 
     def get_cache(self) -> PartCache:
         return self._cache
 
+    @property
+    def label(self) -> typing.Optional[str]:
+        return self._label
+
     @staticmethod
-    def _pickle_part(part):
-        # reconstruction is never actually performed, so we can just use a string
-        # with the specified uuid in place.
-        uuid = part.cache_token.compute_uuid()
+    def infer_label(args: typing.Tuple, depth: int = 2) -> str:
+        """
+        @return: a label for a token created with the specified args. Leading string arguments (by convention naming
+        the factory and operation, e.g. "involute_gear_factory", "create_herringbone_gear") are used if present,
+        otherwise the name of the function calling create_token.
+        @param depth: number of frames between this method and the caller of create_token
+        """
+        leading = []
+        for a in args:
+            if not isinstance(a, str):
+                break
+            leading.append(a)
+
+        if len(leading) > 0:
+            return ".".join(leading[:2])
+
+        code = sys._getframe(depth).f_code
+        return getattr(code, "co_qualname", code.co_name)
+
+    def compute_digest(self) -> bytes:
+        """
+        @return: the raw digest the UUID is derived from. Tokens mutated from this one hash this digest in place of
+        re-hashing this token's arguments.
+        """
+        if self._digest is None:
+            self._digest = CacheTokenHasher().update_args(self._args, self._kwargs).digest()
 
-        return str.__class__, tuple(str(uuid))
+        return self._digest
 
     def compute_uuid(self) -> str:
-        if self._uuid is None:
-            f = io.BytesIO()
-            pickler = pickle.Pickler(f)
-            updated_dispatch_table = copyreg.dispatch_table.copy()
-            updated_dispatch_table[Part] = DefaultCacheToken._pickle_part
-            updated_dispatch_table[LazyLoadedPart] = DefaultCacheToken._pickle_part
-            updated_dispatch_table[CacheToken] = lambda t: (str.__class__, tuple(t.compute_uuid()))
-            updated_dispatch_table[DefaultCacheToken] = lambda t: (str.__class__, tuple(t.compute_uuid()))
-            updated_dispatch_table[OCC.Core.TopoDS.TopoDS_Shape] = lambda s: UtilWrapper.shape_to_string(s)
-            pickler.dispatch_table = updated_dispatch_table
-
-            try:
-                pickler.dump((self._args, self._kwargs))
-            except Exception as e:
-                raise RuntimeError(f"Could not generate pickle for uuid, params are: ({self._args}) ({self._kwargs})", e)
-
-            self._uuid = str(uuid.uuid5(uuid.NAMESPACE_URL, str(f.getvalue())))
-
-        return self._uuid
+        return str(uuid.UUID(bytes=self.compute_digest()))
 
     def mutated(self, *args, **kwargs) -> CacheToken:
-        result = DefaultCacheToken(self._cache, self, *args, **kwargs)
+        result = DefaultCacheToken(self._cache, self, *args, label=self._label, **kwargs)
 
         #print(f"{self.compute_uuid()} "
         #      f"(cache = {self._cache}) being mutated with {self}, {args}, {kwargs}, leading to: {result.compute_uuid()}")
@@ -96,81 +113,580 @@ class DefaultCacheToken(CacheToken):
 
 class InMemoryPartCache(PartCache):
 
-    def __init__(self):
-        self._cached_parts: typing.Dict[str, Part] = dict()
+    def __init__(self,
+                 max_cost: typing.Optional[int] = None,
+                 eviction_policy: EvictionPolicy = EvictionPolicy.LRU):
+        """
+        @param max_cost: budget for the estimated memory use (in bytes) of the cached parts. None for no limit.
+        @param eviction_policy: which parts are evicted first once over budget
+        """
+        self._cached_parts = BoundedPartStore(max_cost, eviction_policy)
+
+    @property
+    def statistics(self) -> PartCacheStatistics:
+        return self._cached_parts.statistics
+
+    def create_token(self, *args, label: typing.Optional[str] = None, **kwargs):
+        if label is None and self.instrumentation.enabled:
+            label = DefaultCacheToken.infer_label(args)
 
-    def create_token(self, *args, **kwargs):
-        return DefaultCacheToken(self, *args, **kwargs)
+        return DefaultCacheToken(self, *args, label=label, **kwargs)
+
+    def get(self, part_uuid: str) -> typing.Optional[Part]:
+        """
+        @return: the cached part, or None if not present
+        """
+        return self._cached_parts.get(part_uuid)
+
+    def put(self, part: Part):
+        self._cached_parts.put(part.cache_token.compute_uuid(), part)
 
     def ensure_exists(self, cache_token: CacheToken, factory_method: typing.Callable[[], Part]) -> Part:
+        instrumentation = self.instrumentation
+        start = time.perf_counter()
+
         part_uuid = cache_token.compute_uuid()
-        if part_uuid not in self._cached_parts:
-            part = factory_method()
-            if part.cache_token.compute_uuid() != part_uuid:
-                raise ValueError("Generated Part UUID does not match expected")
 
-            self._cached_parts[part_uuid] = part
+        result = self._cached_parts.get(part_uuid)
+        if result is not None:
+            instrumentation.record_event("hit", cache_token.label, start, time.perf_counter() - start, part_uuid,
+                                         source="memory")
+            return result
+
+        instrumentation.record_event("miss", cache_token.label, start, time.perf_counter() - start, part_uuid)
+
+        build_start = time.perf_counter()
+        result = factory_method()
+        build_duration = time.perf_counter() - build_start
+
+        if result.cache_token.compute_uuid() != part_uuid:
+            raise ValueError("Generated Part UUID does not match expected")
+
+        self._cached_parts.put(part_uuid, result)
+
+        if instrumentation.enabled:
+            instrumentation.record_event("build", cache_token.label, build_start, build_duration, part_uuid,
+                                         estimated_size=self._cached_parts.cost(part_uuid))
+
+        return result
+
+
+class PartCacheBackend(enum.Enum):
+    """
+    File format used by FileBasedPartCache.
+    """
+
+    # OCAF document, readable by other OCC based tools
+    OCAF = "ocaf"
+
+    # BinTools stream of the root shape with subshapes stored as indices, see PartSave.binary. Faster to save and load.
+    BINARY = "binary"
+
+    def layout(self, cache_directory: str) -> ShardedCacheLayout:
+        if self == PartCacheBackend.OCAF:
+            return ShardedCacheLayout(cache_directory)
+        else:
+            return ShardedCacheLayout(cache_directory,
+                                      part_extension=PartSave.BINARY_EXTENSION,
+                                      index_file_name="index.bin")
 
-        return self._cached_parts[part_uuid]
+    def save(self, part: Part, path: str):
+        if self == PartCacheBackend.OCAF:
+            part.save.ocaf(path)
+        else:
+            part.save.binary(path)
+
+    def load(self, path: str, part_cache: PartCache) -> Part:
+        if self == PartCacheBackend.OCAF:
+            return PartSave.load_ocaf(path, part_cache)
+        else:
+            return PartSave.load_binary(path, part_cache)
 
 
 class FileBasedPartCache(PartCache):
 
-    def __init__(self, cache_directory: str):
+    def __init__(self,
+                 cache_directory: str,
+                 max_loaded_cost: typing.Optional[int] = None,
+                 eviction_policy: EvictionPolicy = EvictionPolicy.LRU,
+                 backend: PartCacheBackend = PartCacheBackend.OCAF,
+                 pack_paths: typing.Optional[typing.List[str]] = None,
+                 deduplicate: bool = False):
+        """
+        @param cache_directory: directory the parts are persisted to
+        @param max_loaded_cost: budget for the estimated memory use (in bytes) of the parts kept loaded in memory.
+        None for no limit. Evicted parts are reloaded from the cache directory when next requested.
+        @param eviction_policy: which loaded parts are evicted first once over budget
+        @param backend: the file format parts are persisted in
+        @param pack_paths: read-only pack files (see part_cache_pack) consulted before the cache directory. New parts
+        are still written to the cache directory.
+        @param deduplicate: store parts with identical content once, see part_cache_dedup. Requires the binary backend.
+        """
+        if deduplicate and backend != PartCacheBackend.BINARY:
+            raise ValueError("Deduplication requires the binary backend")
+
         self._cache_directory = cache_directory
-        self._loaded_parts: typing.Dict[str, Part] = dict()
+        self._backend = backend
+
+        if deduplicate:
+            self._content_store = ContentAddressedPartStore(cache_directory)
+            self._layout = ContentAddressedPartStore.layout(cache_directory)
+        else:
+            self._content_store = None
+            self._layout = backend.layout(cache_directory)
+        self._packs = [PartPack(p) for p in (pack_paths if pack_paths is not None else [])]
+        self._loaded_parts = BoundedPartStore(max_loaded_cost, eviction_policy)
+
+        # uuids requested from this cache, recorded in build manifests
+        self._used_uuids: typing.Set[str] = set()
+
+    @property
+    def statistics(self) -> PartCacheStatistics:
+        """
+        @return: statistics for the parts held in memory. Misses include parts that are then loaded from disk.
+        """
+        return self._loaded_parts.statistics
+
+    @property
+    def used_uuids(self) -> typing.Set[str]:
+        """
+        @return: uuids of every part requested from this cache since it was created
+        """
+        return set(self._used_uuids)
+
+    def write_manifest(self, entry_point: str) -> BuildManifest:
+        """
+        Records the parts used by this cache as the manifest of a build entry point (e.g. the name of the script that
+        built them), replacing any previous manifest for the entry point. Parts referenced by a manifest are kept by
+        collect_garbage.
+        """
+        return BuildManifest.write(self._cache_directory, entry_point, self._used_uuids)
+
+    def collect_garbage(self,
+                        max_size: typing.Optional[int] = None,
+                        max_age: typing.Optional[float] = None,
+                        dry_run: bool = False) -> GarbageCollectionReport:
+        """
+        Removes parts in this cache's format that are not referenced by any build manifest, see
+        part_cache_gc.collect_garbage. Parts removed are also dropped from memory. If the cache deduplicates parts,
+        the size budget counts the blobs they refer to, and blobs no longer referred to by any part are removed too.
+        """
+        result = collect_garbage(self._cache_directory, [self._layout], max_size, max_age, dry_run,
+                                 content_store=self._content_store)
+
+        if not dry_run and len(result.removed) > 0:
+            self._loaded_parts.clear()
+
+        return result
+
+    def create_token(self, *args, label: typing.Optional[str] = None, **kwargs):
+        if label is None and self.instrumentation.enabled:
+            label = DefaultCacheToken.infer_label(args)
+
+        return DefaultCacheToken(self, *args, label=label, **kwargs)
+
+    @property
+    def part_extension(self) -> str:
+        return self._layout.part_extension
+
+    @property
+    def deduplicates(self) -> bool:
+        return self._content_store is not None
+
+    def get(self, part_uuid: str, owner: typing.Optional[PartCache] = None) -> typing.Optional[Part]:
+        """
+        @param owner: the cache the tokens of the returned part (and parts derived from it) refer to. Defaults to this
+        cache, other caches using this one as storage (e.g. TieredPartCache) pass themselves.
+        @return: the persisted part, loaded lazily, or None if it is not present in a pack or the cache directory
+        """
+        self._used_uuids.add(part_uuid)
+        return self._get_persisted(part_uuid, self if owner is None else owner)
+
+    def _get_persisted(self, part_uuid: str, owner: PartCache) -> typing.Optional[LazyLoadedPart]:
+        pack = next((p for p in self._packs if part_uuid in p), None)
+        if pack is not None:
+            return LazyLoadedPart(DefaultCacheToken.with_uuid(part_uuid, owner), lambda: pack.load(part_uuid, owner))
+
+        if not self._layout.has(part_uuid):
+            return None
+
+        file_path = self._layout.base_path(part_uuid)
+        return LazyLoadedPart(DefaultCacheToken.with_uuid(part_uuid, owner),
+                              lambda: self._load(file_path, owner))
+
+    def lock(self, part_uuid: str) -> typing.ContextManager[None]:
+        """
+        @return: a context manager holding the exclusive (cross process) lock on the part uuid, held while the part is
+        built and persisted so that concurrent builders of the same part wait rather than duplicate the work. The lock
+        is reentrant, so the methods of this cache may be called while holding it.
+        """
+        return self._layout.lock(part_uuid)
+
+    def put(self, part: Part):
+        """
+        Persists the part to the cache directory, unless it is already present.
+        """
+        part_uuid = part.cache_token.compute_uuid()
+        self._used_uuids.add(part_uuid)
+
+        with self._layout.lock(part_uuid):
+            if not self._layout.has(part_uuid):
+                self._update(part, part.cache_token)
+
+    def prefetch(self,
+                 parts: typing.Iterable[typing.Union[CacheToken, str]],
+                 max_workers: int = 4) -> typing.List[concurrent.futures.Future]:
+        """
+        Starts loading the persisted parts on a pool of background threads, so that loading overlaps with modelling
+        work. Subsequent ensure_exists calls for the parts return them without waiting for a load unless it is still in
+        progress. Parts that are already loaded, or are not persisted, are skipped.
+
+        @param parts: cache tokens or uuids of the parts to load
+        @param max_workers: number of loading threads
+        @return: a future for the load of each part, e.g. to wait for the prefetch to complete
+        """
+        pending: typing.List[LazyLoadedPart] = []
+
+        for p in parts:
+            part_uuid = p if isinstance(p, str) else p.compute_uuid()
+
+            if part_uuid in self._loaded_parts:
+                continue
+
+            part = self._get_persisted(part_uuid, self)
+            if part is None:
+                continue
+
+            # stored from this thread, the store is not thread safe. The loading threads only touch the part itself.
+            self._loaded_parts.put(part_uuid, part)
+            pending.append(part)
+
+        if len(pending) == 0:
+            return []
+
+        logger.info(f"Prefetching {len(pending)} parts")
 
-    def create_token(self, *args, **kwargs):
-        return DefaultCacheToken(self, *args, **kwargs)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                         thread_name_prefix="part_cache_prefetch")
+        try:
+            return [executor.submit(p.load) for p in pending]
+        finally:
+            # the submitted loads still complete, the pool's threads exit once they have
+            executor.shutdown(wait=False)
+
+    def prefetch_manifest(self, entry_point: str, max_workers: int = 4) -> typing.List[concurrent.futures.Future]:
+        """
+        Prefetches the parts used by the previous build of the entry point, see write_manifest and prefetch.
+        """
+        manifest = BuildManifest.read(self._cache_directory, entry_point)
+
+        if manifest is None:
+            logger.info(f"No manifest recorded for {entry_point}, nothing to prefetch")
+            return []
+
+        return self.prefetch(sorted(manifest.part_uuids), max_workers)
+
+    def read_part_file(self, part_uuid: str) -> typing.Optional[bytes]:
+        """
+        @return: the contents of the part file in the cache directory, or None if not present
+        """
+        if not self._layout.has(part_uuid):
+            return None
+
+        with open(self._layout.part_path(part_uuid), "rb") as f:
+            return f.read()
+
+    def write_part_file(self, part_uuid: str, data: bytes):
+        """
+        Adds a part file (e.g. as returned by read_part_file of a cache with the same backend) to the cache directory,
+        unless the part is already present.
+        """
+        with self._layout.lock(part_uuid):
+            if self._layout.has(part_uuid):
+                return
+
+            with self._layout.write(part_uuid) as temp_path:
+                with open(temp_path + self._layout.part_extension, "wb") as f:
+                    f.write(data)
 
     def ensure_exists(self, cache_token: CacheToken, factory_method: typing.Callable[[], Part]) -> Part:
+        instrumentation = self.instrumentation
+        start = time.perf_counter()
+
         token_uuid = cache_token.compute_uuid()
+        self._used_uuids.add(token_uuid)
+
+        loaded_part = self._loaded_parts.get(token_uuid)
+        if loaded_part is not None:
+            instrumentation.record_event("hit", cache_token.label, start, time.perf_counter() - start, token_uuid,
+                                         source="memory")
+            return loaded_part
+
+        pack = next((p for p in self._packs if token_uuid in p), None)
+        if pack is not None:
+            result = LazyLoadedPart(DefaultCacheToken.with_uuid(token_uuid, self),
+                                    self._instrumented_load(cache_token, "pack",
+                                                            lambda: pack.load(token_uuid, self)))
+            self._loaded_parts.put(token_uuid, result)
+            instrumentation.record_event("hit", cache_token.label, start, time.perf_counter() - start, token_uuid,
+                                         source="pack")
+            return result
+
+        source = "disk"
+        if not self._has(cache_token):
+            # other builders of the same part wait here for the first to finish, rather than duplicating the work
+            with self._layout.lock(token_uuid):
+                if not self._has(cache_token):
+                    source = None
+                    instrumentation.record_event("miss", cache_token.label, start, time.perf_counter() - start,
+                                                 token_uuid)
 
-        if token_uuid in self._loaded_parts:
-            return self._loaded_parts[token_uuid]
+                    logger.info(f"Generating part for cache token uuid: {token_uuid}")
+                    build_start = time.perf_counter()
+                    part = factory_method()
+                    build_duration = time.perf_counter() - build_start
 
-        if not self._has(cache_token):
-            logger.info(f"Generating part for cache token uuid: {token_uuid}")
-            part = factory_method()
+                    part_uuid = part.cache_token.compute_uuid()
 
-            part_uuid = part.cache_token.compute_uuid()
+                    if part_uuid != token_uuid:
+                        raise ValueError(
+                            f"Cache token uuid is not as expected (expected {token_uuid}, got {part_uuid})")
 
-            if part_uuid != token_uuid:
-                raise ValueError(f"Cache token uuid is not as expected (expected {token_uuid}, got {part_uuid})")
+                    instrumentation.record_event("build", cache_token.label, build_start, build_duration, token_uuid)
 
-            self._update(part, cache_token)
+                    self._update(part, cache_token)
+
+        if source is not None:
+            instrumentation.record_event("hit", cache_token.label, start, time.perf_counter() - start, token_uuid,
+                                         source=source)
 
         logger.debug(f"Retrieving part for cache token uuid: {cache_token.compute_uuid()}")
-        result = self._get(cache_token)
+        result = self._get(cache_token, factory_method)
 
         if result.cache_token.compute_uuid() != cache_token.compute_uuid():
             raise ValueError("Cache retrieved object not as expected")
 
-        self._loaded_parts[token_uuid] = result
+        self._loaded_parts.put(token_uuid, result)
 
         return result
 
-    def _get(self, token) -> typing.Optional[LazyLoadedPart]:
-        cache_uuid = token.compute_uuid()
-        return self._get_from_uuid(cache_uuid)
+    def _instrumented_load(self,
+                           cache_token: CacheToken,
+                           source: str,
+                           load_method: typing.Callable[[], Part]) -> typing.Callable[[], Part]:
+        """
+        @return: load_method, wrapped to report the load time to the instrumentation (if enabled)
+        """
+        instrumentation = self.instrumentation
+        if not instrumentation.enabled:
+            return load_method
+
+        label = cache_token.label
+        token_uuid = cache_token.compute_uuid()
+
+        def _load() -> Part:
+            start = time.perf_counter()
+            result = load_method()
+            instrumentation.record_event("load", label, start, time.perf_counter() - start, token_uuid,
+                                         source=source)
+            return result
+
+        return _load
+
+    def _get(self, token, factory_method: typing.Callable[[], Part]) -> typing.Optional[LazyLoadedPart]:
+        return LazyLoadedPart(DefaultCacheToken.with_uuid(token.compute_uuid(), self),
+                              self._instrumented_load(token, "disk",
+                                                      lambda: self._load_or_rebuild(token, factory_method)))
+
+    def _load_or_rebuild(self, cache_token: CacheToken, factory_method: typing.Callable[[], Part]) -> Part:
+        """
+        Loads the persisted part. The layout answers lookups from its index, which may still list a part whose file
+        has since been removed (e.g. by garbage collection in another process), so the file is only checked when
+        loading fails. A missing part is then forgotten, rebuilt with the factory method and persisted again.
+        """
+        token_uuid = cache_token.compute_uuid()
+        file_path = self._layout.base_path(token_uuid)
+        part_path = self._layout.part_path(token_uuid)
+
+        try:
+            return self._load(file_path, self)
+        except Exception as e:
+            if not isinstance(e, FileNotFoundError) and os.path.exists(part_path):
+                raise
+
+            logger.warning(f"Part {token_uuid} could not be loaded, rebuilding: {e}")
+
+        with self._layout.lock(token_uuid):
+            # another process may have rebuilt the part while we waited for the lock
+            if os.path.exists(part_path):
+                try:
+                    return self._load(file_path, self)
+                except FileNotFoundError:
+                    # e.g. the blob a deduplicated part points to has been removed
+                    pass
+
+            self._layout.discard(token_uuid)
+            part = factory_method()
+
+            if part.cache_token.compute_uuid() != token_uuid:
+                raise ValueError(
+                    f"Cache token uuid is not as expected (expected {token_uuid}, got {part.cache_token.compute_uuid()})")
+
+            self._update(part, cache_token)
+
+        return part
 
     def _has(self, cache_token: CacheToken) -> bool:
-        cache_uuid = cache_token.compute_uuid()
-        file_path = os.path.join(self._cache_directory, cache_uuid) + ".part.cbf"
-        return os.path.exists(file_path)
+        return self._layout.has(cache_token.compute_uuid())
 
     def _update(self, part: Part, cache_token: CacheToken) -> Part:
         cache_uuid = cache_token.compute_uuid()
-        file_path = os.path.join(self._cache_directory, cache_uuid)
 
         logger.info(f"Saving part uuid: {cache_uuid}")
 
-        part.save.ocaf(file_path)
+        start = time.perf_counter()
+
+        with self._layout.write(cache_uuid) as temp_path:
+            if self._content_store is not None:
+                self._content_store.save(part, temp_path)
+            else:
+                self._backend.save(part, temp_path)
+
+        if self.instrumentation.enabled:
+            self.instrumentation.record_event("save", cache_token.label, start, time.perf_counter() - start, cache_uuid,
+                                              size=os.path.getsize(self._layout.part_path(cache_uuid)))
 
         return part
 
-    def _get_from_uuid(self, uuid: str) -> typing.Optional[LazyLoadedPart]:
-        file_path = os.path.join(self._cache_directory, uuid)
+    def _load(self, file_path: str, owner: PartCache) -> Part:
+        if self._content_store is not None:
+            return self._content_store.load(file_path, owner)
+
+        return self._backend.load(file_path, owner)
+
+
+class TieredPartCache(PartCache):
+    """
+    Chains an InMemoryPartCache, a FileBasedPartCache and a (typically shared) BlobStore. Lookups fall through the
+    tiers in that order and parts found in a lower tier are promoted to the tiers above. Parts built on a miss are
+    stored in every tier.
+    """
+
+    def __init__(self,
+                 memory: typing.Optional[InMemoryPartCache] = None,
+                 file: typing.Optional[FileBasedPartCache] = None,
+                 remote: typing.Optional[BlobStore] = None,
+                 upload: bool = True):
+        """
+        @param memory: defaults to an unbounded InMemoryPartCache
+        @param file: local persistent tier, required if remote is specified as parts are transferred as part files
+        @param remote: shared tier, keyed by part file name. Errors communicating with it are logged and treated as
+        misses, so an unavailable remote does not fail the build.
+        @param upload: if False, parts are only downloaded from the remote, never uploaded to it
+        """
+        if remote is not None and file is None:
+            raise ValueError("A remote tier requires a file tier")
+
+        if remote is not None and file.deduplicates:
+            raise ValueError("Part files of a deduplicating file tier are pointers, so cannot be shared with a remote")
+
+        self._memory = memory if memory is not None else InMemoryPartCache()
+        self._file = file
+        self._remote = remote
+        self._upload = upload
+
+    @property
+    def statistics(self) -> PartCacheStatistics:
+        return self._memory.statistics
+
+    def create_token(self, *args, label: typing.Optional[str] = None, **kwargs):
+        if label is None and self.instrumentation.enabled:
+            label = DefaultCacheToken.infer_label(args)
+
+        return DefaultCacheToken(self, *args, label=label, **kwargs)
+
+    def ensure_exists(self, cache_token: CacheToken, factory_method: typing.Callable[[], Part]) -> Part:
+        instrumentation = self.instrumentation
+        start = time.perf_counter()
+
+        part_uuid = cache_token.compute_uuid()
+
+        result = self._memory.get(part_uuid)
+        if result is not None:
+            instrumentation.record_event("hit", cache_token.label, start, time.perf_counter() - start, part_uuid,
+                                         source="memory")
+            return result
+
+        result, source = self._get_from_lower_tiers(part_uuid)
+
+        if result is None and self._file is not None:
+            # other builders of the same part (sharing the file tier) wait here for the first to finish, then find the
+            # part in the file tier
+            with self._file.lock(part_uuid):
+                result, source = self._get_from_lower_tiers(part_uuid)
+
+                if result is None:
+                    result = self._build(cache_token, factory_method, start)
+
+                    self._file.put(result)
+
+                    if self._remote is not None and self._upload:
+                        self._remote_put(part_uuid)
+        elif result is None:
+            result = self._build(cache_token, factory_method, start)
+
+        if source is not None:
+            instrumentation.record_event("hit", cache_token.label, start, time.perf_counter() - start, part_uuid,
+                                         source=source)
+
+        self._memory.put(result)
+
+        return result
+
+    def _build(self, cache_token: CacheToken, factory_method: typing.Callable[[], Part], start: float) -> Part:
+        instrumentation = self.instrumentation
+        part_uuid = cache_token.compute_uuid()
+
+        instrumentation.record_event("miss", cache_token.label, start, time.perf_counter() - start, part_uuid)
+
+        build_start = time.perf_counter()
+        result = factory_method()
+        instrumentation.record_event("build", cache_token.label, build_start, time.perf_counter() - build_start,
+                                     part_uuid)
+
+        if result.cache_token.compute_uuid() != part_uuid:
+            raise ValueError("Generated Part UUID does not match expected")
+
+        return result
+
+    def _remote_key(self, part_uuid: str) -> str:
+        return part_uuid + self._file.part_extension
+
+    def _get_from_lower_tiers(self, part_uuid: str) -> typing.Tuple[typing.Optional[Part], typing.Optional[str]]:
+        if self._file is None:
+            return None, None
+
+        result = self._file.get(part_uuid, owner=self)
+        if result is not None:
+            return result, "disk"
+
+        if self._remote is None:
+            return None, None
+
+        try:
+            data = self._remote.get(self._remote_key(part_uuid))
+        except OSError as e:
+            logger.warning(f"Could not retrieve part {part_uuid} from remote cache: {e}")
+            return None, None
+
+        if data is None:
+            return None, None
+
+        self._file.write_part_file(part_uuid, data)
+        return self._file.get(part_uuid, owner=self), "remote"
 
-        return LazyLoadedPart(DefaultCacheToken.with_uuid(uuid, self),
-                              lambda: PartSave.load_ocaf(file_path, self))
+    def _remote_put(self, part_uuid: str):
+        try:
+            self._remote.put(self._remote_key(part_uuid), self._file.read_part_file(part_uuid))
+        except OSError as e:
+            logger.warning(f"Could not upload part {part_uuid} to remote cache: {e}")
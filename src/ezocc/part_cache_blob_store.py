@@ -0,0 +1,127 @@
+"""
+Key/value stores for part files, used as the shared (e.g. team wide) tier of a TieredPartCache. Keys are part file
+names (part uuid and extension), values the contents of the part file.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import typing
+import urllib.error
+import urllib.parse
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        """
+        @return: the blob stored under the key, or None if there is none
+        """
+        raise NotImplementedError()
+
+    def put(self, key: str, data: bytes):
+        """
+        Stores the blob, replacing any existing blob with the same key.
+        """
+        raise NotImplementedError()
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    @staticmethod
+    def _validate_key(key: str):
+        if key == "" or "/" in key or "\\" in key or key.startswith("."):
+            raise ValueError(f"Invalid blob key: {key}")
+
+
+class LocalDirectoryBlobStore(BlobStore):
+    """
+    Stores blobs as files in a directory, e.g. on a network share.
+    """
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        BlobStore._validate_key(key)
+        return os.path.join(self._directory, key)
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        path = self._path(key)
+
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "rb") as f:
+            return f.read()
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        temp_path = os.path.join(self._directory, f".tmp_{key}_{os.getpid()}_{secrets.token_hex(4)}")
+
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+
+class HttpBlobStore(BlobStore):
+    """
+    Stores blobs on an HTTP server as <base_url>/<key>: GET retrieves a blob (404 if absent), PUT stores one and HEAD
+    checks for one. Any server supporting those requests (e.g. a WebDAV share or object store gateway) may be used.
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 timeout: float = 30,
+                 headers: typing.Optional[typing.Dict[str, str]] = None):
+        """
+        @param headers: added to every request, e.g. for authorization
+        """
+        self._base_url = base_url.rstrip("/")
+        self._timeout = timeout
+        self._headers = headers if headers is not None else dict()
+
+    def _request(self, key: str, method: str, data: typing.Optional[bytes] = None) -> urllib.request.Request:
+        BlobStore._validate_key(key)
+
+        return urllib.request.Request(f"{self._base_url}/{urllib.parse.quote(key)}",
+                                      data=data,
+                                      method=method,
+                                      headers=self._headers)
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        try:
+            with urllib.request.urlopen(self._request(key, "GET"), timeout=self._timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+
+            raise
+
+    def put(self, key: str, data: bytes):
+        with urllib.request.urlopen(self._request(key, "PUT", data), timeout=self._timeout):
+            pass
+
+    def has(self, key: str) -> bool:
+        try:
+            with urllib.request.urlopen(self._request(key, "HEAD"), timeout=self._timeout):
+                return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+
+            raise
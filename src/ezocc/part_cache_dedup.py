@@ -0,0 +1,180 @@
+"""
+Content-addressed storage of parts for FileBasedPartCache. Different cache tokens sometimes produce identical parts
+(e.g. tr.mv(dx=0)). Rather than each storing a copy, parts are saved in the binary part format without their uuid and
+stored once, named by the hash of the file contents. Each cache entry is then a small pointer file naming its blob:
+
+    <cache_directory>/
+        <ab>/<uuid>.part.ref            {"uuid": <uuid>, "blob": <digest>}
+        blobs/<cd>/<digest>.blob        binary part file, shared by every entry with identical content
+
+Before hashing, a compound root shape is canonicalised by ordering its direct children by the hash of their own
+serialisation, so e.g. compound(a, b) and compound(b, a) share a blob. Only the root's children are reordered: nested
+compounds and the order of the subshapes under each label are kept as built, as the latter is visible to callers, so
+parts differing only there are still stored separately.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import secrets
+import typing
+
+import OCC.Core.BRep
+import OCC.Core.TopAbs
+import OCC.Core.TopoDS
+
+from util_wrapper_swig import UtilWrapper
+
+from ezocc.part_cache_layout import ShardedCacheLayout
+from ezocc.part_manager import Part, PartCache, PartSave
+
+logger = logging.getLogger(__name__)
+
+
+class ContentAddressedPartStore:
+
+    POINTER_EXTENSION = ".part.ref"
+
+    BLOB_EXTENSION = ".blob"
+
+    BLOB_DIRECTORY_NAME = "blobs"
+
+    def __init__(self, cache_directory: str, shard_prefix_length: int = 2):
+        self._blob_directory = os.path.join(cache_directory, ContentAddressedPartStore.BLOB_DIRECTORY_NAME)
+        self._shard_prefix_length = shard_prefix_length
+
+    @staticmethod
+    def layout(cache_directory: str) -> ShardedCacheLayout:
+        """
+        @return: the layout of the pointer files
+        """
+        return ShardedCacheLayout(cache_directory,
+                                  part_extension=ContentAddressedPartStore.POINTER_EXTENSION,
+                                  index_file_name="index.ref")
+
+    @property
+    def blob_directory(self) -> str:
+        return self._blob_directory
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_directory,
+                            digest[:self._shard_prefix_length],
+                            digest + ContentAddressedPartStore.BLOB_EXTENSION)
+
+    def save(self, part: Part, path: str):
+        """
+        Stores the part's content as a blob (unless an identical blob is already stored) and writes a pointer to it.
+
+        @param path: path of the pointer file, without extension
+        """
+        os.makedirs(self._blob_directory, exist_ok=True)
+
+        temp_base_path = os.path.join(self._blob_directory, f"tmp_{os.getpid()}_{secrets.token_hex(4)}")
+        temp_path = temp_base_path + PartSave.BINARY_EXTENSION
+
+        try:
+            ContentAddressedPartStore._canonical(part).save.binary(temp_base_path, include_uuid=False)
+
+            digest = ContentAddressedPartStore._digest(temp_path)
+            blob_path = self.blob_path(digest)
+
+            if os.path.exists(blob_path):
+                logger.debug(f"Part {part.cache_token.compute_uuid()} shares blob {digest}")
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(temp_path, blob_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        with open(path + ContentAddressedPartStore.POINTER_EXTENSION, "w") as f:
+            json.dump({"uuid": part.cache_token.compute_uuid(), "blob": digest}, f)
+
+    def load(self, path: str, part_cache: PartCache) -> Part:
+        """
+        @param path: path of the pointer file, without extension
+        @raise FileNotFoundError: if the pointer file or the blob it refers to is missing
+        """
+        pointer = ContentAddressedPartStore.read_pointer(path + ContentAddressedPartStore.POINTER_EXTENSION)
+
+        blob_path = self.blob_path(pointer["blob"])
+        if not os.path.exists(blob_path):
+            raise FileNotFoundError(f"Blob {blob_path} referred to by {path} is missing")
+
+        return PartSave.load_binary(blob_path[:-len(ContentAddressedPartStore.BLOB_EXTENSION)],
+                                    part_cache,
+                                    extension=ContentAddressedPartStore.BLOB_EXTENSION,
+                                    part_uuid=pointer["uuid"])
+
+    def remove_unreferenced_blobs(self, pointer_paths: typing.Iterable[str], dry_run: bool = False) -> typing.List[str]:
+        """
+        Removes blobs that are not referred to by any of the pointer files.
+
+        @return: the paths of the removed blobs
+        """
+        referenced = {ContentAddressedPartStore.read_pointer(p)["blob"] for p in pointer_paths}
+
+        result = []
+        for directory, _, file_names in os.walk(self._blob_directory):
+            for file_name in file_names:
+                if not file_name.endswith(ContentAddressedPartStore.BLOB_EXTENSION):
+                    continue
+
+                if file_name[:-len(ContentAddressedPartStore.BLOB_EXTENSION)] not in referenced:
+                    result.append(os.path.join(directory, file_name))
+
+        if not dry_run:
+            for path in result:
+                os.remove(path)
+
+        return result
+
+    @staticmethod
+    def read_pointer(path: str) -> typing.Dict[str, str]:
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _canonical(part: Part) -> Part:
+        """
+        @return: the part with the children of a compound root shape ordered by the hash of their serialisation. The
+        children themselves are kept, so labelled subshapes remain subshapes of the new root.
+        """
+        root = part.shape
+
+        if root.ShapeType() != OCC.Core.TopAbs.TopAbs_COMPOUND:
+            return part
+
+        children = []
+        iterator = OCC.Core.TopoDS.TopoDS_Iterator(root, False, False)
+        while iterator.More():
+            children.append(iterator.Value())
+            iterator.Next()
+
+        children.sort(key=lambda c: hashlib.sha256(UtilWrapper.shape_to_binary(c)).digest())
+
+        builder = OCC.Core.BRep.BRep_Builder()
+        compound = OCC.Core.TopoDS.TopoDS_Compound()
+        builder.MakeCompound(compound)
+        for c in children:
+            builder.Add(compound, c)
+
+        canonical_root = compound.Located(root.Location()).Oriented(root.Orientation())
+
+        return Part(part.cache_token, part.subshapes_with_updated_root_shape(canonical_root))
+
+    @staticmethod
+    def _digest(path: str) -> str:
+        """
+        @return: the hash of the raw file contents. Files differing in any byte, even if they describe equivalent
+        shapes, have different digests.
+        """
+        result = hashlib.sha256()
+
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                result.update(chunk)
+
+        return result.hexdigest()
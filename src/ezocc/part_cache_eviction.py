@@ -0,0 +1,250 @@
+"""
+Bounded storage of loaded Parts for the PartCache implementations. Parts are evicted once the estimated memory cost of
+the stored parts exceeds a configurable budget.
+"""
+from __future__ import annotations
+
+import collections
+import enum
+import logging
+import threading
+import typing
+
+import OCC.Core.BRep
+import OCC.Core.TopAbs
+import OCC.Core.TopExp
+import OCC.Core.TopLoc
+import OCC.Core.TopTools
+import OCC.Core.TopoDS
+
+from ezocc.part_manager import Part, LazyLoadedPart
+
+logger = logging.getLogger(__name__)
+
+
+class EvictionPolicy(enum.Enum):
+    # evict the least recently used part first
+    LRU = "lru"
+
+    # evict the least frequently used part first, ties are broken by recency
+    LFU = "lfu"
+
+
+class PartCostEstimator:
+    """
+    Estimates the memory used by a Part, in bytes, from the complexity of its shape. The figures are rough: they are
+    only intended to be proportional to the real memory use.
+    """
+
+    VERTEX_COST = 200
+    EDGE_COST = 1000
+    FACE_COST = 2000
+    TRIANGULATION_NODE_COST = 24
+    TRIANGLE_COST = 12
+
+    # parts that have not been loaded yet only hold a token and a loader
+    UNLOADED_PART_COST = 1000
+
+    @staticmethod
+    def estimate(part: Part) -> int:
+        if isinstance(part, LazyLoadedPart) and not part.is_loaded:
+            return PartCostEstimator.UNLOADED_PART_COST
+
+        shape = part.shape
+
+        result = PartCostEstimator.VERTEX_COST * PartCostEstimator._count(shape, OCC.Core.TopAbs.TopAbs_VERTEX) + \
+            PartCostEstimator.EDGE_COST * PartCostEstimator._count(shape, OCC.Core.TopAbs.TopAbs_EDGE)
+
+        faces = OCC.Core.TopTools.TopTools_IndexedMapOfShape()
+        OCC.Core.TopExp.topexp.MapShapes(shape, OCC.Core.TopAbs.TopAbs_FACE, faces)
+
+        result += PartCostEstimator.FACE_COST * faces.Extent()
+
+        for i in range(1, faces.Extent() + 1):
+            triangulation = OCC.Core.BRep.BRep_Tool.Triangulation(
+                OCC.Core.TopoDS.topods.Face(faces.FindKey(i)), OCC.Core.TopLoc.TopLoc_Location())
+
+            if triangulation is not None:
+                result += PartCostEstimator.TRIANGULATION_NODE_COST * triangulation.NbNodes() + \
+                    PartCostEstimator.TRIANGLE_COST * triangulation.NbTriangles()
+
+        return result
+
+    @staticmethod
+    def _count(shape: OCC.Core.TopoDS.TopoDS_Shape, shape_type: OCC.Core.TopAbs.TopAbs_ShapeEnum) -> int:
+        shapes = OCC.Core.TopTools.TopTools_IndexedMapOfShape()
+        OCC.Core.TopExp.topexp.MapShapes(shape, shape_type, shapes)
+        return shapes.Extent()
+
+
+class PartCacheStatistics:
+    """
+    estimated_cost is only tracked by stores with a budget, unbounded stores do not estimate the cost of their parts.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = 0
+        self.estimated_cost = 0
+
+    def as_dict(self) -> typing.Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self.entries,
+            "estimated_cost": self.estimated_cost
+        }
+
+    def __str__(self) -> str:
+        return f"PartCacheStatistics({self.as_dict()})"
+
+
+class _StoreEntry:
+
+    def __init__(self, part: Part, cost: int):
+        self.part = part
+        self.cost = cost
+        self.use_count = 0
+
+        # costs of unloaded lazy parts are re-estimated once the part has loaded, see BoundedPartStore._on_loaded
+        self.cost_is_provisional = isinstance(part, LazyLoadedPart) and not part.is_loaded
+
+
+class BoundedPartStore:
+    """
+    Maps part UUIDs to parts, evicting parts according to the eviction policy once the total estimated cost of the
+    stored parts exceeds max_cost. The most recently stored part is never evicted, even if it alone exceeds the budget.
+    Unloaded LazyLoadedParts are stored at a provisional cost, which is re-estimated (evicting other parts if needed)
+    as soon as the part loads, e.g. through attribute access.
+    """
+
+    def __init__(self,
+                 max_cost: typing.Optional[int] = None,
+                 policy: EvictionPolicy = EvictionPolicy.LRU,
+                 cost_estimator: typing.Callable[[Part], int] = PartCostEstimator.estimate):
+        """
+        @param max_cost: the budget for the estimated cost of the stored parts, None for an unbounded store. Unbounded
+        stores only estimate the cost of a part when it is requested through cost().
+        @param policy: which parts to evict first when over budget
+        @param cost_estimator: estimates the cost of a part, by default its approximate memory use in bytes
+        """
+        if max_cost is not None and max_cost <= 0:
+            raise ValueError("max_cost must be positive")
+
+        self._max_cost = max_cost
+        self._policy = policy
+        self._cost_estimator = cost_estimator
+
+        # ordered from least to most recently used
+        self._entries: typing.OrderedDict[str, _StoreEntry] = collections.OrderedDict()
+
+        # lazy parts may load, and so update the store, on other threads (e.g. when prefetching)
+        self._lock = threading.RLock()
+
+        self._statistics = PartCacheStatistics()
+
+    @property
+    def statistics(self) -> PartCacheStatistics:
+        return self._statistics
+
+    def __contains__(self, part_uuid: str) -> bool:
+        return part_uuid in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def cost(self, part_uuid: str) -> typing.Optional[int]:
+        """
+        @return: the estimated cost of the stored part, or None if not present
+        """
+        with self._lock:
+            entry = self._entries.get(part_uuid)
+
+            if entry is None:
+                return None
+
+            if self._max_cost is None:
+                return self._cost_estimator(entry.part)
+
+            return entry.cost
+
+    def get(self, part_uuid: str) -> typing.Optional[Part]:
+        """
+        @return: the stored part, or None if not present. Updates the hit/miss counts.
+        """
+        with self._lock:
+            entry = self._entries.get(part_uuid)
+
+            if entry is None:
+                self._statistics.misses += 1
+                return None
+
+            self._statistics.hits += 1
+
+            entry.use_count += 1
+            self._entries.move_to_end(part_uuid)
+
+            return entry.part
+
+    def put(self, part_uuid: str, part: Part):
+        with self._lock:
+            existing = self._entries.pop(part_uuid, None)
+            if existing is not None:
+                self._set_cost(existing, 0)
+
+            entry = _StoreEntry(part, 0)
+
+            # estimating walks the part's topology, which is only worthwhile when there is a budget to enforce
+            if self._max_cost is not None:
+                self._set_cost(entry, self._cost_estimator(part))
+
+            self._entries[part_uuid] = entry
+            self._statistics.entries = len(self._entries)
+
+            self._evict(keep=part_uuid)
+
+        if self._max_cost is not None and entry.cost_is_provisional:
+            part.add_load_listener(lambda: self._on_loaded(part_uuid, entry))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._statistics.entries = 0
+            self._statistics.estimated_cost = 0
+
+    def _on_loaded(self, part_uuid: str, entry: _StoreEntry):
+        with self._lock:
+            # the part may since have been evicted or replaced
+            if self._entries.get(part_uuid) is not entry:
+                return
+
+            self._set_cost(entry, self._cost_estimator(entry.part))
+            entry.cost_is_provisional = False
+
+            self._evict(keep=part_uuid)
+
+    def _set_cost(self, entry: _StoreEntry, cost: int):
+        self._statistics.estimated_cost += cost - entry.cost
+        entry.cost = cost
+
+    def _evict(self, keep: str):
+        if self._max_cost is None:
+            return
+
+        while self._statistics.estimated_cost > self._max_cost and len(self._entries) > 1:
+            candidates = (k for k in self._entries.keys() if k != keep)
+
+            if self._policy == EvictionPolicy.LRU:
+                victim = next(candidates)
+            else:
+                victim = min(candidates, key=lambda k: self._entries[k].use_count)
+
+            logger.debug(f"Evicting part {victim} from cache")
+
+            self._set_cost(self._entries.pop(victim), 0)
+            self._statistics.evictions += 1
+
+        self._statistics.entries = len(self._entries)
@@ -0,0 +1,272 @@
+"""
+Garbage collection of FileBasedPartCache directories. Every change to a part's parameters (or source) produces a new
+cache entry, so without collection the cache directory only grows.
+
+Builds record the parts they used as a manifest per entry point (see FileBasedPartCache.write_manifest). Collection
+only removes parts not referenced by any manifest: the oldest first, until the cache is within the size budget, plus
+any older than the age budget. Collection should not run while builds are using the cache.
+
+Usage:
+
+    python -m ezocc.part_cache_gc <cache_directory> --max-size 10G --max-age-days 30 --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import logging
+import os
+import sys
+import time
+import typing
+
+from ezocc.part_cache_layout import ShardedCacheLayout, BuildManifest
+
+if typing.TYPE_CHECKING:
+    from ezocc.part_cache_dedup import ContentAddressedPartStore
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+
+    def __init__(self,
+                 part_uuid: str,
+                 path: str,
+                 size: int,
+                 modified: float,
+                 layout: ShardedCacheLayout,
+                 blob: typing.Optional[str] = None,
+                 blob_size: int = 0):
+        """
+        @param size: of the part file
+        @param blob: for a deduplicated part, the digest of the blob its pointer file refers to
+        @param blob_size: of that blob, which may be shared with other entries
+        """
+        self.part_uuid = part_uuid
+        self.path = path
+        self.size = size
+        self.modified = modified
+        self.layout = layout
+        self.blob = blob
+        self.blob_size = blob_size
+
+
+def _size_on_disk(entries: typing.Iterable[CacheEntry]) -> int:
+    """
+    @return: the size of the entries' part files plus that of the blobs they refer to, each counted once
+    """
+    entries = list(entries)
+    blob_sizes = {e.blob: e.blob_size for e in entries if e.blob is not None}
+
+    return sum(e.size for e in entries) + sum(blob_sizes.values())
+
+
+class GarbageCollectionReport:
+
+    def __init__(self,
+                 dry_run: bool,
+                 referenced_count: int,
+                 kept: typing.List[CacheEntry],
+                 removed: typing.List[CacheEntry],
+                 removed_temp_files: typing.List[str],
+                 removed_blobs: typing.List[str] = None):
+        self.dry_run = dry_run
+        self.referenced_count = referenced_count
+        self.kept = kept
+        self.removed = removed
+        self.removed_temp_files = removed_temp_files
+        self.removed_blobs = removed_blobs if removed_blobs is not None else []
+
+    @property
+    def kept_bytes(self) -> int:
+        return _size_on_disk(self.kept)
+
+    @property
+    def removed_bytes(self) -> int:
+        # blobs still referred to by a kept entry are not freed
+        return _size_on_disk(self.kept + self.removed) - _size_on_disk(self.kept)
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "dry_run": self.dry_run,
+            "referenced_count": self.referenced_count,
+            "kept_count": len(self.kept),
+            "kept_bytes": self.kept_bytes,
+            "removed_count": len(self.removed),
+            "removed_bytes": self.removed_bytes,
+            "removed": [e.path for e in self.removed],
+            "removed_temp_files": self.removed_temp_files,
+            "removed_blobs": self.removed_blobs
+        }
+
+    def __str__(self) -> str:
+        verb = "Would remove" if self.dry_run else "Removed"
+
+        lines = [f"{verb} {len(self.removed)} parts ({self.removed_bytes / 1e6:.1f} MB) and "
+                 f"{len(self.removed_temp_files)} temporary files, keeping {len(self.kept)} parts "
+                 f"({self.kept_bytes / 1e6:.1f} MB, {self.referenced_count} referenced by manifests)"]
+
+        if len(self.removed_blobs) > 0:
+            lines.append(f"{verb} {len(self.removed_blobs)} blobs no longer referred to by any part")
+
+        for e in self.removed:
+            lines.append(f"    {e.path} ({e.size / 1e3:.1f} kB, {(time.time() - e.modified) / 86400:.1f} days old)")
+
+        return "\n".join(lines)
+
+
+# temporary files older than this were left by builds that did not complete
+STALE_TEMP_FILE_AGE = 24 * 60 * 60
+
+
+def collect_garbage(cache_directory: str,
+                    layouts: typing.List[ShardedCacheLayout],
+                    max_size: typing.Optional[int] = None,
+                    max_age: typing.Optional[float] = None,
+                    dry_run: bool = False,
+                    content_store: typing.Optional[ContentAddressedPartStore] = None) -> GarbageCollectionReport:
+    """
+    Removes parts not referenced by any build manifest in the cache directory.
+
+    @param layouts: the layouts (one per part file format) of the parts in the cache directory
+    @param max_size: size budget in bytes. Unreferenced parts are removed, oldest first, until the total size of the
+    parts (including the blobs of deduplicated parts, each counted once) is within the budget.
+    @param max_age: age budget in seconds. Unreferenced parts last written longer ago than this are removed.
+    If neither budget is specified, all unreferenced parts are removed.
+    @param dry_run: if True, nothing is removed and the report lists what would have been
+    @param content_store: the store of the blobs deduplicated parts refer to, if layouts include its pointer files.
+    Blobs no longer referred to by a kept part are removed.
+    """
+    manifests = BuildManifest.read_all(cache_directory)
+
+    if len(manifests) == 0 and max_size is None and max_age is None:
+        raise ValueError(f"No build manifests found in {cache_directory}, every part would be removed. "
+                         f"Specify a size or age budget, or record a manifest for each entry point.")
+
+    referenced: typing.Set[str] = set()
+    for m in manifests:
+        referenced.update(m.part_uuids)
+
+    now = time.time()
+
+    entries: typing.List[CacheEntry] = []
+    for layout in layouts:
+        is_pointer_layout = content_store is not None and layout.part_extension == content_store.POINTER_EXTENSION
+
+        for part_uuid, path in layout.scan():
+            stat = os.stat(path)
+
+            blob = None
+            blob_size = 0
+            if is_pointer_layout:
+                blob = content_store.read_pointer(path)["blob"]
+                blob_path = content_store.blob_path(blob)
+                blob_size = os.stat(blob_path).st_size if os.path.exists(blob_path) else 0
+
+            entries.append(CacheEntry(part_uuid, path, stat.st_size, stat.st_mtime, layout, blob, blob_size))
+
+    # oldest first
+    candidates = sorted((e for e in entries if e.part_uuid not in referenced), key=lambda e: e.modified)
+
+    if max_size is None and max_age is None:
+        removed = candidates
+        removed_paths = {e.path for e in removed}
+    else:
+        removed = [e for e in candidates if max_age is not None and now - e.modified > max_age]
+        removed_paths = {e.path for e in removed}
+
+        if max_size is not None:
+            remaining = [e for e in entries if e.path not in removed_paths]
+            remaining_size = _size_on_disk(remaining)
+
+            # a blob is only freed once every entry referring to it is removed
+            blob_references = collections.Counter(e.blob for e in remaining if e.blob is not None)
+
+            for e in candidates:
+                if remaining_size <= max_size:
+                    break
+
+                if e.path not in removed_paths:
+                    removed.append(e)
+                    removed_paths.add(e.path)
+                    remaining_size -= e.size
+
+                    if e.blob is not None:
+                        blob_references[e.blob] -= 1
+                        if blob_references[e.blob] == 0:
+                            remaining_size -= e.blob_size
+
+    kept = [e for e in entries if e.path not in removed_paths]
+
+    removed_temp_files = []
+    for directory, subdirectories, file_names in os.walk(cache_directory):
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            if ShardedCacheLayout.TEMP_PREFIX in file_name and now - os.stat(path).st_mtime > STALE_TEMP_FILE_AGE:
+                removed_temp_files.append(path)
+
+    result = GarbageCollectionReport(dry_run, len(referenced), kept, removed, removed_temp_files)
+
+    if not dry_run:
+        for e in removed:
+            logger.info(f"Removing unreferenced part {e.path}")
+            e.layout.remove(e.part_uuid)
+
+    if content_store is not None:
+        result.removed_blobs = content_store.remove_unreferenced_blobs(
+            [e.path for e in kept if e.blob is not None], dry_run)
+
+    if dry_run:
+        return result
+
+    for path in removed_temp_files:
+        os.remove(path)
+
+    for layout in layouts:
+        layout.index.rewrite({e.part_uuid for e in kept if e.layout is layout})
+
+    return result
+
+
+def parse_size(size: str) -> int:
+    """
+    @param size: e.g. "500M", "10G" or a number of bytes
+    """
+    units = {"K": 10 ** 3, "M": 10 ** 6, "G": 10 ** 9, "T": 10 ** 12}
+
+    size = size.strip().upper().rstrip("B")
+
+    if len(size) > 0 and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+
+    return int(size)
+
+
+def main(args: typing.List[str] = None) -> int:
+    from ezocc.part_cache import PartCacheBackend
+    from ezocc.part_cache_dedup import ContentAddressedPartStore
+
+    parser = argparse.ArgumentParser(description="Remove unreferenced parts from a part cache directory")
+    parser.add_argument("cache_directory")
+    parser.add_argument("--max-size", type=parse_size, default=None, help="size budget, e.g. 10G")
+    parser.add_argument("--max-age-days", type=float, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed, without removing it")
+
+    parsed = parser.parse_args(args)
+
+    report = collect_garbage(parsed.cache_directory,
+                             [b.layout(parsed.cache_directory) for b in PartCacheBackend] +
+                             [ContentAddressedPartStore.layout(parsed.cache_directory)],
+                             max_size=parsed.max_size,
+                             max_age=parsed.max_age_days * 86400 if parsed.max_age_days is not None else None,
+                             dry_run=parsed.dry_run,
+                             content_store=ContentAddressedPartStore(parsed.cache_directory))
+
+    print(report)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Records PartCache events (hits, misses, factory builds, loads and saves) so the factory calls dominating a project build
+can be identified. Reports can be exported as JSON, or in the Chrome trace event format (viewable in chrome://tracing
+or https://ui.perfetto.dev).
+
+Usage:
+
+    recorder = PartCacheEventRecorder()
+    cache.set_instrumentation(recorder)
+    ... build parts ...
+    recorder.write_chrome_trace("build_trace.json")
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import typing
+
+from ezocc.part_manager import PartCacheInstrumentation
+
+
+class PartCacheEvent:
+
+    def __init__(self,
+                 kind: str,
+                 label: typing.Optional[str],
+                 start: float,
+                 duration: float,
+                 token_uuid: typing.Optional[str],
+                 thread_id: int,
+                 details: typing.Dict[str, typing.Any]):
+        self.kind = kind
+        self.label = label
+        self.start = start
+        self.duration = duration
+        self.token_uuid = token_uuid
+        self.thread_id = thread_id
+        self.details = details
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "kind": self.kind,
+            "label": self.label,
+            "start": self.start,
+            "duration": self.duration,
+            "token_uuid": self.token_uuid,
+            "thread_id": self.thread_id,
+            **self.details
+        }
+
+
+class PartCacheEventRecorder(PartCacheInstrumentation):
+    """
+    Keeps every event in memory. Event start times are reported relative to the creation of the recorder.
+    """
+
+    UNLABELLED = "<unlabelled>"
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._events: typing.List[PartCacheEvent] = []
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    @property
+    def events(self) -> typing.List[PartCacheEvent]:
+        with self._lock:
+            return list(self._events)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+    def record_event(self,
+                     kind: str,
+                     label: typing.Optional[str],
+                     start: float,
+                     duration: float,
+                     token_uuid: typing.Optional[str] = None,
+                     **details):
+        event = PartCacheEvent(kind, label, start - self._origin, duration, token_uuid, threading.get_ident(),
+                               details)
+
+        with self._lock:
+            self._events.append(event)
+
+    def summary(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        @return: per label totals, ordered by decreasing total build time
+        """
+        totals: typing.Dict[str, typing.Dict[str, typing.Any]] = dict()
+
+        for e in self.events:
+            label = e.label if e.label is not None else PartCacheEventRecorder.UNLABELLED
+
+            if label not in totals:
+                totals[label] = {
+                    "label": label,
+                    "hits": 0,
+                    "misses": 0,
+                    "builds": 0,
+                    "build_time": 0.0,
+                    "loads": 0,
+                    "load_time": 0.0,
+                    "saves": 0,
+                    "save_time": 0.0,
+                    "saved_bytes": 0
+                }
+
+            total = totals[label]
+
+            if e.kind == "hit":
+                total["hits"] += 1
+            elif e.kind == "miss":
+                total["misses"] += 1
+            elif e.kind == "build":
+                total["builds"] += 1
+                total["build_time"] += e.duration
+            elif e.kind == "load":
+                total["loads"] += 1
+                total["load_time"] += e.duration
+            elif e.kind == "save":
+                total["saves"] += 1
+                total["save_time"] += e.duration
+                total["saved_bytes"] += e.details.get("size", 0)
+
+        return sorted(totals.values(), key=lambda t: (-t["build_time"], t["label"]))
+
+    def to_json(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "summary": self.summary(),
+            "events": [e.as_dict() for e in self.events]
+        }
+
+    def write_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def to_chrome_trace(self) -> typing.Dict[str, typing.Any]:
+        """
+        @return: the events in the Chrome trace event format, as complete ("X") events with times in microseconds
+        """
+        pid = os.getpid()
+
+        trace_events = []
+        for e in self.events:
+            trace_events.append({
+                "name": e.label if e.label is not None else PartCacheEventRecorder.UNLABELLED,
+                "cat": e.kind,
+                "ph": "X",
+                "ts": e.start * 1e6,
+                "dur": e.duration * 1e6,
+                "pid": pid,
+                "tid": e.thread_id,
+                "args": {"token_uuid": e.token_uuid, **e.details}
+            })
+
+        return {
+            "traceEvents": trace_events,
+            "displayTimeUnit": "ms"
+        }
+
+    def write_chrome_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
@@ -0,0 +1,342 @@
+"""
+On-disk layout of a FileBasedPartCache directory. The directory may be shared by several processes building parts
+concurrently:
+
+    <cache_directory>/
+        index                   uuids of all committed parts, one per line (append only)
+        <ab>/<uuid>.part.cbf    committed parts, sharded by the first characters of their uuid
+        <ab>/<uuid>.lock        held while a process is producing the part
+        <ab>/tmp_*.part.cbf     parts being written, renamed into place once complete
+        manifests/<name>.json   uuids used by the last build of each entry point, see BuildManifest
+
+The part extension and index file name depend on the part file format.
+"""
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+
+class CacheIndex:
+    """
+    Append-only record of the committed part uuids, so a cold start does not need to stat every part file. Appends of a
+    single short line are atomic, so the index may be shared by several processes.
+    """
+
+    FILE_NAME = "index"
+
+    def __init__(self, cache_directory: str, file_name: str = FILE_NAME):
+        self._path = os.path.join(cache_directory, file_name)
+        self._lock = threading.Lock()
+        self._uuids: typing.Set[str] = set()
+
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-reads the index, picking up parts committed by other processes.
+        """
+        if not os.path.exists(self._path):
+            return
+
+        with open(self._path, "r") as f:
+            uuids = {line.strip() for line in f if line.strip() != ""}
+
+        with self._lock:
+            self._uuids.update(uuids)
+
+    def __contains__(self, part_uuid: str) -> bool:
+        with self._lock:
+            return part_uuid in self._uuids
+
+    def uuids(self) -> typing.Set[str]:
+        with self._lock:
+            return set(self._uuids)
+
+    def add(self, part_uuid: str):
+        with self._lock:
+            if part_uuid in self._uuids:
+                return
+
+            self._uuids.add(part_uuid)
+
+        with open(self._path, "a") as f:
+            f.write(part_uuid + "\n")
+
+    def discard(self, part_uuid: str):
+        """
+        Forgets the uuid in this process, e.g. once its part file is found to be missing. The index file is not
+        updated, so the uuid is read again by refresh.
+        """
+        with self._lock:
+            self._uuids.discard(part_uuid)
+
+    def rewrite(self, part_uuids: typing.Set[str]):
+        """
+        Replaces the index contents, e.g. after parts have been removed from the cache.
+        """
+        temp_path = f"{self._path}.tmp_{os.getpid()}_{secrets.token_hex(4)}"
+
+        with open(temp_path, "w") as f:
+            for part_uuid in sorted(part_uuids):
+                f.write(part_uuid + "\n")
+
+        os.replace(temp_path, self._path)
+
+        with self._lock:
+            self._uuids = set(part_uuids)
+
+
+class BuildManifest:
+    """
+    The part uuids used by a build of a project entry point (e.g. an example script). Garbage collection keeps every
+    part referenced by a manifest. Each build of an entry point replaces its previous manifest.
+    """
+
+    DIRECTORY_NAME = "manifests"
+
+    EXTENSION = ".json"
+
+    _NAME_PATTERN = re.compile(r"[\w.\-]+")
+
+    def __init__(self, entry_point: str, part_uuids: typing.Set[str], created: float):
+        self.entry_point = entry_point
+        self.part_uuids = part_uuids
+        self.created = created
+
+    @staticmethod
+    def directory(cache_directory: str) -> str:
+        return os.path.join(cache_directory, BuildManifest.DIRECTORY_NAME)
+
+    @staticmethod
+    def path(cache_directory: str, entry_point: str) -> str:
+        if BuildManifest._NAME_PATTERN.fullmatch(entry_point) is None:
+            raise ValueError(f"Entry point name must only contain letters, digits, '_', '.' and '-': {entry_point}")
+
+        return os.path.join(BuildManifest.directory(cache_directory), entry_point + BuildManifest.EXTENSION)
+
+    @staticmethod
+    def write(cache_directory: str, entry_point: str, part_uuids: typing.Set[str]) -> BuildManifest:
+        path = BuildManifest.path(cache_directory, entry_point)
+        os.makedirs(BuildManifest.directory(cache_directory), exist_ok=True)
+
+        result = BuildManifest(entry_point, set(part_uuids), time.time())
+
+        temp_path = f"{path}.tmp_{os.getpid()}_{secrets.token_hex(4)}"
+        with open(temp_path, "w") as f:
+            json.dump({
+                "entry_point": result.entry_point,
+                "created": result.created,
+                "part_uuids": sorted(result.part_uuids)
+            }, f, indent=1)
+
+        os.replace(temp_path, path)
+
+        return result
+
+    @staticmethod
+    def read(cache_directory: str, entry_point: str) -> typing.Optional[BuildManifest]:
+        """
+        @return: the manifest of the entry point, or None if it has not been recorded
+        """
+        path = BuildManifest.path(cache_directory, entry_point)
+
+        if not os.path.exists(path):
+            return None
+
+        return BuildManifest._read_file(path)
+
+    @staticmethod
+    def read_all(cache_directory: str) -> typing.List[BuildManifest]:
+        directory = BuildManifest.directory(cache_directory)
+
+        if not os.path.isdir(directory):
+            return []
+
+        result = []
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith(BuildManifest.EXTENSION):
+                continue
+
+            result.append(BuildManifest._read_file(os.path.join(directory, file_name)))
+
+        return result
+
+    @staticmethod
+    def _read_file(path: str) -> BuildManifest:
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        return BuildManifest(data["entry_point"], set(data["part_uuids"]), data["created"])
+
+
+class ShardedCacheLayout:
+
+    PART_EXTENSION = ".part.cbf"
+
+    LOCK_EXTENSION = ".lock"
+
+    TEMP_PREFIX = "tmp_"
+
+    # locks held by each thread, see lock
+    _thread_state = threading.local()
+
+    def __init__(self,
+                 cache_directory: str,
+                 shard_prefix_length: int = 2,
+                 part_extension: str = PART_EXTENSION,
+                 index_file_name: str = CacheIndex.FILE_NAME):
+        """
+        @param cache_directory: root directory of the cache, created if it does not exist
+        @param shard_prefix_length: number of leading uuid characters used to name the shard subdirectories
+        @param part_extension: extension of the part files
+        @param index_file_name: name of the index file, layouts sharing a directory must use distinct indices
+        """
+        if shard_prefix_length < 1:
+            raise ValueError("Shard prefix length must be at least 1")
+
+        self._cache_directory = cache_directory
+        self._shard_prefix_length = shard_prefix_length
+        self._part_extension = part_extension
+
+        os.makedirs(cache_directory, exist_ok=True)
+
+        self._index = CacheIndex(cache_directory, index_file_name)
+
+    @property
+    def cache_directory(self) -> str:
+        return self._cache_directory
+
+    @property
+    def part_extension(self) -> str:
+        return self._part_extension
+
+    @property
+    def index(self) -> CacheIndex:
+        return self._index
+
+    def shard_directory(self, part_uuid: str) -> str:
+        return os.path.join(self._cache_directory, part_uuid[:self._shard_prefix_length])
+
+    def base_path(self, part_uuid: str) -> str:
+        """
+        @return: the path of the part, without extension (as expected by PartSave.ocaf/load_ocaf)
+        """
+        return os.path.join(self.shard_directory(part_uuid), part_uuid)
+
+    def part_path(self, part_uuid: str) -> str:
+        return self.base_path(part_uuid) + self._part_extension
+
+    def scan(self) -> typing.Generator[typing.Tuple[str, str], None, None]:
+        """
+        Lists the committed part files by walking the cache directory, rather than trusting the index.
+
+        @return: (part uuid, part file path) for each part file
+        """
+        for directory, subdirectories, file_names in os.walk(self._cache_directory):
+            subdirectories[:] = [d for d in subdirectories if d != BuildManifest.DIRECTORY_NAME]
+
+            for file_name in file_names:
+                if file_name.endswith(self._part_extension) and not file_name.startswith(ShardedCacheLayout.TEMP_PREFIX):
+                    yield file_name[:-len(self._part_extension)], os.path.join(directory, file_name)
+
+    def remove(self, part_uuid: str):
+        """
+        Deletes the part file. The index is not updated, see CacheIndex.rewrite.
+        """
+        for path in (self.part_path(part_uuid), self.base_path(part_uuid) + ShardedCacheLayout.LOCK_EXTENSION):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def discard(self, part_uuid: str):
+        """
+        Deletes the part file, if present, and forgets the uuid. Unlike remove the lock file is kept, as the caller is
+        expected to hold the lock (e.g. to rebuild the part).
+        """
+        if os.path.exists(self.part_path(part_uuid)):
+            os.remove(self.part_path(part_uuid))
+
+        self._index.discard(part_uuid)
+
+    def has(self, part_uuid: str) -> bool:
+        """
+        Answers from the index, so a warm lookup does not touch the file system. The index only records that the part
+        was committed, it may since have been removed (e.g. by garbage collection in another process): callers are
+        expected to discard the uuid when loading the part fails. Only uuids missing from the index are checked
+        against the part file, as another process may have committed them since the index was read.
+        """
+        if part_uuid in self._index:
+            return True
+
+        if os.path.exists(self.part_path(part_uuid)):
+            self._index.add(part_uuid)
+            return True
+
+        return False
+
+    @contextlib.contextmanager
+    def lock(self, part_uuid: str) -> typing.Generator[None, None, None]:
+        """
+        Holds an exclusive lock on the part uuid, blocking until any other holder (in this or another process) releases
+        it. The lock is reentrant within a thread, so e.g. a caller holding it may still call FileBasedPartCache.put.
+        """
+        lock_path = self.base_path(part_uuid) + ShardedCacheLayout.LOCK_EXTENSION
+
+        held = ShardedCacheLayout._held_locks()
+        if lock_path in held:
+            yield
+            return
+
+        os.makedirs(self.shard_directory(part_uuid), exist_ok=True)
+
+        with open(lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            held.add(lock_path)
+            try:
+                yield
+            finally:
+                held.discard(lock_path)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _held_locks() -> typing.Set[str]:
+        """
+        @return: paths of the locks held by the current thread. flock locks held through another file descriptor block
+        even within the same process, so a thread must not lock a path it already holds.
+        """
+        if not hasattr(ShardedCacheLayout._thread_state, "held_locks"):
+            ShardedCacheLayout._thread_state.held_locks = set()
+
+        return ShardedCacheLayout._thread_state.held_locks
+
+    @contextlib.contextmanager
+    def write(self, part_uuid: str) -> typing.Generator[str, None, None]:
+        """
+        Yields a temporary base path to write the part to. Once the block exits successfully the part is atomically
+        renamed into place and added to the index, so readers never observe a partially written part.
+        """
+        os.makedirs(self.shard_directory(part_uuid), exist_ok=True)
+
+        temp_base_path = os.path.join(
+            self.shard_directory(part_uuid),
+            f"{ShardedCacheLayout.TEMP_PREFIX}{part_uuid}_{os.getpid()}_{secrets.token_hex(4)}")
+        temp_path = temp_base_path + self._part_extension
+
+        try:
+            yield temp_base_path
+            os.replace(temp_path, self.part_path(part_uuid))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self._index.add(part_uuid)
@@ -0,0 +1,320 @@
+"""
+Read-only pack files for FileBasedPartCache. A pack holds many parts (in the binary part format) in a single file, so a
+pre-warmed cache can be opened with one mmap rather than one file open and document parse per part.
+
+Pack layout:
+
+    header      magic, version, offset and length of the index
+    records     binary part files, back to back
+    index       JSON object mapping part uuid -> [offset, length] of its record
+
+Packs are append only: appending writes the new records and a new index after the existing data, then updates the
+header to point at the new index. Superseded indices (and replaced records) remain in the file as unused space.
+
+Usage:
+
+    python -m ezocc.part_cache_pack compact <cache_directory> <pack_path>
+    python -m ezocc.part_cache_pack verify <pack_path>
+"""
+from __future__ import annotations
+
+import argparse
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import typing
+
+from ezocc.part_cache_dedup import ContentAddressedPartStore
+from ezocc.part_manager import Part, PartCache, PartSave, NoOpPartCache
+
+logger = logging.getLogger(__name__)
+
+
+class PartPack:
+
+    MAGIC = b"EZPK"
+
+    VERSION = 1
+
+    # magic, version, index offset, index length
+    HEADER = struct.Struct("<4sIQQ")
+
+    def __init__(self, path: str):
+        """
+        Opens the pack for reading. The pack is memory mapped, records are only read when their part is loaded.
+        """
+        self._path = path
+        self._file = open(path, "rb")
+
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            self._file.close()
+            raise ValueError(f"Pack file is empty: {path}") from e
+
+        self._view = memoryview(self._mmap)
+        self._index = PartPack._read_index(self._view, path)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def __contains__(self, part_uuid: str) -> bool:
+        return part_uuid in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def uuids(self) -> typing.Set[str]:
+        return set(self._index.keys())
+
+    def record(self, part_uuid: str) -> memoryview:
+        """
+        @return: the binary part file for the uuid, as a slice of the memory mapped pack
+        """
+        if part_uuid not in self._index:
+            raise ValueError(f"Part {part_uuid} is not present in pack {self._path}")
+
+        offset, length = self._index[part_uuid]
+        return self._view[offset:offset + length]
+
+    def load(self, part_uuid: str, part_cache: PartCache) -> Part:
+        return PartSave.load_binary_buffer(self.record(part_uuid), part_cache)
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> PartPack:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def append(path: str, records: typing.Dict[str, bytes]):
+        """
+        Appends the records (binary part files keyed by uuid) to the pack, creating it if necessary. Records for uuids
+        already present in the pack are replaced.
+        """
+        with open(path, "a+b") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                PartPack._append_locked(f, path, records)
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _append_locked(f: typing.BinaryIO, path: str, records: typing.Dict[str, bytes]):
+        f.seek(0, os.SEEK_END)
+
+        if f.tell() == 0:
+            index: typing.Dict[str, typing.List[int]] = dict()
+            f.write(PartPack.HEADER.pack(PartPack.MAGIC, PartPack.VERSION, 0, 0))
+        else:
+            f.seek(0)
+            index_offset, index_length = PartPack._read_header(f.read(PartPack.HEADER.size), path)
+            f.seek(index_offset)
+            index = json.loads(f.read(index_length).decode("utf-8")) if index_length > 0 else dict()
+
+        f.seek(0, os.SEEK_END)
+
+        for part_uuid, data in records.items():
+            index[part_uuid] = [f.tell(), len(data)]
+            f.write(data)
+
+        index_offset = f.tell()
+        index_data = json.dumps(index).encode("utf-8")
+        f.write(index_data)
+        f.flush()
+        os.fsync(f.fileno())
+
+        # files opened for appending always write at the end, so the header is rewritten through a second handle
+        with open(path, "r+b") as header_file:
+            header_file.write(PartPack.HEADER.pack(PartPack.MAGIC, PartPack.VERSION, index_offset, len(index_data)))
+            header_file.flush()
+            os.fsync(header_file.fileno())
+
+    @staticmethod
+    def _read_header(header: bytes, path: str) -> typing.Tuple[int, int]:
+        """
+        @return: the offset and length of the index
+        """
+        if len(header) < PartPack.HEADER.size:
+            raise ValueError(f"Not a part pack: {path}")
+
+        magic, version, index_offset, index_length = PartPack.HEADER.unpack(header[:PartPack.HEADER.size])
+
+        if magic != PartPack.MAGIC:
+            raise ValueError(f"Not a part pack: {path}")
+
+        if version != PartPack.VERSION:
+            raise ValueError(f"Unsupported part pack version {version}: {path}")
+
+        return index_offset, index_length
+
+    @staticmethod
+    def _read_index(view: memoryview, path: str) -> typing.Dict[str, typing.List[int]]:
+        index_offset, index_length = PartPack._read_header(bytes(view[:PartPack.HEADER.size]), path)
+
+        if index_offset + index_length > len(view):
+            raise ValueError(f"Part pack index is out of range, the pack may be truncated: {path}")
+
+        if index_length == 0:
+            return dict()
+
+        return json.loads(bytes(view[index_offset:index_offset + index_length]).decode("utf-8"))
+
+
+def compact(cache_directory: str, pack_path: str, batch_bytes: int = 64 << 20) -> int:
+    """
+    Writes every part in the (loose) cache directory to the pack. Parts saved as OCAF documents, and the pointer files of
+    a deduplicating cache (see part_cache_dedup), are converted to the binary part format. Parts already present in the
+    pack are skipped.
+
+    @param batch_bytes: records are appended to the pack once this many bytes have been read, so the memory used does not
+    grow with the size of the cache
+    @return: the number of parts added to the pack
+    """
+    existing: typing.Set[str] = set()
+    if os.path.exists(pack_path) and os.path.getsize(pack_path) > 0:
+        with PartPack(pack_path) as pack:
+            existing = pack.uuids()
+
+    added: typing.Set[str] = set()
+    batch: typing.Dict[str, bytes] = dict()
+    batch_size = 0
+
+    for part_uuid, data in _read_records(cache_directory, lambda u: u in existing or u in added or u in batch):
+        batch[part_uuid] = data
+        batch_size += len(data)
+
+        if batch_size >= batch_bytes:
+            PartPack.append(pack_path, batch)
+            added.update(batch.keys())
+            batch = dict()
+            batch_size = 0
+
+    if len(batch) > 0:
+        PartPack.append(pack_path, batch)
+        added.update(batch.keys())
+
+    logger.info(f"Added {len(added)} parts to pack {pack_path}")
+
+    return len(added)
+
+
+def _read_records(cache_directory: str,
+                  skip: typing.Callable[[str], bool]) -> typing.Generator[typing.Tuple[str, bytes], None, None]:
+    """
+    @param skip: returns True for the uuids of parts that should not be read
+    @return: (part uuid, binary part file) for each part in the cache directory
+    """
+    content_store = ContentAddressedPartStore(cache_directory)
+
+    with tempfile.TemporaryDirectory() as conversion_directory:
+        for directory, subdirectories, file_names in os.walk(cache_directory):
+            # blobs are read through the pointer files referring to them
+            subdirectories[:] = [d for d in subdirectories if d != ContentAddressedPartStore.BLOB_DIRECTORY_NAME]
+
+            for file_name in sorted(file_names):
+                if file_name.startswith("tmp_"):
+                    continue
+
+                path = os.path.join(directory, file_name)
+
+                if file_name.endswith(PartSave.BINARY_EXTENSION):
+                    part_uuid = file_name[:-len(PartSave.BINARY_EXTENSION)]
+                    if skip(part_uuid):
+                        continue
+
+                    with open(path, "rb") as f:
+                        yield part_uuid, f.read()
+                elif file_name.endswith(PartSave.OCAF_EXTENSION):
+                    part_uuid = file_name[:-len(PartSave.OCAF_EXTENSION)]
+                    if skip(part_uuid):
+                        continue
+
+                    part = PartSave.load_ocaf(path[:-len(PartSave.OCAF_EXTENSION)], NoOpPartCache.instance())
+                    yield part_uuid, _to_binary(part, conversion_directory)
+                elif file_name.endswith(ContentAddressedPartStore.POINTER_EXTENSION):
+                    part_uuid = file_name[:-len(ContentAddressedPartStore.POINTER_EXTENSION)]
+                    if skip(part_uuid):
+                        continue
+
+                    # blobs are saved without a uuid, pack records must include it. Fails if the blob is missing.
+                    part = content_store.load(path[:-len(ContentAddressedPartStore.POINTER_EXTENSION)],
+                                              NoOpPartCache.instance())
+                    yield part_uuid, _to_binary(part, conversion_directory)
+
+
+def _to_binary(part: Part, conversion_directory: str) -> bytes:
+    converted_path = os.path.join(conversion_directory, part.cache_token.compute_uuid())
+    part.save.binary(converted_path)
+
+    try:
+        with open(converted_path + PartSave.BINARY_EXTENSION, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(converted_path + PartSave.BINARY_EXTENSION)
+
+
+def verify(pack_path: str) -> typing.List[str]:
+    """
+    Loads every part in the pack, including its labelled subshapes.
+
+    @return: a description of each problem found, empty if the pack is valid
+    """
+    errors = []
+
+    with PartPack(pack_path) as pack:
+        for part_uuid in sorted(pack.uuids()):
+            try:
+                part = pack.load(part_uuid, NoOpPartCache.instance())
+
+                if part.cache_token.compute_uuid() != part_uuid:
+                    errors.append(f"{part_uuid}: record contains part {part.cache_token.compute_uuid()}")
+                    continue
+
+                for _ in part.subshapes.items():
+                    pass
+            except Exception as e:
+                errors.append(f"{part_uuid}: {e}")
+
+    return errors
+
+
+def main(args: typing.List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage part cache pack files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="Add the parts in a cache directory to a pack")
+    compact_parser.add_argument("cache_directory")
+    compact_parser.add_argument("pack_path")
+
+    verify_parser = subparsers.add_parser("verify", help="Check every part in a pack can be loaded")
+    verify_parser.add_argument("pack_path")
+
+    parsed = parser.parse_args(args)
+
+    if parsed.command == "compact":
+        count = compact(parsed.cache_directory, parsed.pack_path)
+        print(f"Added {count} parts to {parsed.pack_path}")
+        return 0
+    else:
+        errors = verify(parsed.pack_path)
+        for e in errors:
+            print(e)
+
+        print(f"{len(errors)} errors found in {parsed.pack_path}")
+        return 0 if len(errors) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
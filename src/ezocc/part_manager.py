@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 import copy
+import enum
 import inspect
 import json
 import math
 import pdb
 import re
+import threading
+import time
 import traceback
 import typing
 import os
@@ -38,7 +41,10 @@ import OCC.Core.ShapeAnalysis
 import OCC.Core.ShapeFix
 import OCC.Core.ShapeUpgrade
 import OCC.Core.TopAbs as ta
+import OCC.Core.TopExp
 import OCC.Core.TopOpeBRepBuild
+import OCC.Core.TopLoc
+import OCC.Core.BRepTools
 import OCC.Core.TopTools
 import OCC.Core.TopoDS
 import OCC.Core.HLRAlgo
@@ -66,10 +72,12 @@ import copyreg
 from ezocc.alg.canonical_recognition import ShapeCanonicalizer
 from ezocc.cad.model.widgets.widget import Widget
 from ezocc.humanization import Humanize
+from ezocc.shape_spatial_index import ShapeSpatialIndex, RayHit
+from ezocc.source_fingerprint import SourceFingerprints
 from ezocc.subshape_mapping import SubshapeMap, T_MKS, AnnotatedShape
 
 import ocaf_wrapper_swig
-from util_wrapper_swig import UtilWrapper
+from util_wrapper_swig import UtilWrapper, BinaryPartWrapper, BinaryPartReader
 
 from ezocc.type_utils import TypeValidator
 
@@ -81,9 +89,32 @@ class CacheToken:
     def compute_uuid(self) -> str:
         raise NotImplementedError()
 
+    @property
+    def label(self) -> typing.Optional[str]:
+        """
+        @return: a human readable description of where the token was created, for instrumentation. Not part of the
+        token identity.
+        """
+        return None
+
+    @property
+    def is_noop(self) -> bool:
+        """
+        @return: True if the token does not identify a part (see NoOpCacheToken). Token arguments and cache lookups
+        may then be skipped entirely.
+        """
+        return False
+
     def mutated(self, *args, **kwargs) -> CacheToken:
         raise NotImplementedError()
 
+    def mutated_lazy(self, args_supplier: typing.Callable[[], typing.Sequence]) -> CacheToken:
+        """
+        Equivalent to mutated(*args_supplier()), except that no-op tokens never call args_supplier. Use when the token
+        arguments are expensive to compute.
+        """
+        return self.mutated(*args_supplier())
+
     def get_cache(self) -> PartCache:
         """
         @return: The cache associated with this token.
@@ -103,18 +134,69 @@ class NoOpCacheToken(CacheToken):
         raise NotImplementedError("This cache token is NoOp. It does not support computing UUIDS. "
                                   "This is intended to be used with a NoOp part cache.")
 
+    @property
+    def is_noop(self) -> bool:
+        return True
+
     def mutated(self, *args, **kwargs) -> CacheToken:
-        return NoOpCacheToken(self._cache)
+        # no-op tokens carry no state other than the cache, so are shared rather than copied
+        return self
+
+    def mutated_lazy(self, args_supplier: typing.Callable[[], typing.Sequence]) -> CacheToken:
+        return self
 
     def get_cache(self) -> PartCache:
         return self._cache
 
 
+class PartCacheInstrumentation:
+    """
+    Receives events from a PartCache. This implementation ignores them, see ezocc.part_cache_instrumentation for one
+    that records them.
+    """
+
+    @property
+    def enabled(self) -> bool:
+        """
+        @return: False if events are ignored, in which case caches may skip gathering the event details.
+        """
+        return False
+
+    def record_event(self,
+                     kind: str,
+                     label: typing.Optional[str],
+                     start: float,
+                     duration: float,
+                     token_uuid: typing.Optional[str] = None,
+                     **details):
+        """
+        @param kind: e.g. "hit", "miss", "build", "load", "save"
+        @param label: the label of the token the event relates to
+        @param start: time.perf_counter() at the start of the event
+        @param duration: in seconds
+        @param token_uuid: the uuid of the token the event relates to, if any
+        @param details: any additional (JSON serializable) details
+        """
+        pass
+
+
 class PartCache:
 
+    _NO_OP_INSTRUMENTATION = PartCacheInstrumentation()
+
+    @property
+    def instrumentation(self) -> PartCacheInstrumentation:
+        return getattr(self, "_instrumentation", PartCache._NO_OP_INSTRUMENTATION)
+
+    def set_instrumentation(self, instrumentation: PartCacheInstrumentation):
+        self._instrumentation = instrumentation
+
     def create_token(self, *args, **kwargs):
         """
         Request a new token from the cache, representing the given parameters.
+
+        Implementations accept an optional "label" keyword argument (e.g. "involute_gear_factory") identifying the call
+        site in instrumentation reports. The label is not part of the token identity.
         """
         raise NotImplementedError()
 
@@ -147,8 +229,10 @@ class NoOpPartCache(PartCache):
         if init_key != NoOpPartCache.__init_key:
             raise ValueError("Use static instance() method instead")
 
+        self._token = NoOpCacheToken(self)
+
     def create_token(self, *args, **kwargs):
-        return NoOpCacheToken(self)
+        return self._token
 
     def ensure_exists(self, cache_token: CacheToken, factory_method: typing.Callable[[], Part]) -> Part:
         return factory_method()
@@ -183,10 +267,14 @@ class Part:
             raise ValueError("Subshape map expected")
 
         self._extents = None
+        # extents enclosing the root shape, known without computing the exact extents (see xts_fast)
+        self._extents_bound: typing.Optional[op.Extents] = None
         self._set_placeable_part = None
+        self._spatial_index: typing.Optional[ShapeSpatialIndex] = None
         self._driver: typing.Optional[PartDriver] = None
         self._cache_token = cache_token
-        self._subshapes = subshape_map.clone().pruned()
+        # pruned() returns a copy-on-write copy, so the supplied map may still be modified by the caller
+        self._subshapes = subshape_map.pruned()
 
     @property
     def set_placeable(self) -> op.SetPlaceablePart:
@@ -322,6 +410,16 @@ class Part:
                         map_is_partner,
                         map_is_same))
 
+    def moved(self, new_cache_token: CacheToken, location: OCC.Core.TopLoc.TopLoc_Location) -> Part:
+        """
+        Moves this Part (and its subshapes) by the location. The result shares its geometry with this Part rather than
+        copying it, so the location must be a rigid transformation.
+        """
+        result = Part(new_cache_token, self._subshapes.moved(location))
+        result._propagate_extents(self, location.Transformation())
+
+        return result
+
     def raise_exception(self) -> Part:
         """
         This method never returns. Instead, it raises a RuntimeError. This can be used to halt project execution without
@@ -457,7 +555,8 @@ class Part:
             if subshape_filter(s):
                 new_subshape_map.place(name, AnnotatedShape(s))
 
-        return Part(self._cache_token.mutated("name_recurse", name, inspect.getsource(subshape_filter)), new_subshape_map)
+        return Part(self._cache_token.mutated_lazy(lambda: ("name_recurse", name, SourceFingerprints.of(subshape_filter))),
+                    new_subshape_map)
 
     def remove_sp_named(self, name: str):
         return self.remove(self.sp(name))
@@ -605,7 +704,10 @@ class Part:
                 for s in shapes:
                     new_subshape_list.place(name, s)
 
-        return Part(self._cache_token.mutated("add", *others), new_subshape_list)
+        result = Part(self._cache_token.mutated("add", *others), new_subshape_list)
+        result._propagate_union_extents(self, *others)
+
+        return result
 
     def pattern(self, range_supplier: typing.Iterable[int], part_modifier: typing.Callable[[int, Part], Part]) -> Part:
         """
@@ -614,6 +716,10 @@ class Part:
         :param range_supplier: provides indices.
         :param part_modifier: modifies the original part according to the index.
         :return: this Part modified according to modifier and i for all i in range
+
+        The results share this part's geometry only if part_modifier transforms with tr.located (e.g.
+        lambda i, p: p.tr.located.mv(dx=10 * i)), tr.* copies the geometry by default. See instanced_pattern for
+        patterns of rigidly transformed copies.
         """
         results = []
         for i in range_supplier:
@@ -622,6 +728,10 @@ class Part:
         return PartFactory(self._cache_token.get_cache()).compound(*results)
 
     def incremental_pattern(self, range_supplier: typing.Iterable[int], part_modifier: typing.Callable[[Part], Part]) -> Part:
+        """
+        Like pattern, with part_modifier applied to the previous result. As for pattern, the results share this part's
+        geometry only if part_modifier transforms with tr.located.
+        """
         result = [self]
 
         for i in range_supplier:
@@ -629,6 +739,76 @@ class Part:
 
         return PartFactory(self._cache_token.get_cache()).compound(*result)
 
+    def defer_transforms(self) -> DeferredTransformPart:
+        """
+        :return: this part, with transformations (tr.*, align()) on the result deferred and composed until the
+        transformed part is needed. E.g. part.defer_transforms().tr.rz(...).tr.mv(...).align().stack_z1(other)
+        performs a single transformation.
+        """
+        return DeferredTransformPart(self, OCC.Core.gp.gp_Trsf())
+
+    def instanced_pattern(self,
+                          range_supplier: typing.Iterable[int],
+                          trsf_configurer: typing.Callable[[int, OCC.Core.gp.gp_Trsf], None],
+                          prefix: typing.Optional[str] = None) -> Part:
+        """
+        Like pattern, for copies of this part that are only translated/rotated (e.g. bolt arrays). Each instance is this
+        part's shape with a location, so the geometry is stored once however many instances there are.
+
+        The root shape of instance i is named <prefix><i>, its named subshapes <prefix><i>/<name> (so
+        prefixed_subparts("<prefix><i>/") recovers the names of the instance). The instance entries are only created
+        when the subshape map is first read.
+
+        :param trsf_configurer: configures the (rigid) transformation for index i. Incremental patterns can use
+        trsf.Powered(i) of a single step.
+        :return: a compound of the instances
+        """
+        if prefix is None:
+            prefix = ""
+
+        indices = []
+        trsfs = []
+        for i in range_supplier:
+            trsf = OCC.Core.gp.gp_Trsf()
+            trsf_configurer(i, trsf)
+
+            if not PartTransformer.is_rigid(trsf):
+                raise ValueError(f"Instance transformations must be rigid, the transformation for index {i} scales or "
+                                 f"mirrors")
+
+            indices.append(i)
+            trsfs.append(trsf)
+
+        locations = [OCC.Core.TopLoc.TopLoc_Location(t) for t in trsfs]
+        root_shape = AnnotatedShape(op.GeomUtils.make_compound(*[self.shape.Moved(loc) for loc in locations]))
+
+        token = self._cache_token.mutated_lazy(
+            lambda: ("instanced_pattern", prefix, indices,
+                     [[t.Value(int(j / 4) + 1, j % 4 + 1) for j in range(0, 12)] for t in trsfs]))
+
+        source = self._subshapes.clone()
+
+        def _load() -> typing.Dict[str, typing.Set[AnnotatedShape]]:
+            result: typing.Dict[str, typing.Set[AnnotatedShape]] = dict()
+
+            for i, location in zip(indices, locations):
+                instance = source.moved(location)
+
+                result[f"{prefix}{i}"] = {instance.root_shape}
+
+                for name, shapes in instance.map.items():
+                    result[f"{prefix}{i}/{name}"] = set(shapes)
+
+            return result
+
+        # the entries of each instance are read from a pruned map, so are subshapes of the instance
+        result = Part(token, SubshapeMap.lazy(root_shape, _load, is_pruned=True))
+
+        if len(trsfs) > 0:
+            result._propagate_extents(self, *trsfs)
+
+        return result
+
     @staticmethod
     def visualize_offscreen(*parts,
                             resolution: typing.Tuple[int, int],
@@ -653,8 +833,11 @@ class Part:
 
         pv.visualize_parts(*parts, directors=directors, widgets=widgets)
 
-    def align(self, *subshape_names: str) -> PartAligner:
-        return PartAligner(self, *subshape_names)
+    def align(self, *subshape_names: str, fast: bool = False) -> PartAligner:
+        """
+        :param fast: if True, alignment uses xts_fast rather than the exact extents
+        """
+        return PartAligner(self, *subshape_names, fast=fast)
 
     @property
     def extents(self) -> op.Extents:
@@ -671,6 +854,63 @@ class Part:
     def xts(self) -> op.Extents:
         return self.extents
 
+    @property
+    def spatial_index(self) -> ShapeSpatialIndex:
+        """
+        :return: the spatial index of this Part's faces, edges and vertices (used for picking), built on first use
+        """
+        if self._spatial_index is None:
+            self._spatial_index = ShapeSpatialIndex(self.shape)
+
+        return self._spatial_index
+
+    @property
+    def xts_fast(self) -> op.Extents:
+        """
+        :return: extents enclosing this Part's root shape, which may be larger than the exact extents (e.g. propagated
+        through a rotation, or computed without optimization). Cheap, for callers that do not need exact extents.
+        """
+        if self._extents is not None:
+            return self._extents
+
+        if self._extents_bound is None:
+            self._extents_bound = op.Extents(self.shape, optimal=False)
+
+        return self._extents_bound
+
+    def _propagate_extents(self, source: Part, *trsfs: OCC.Core.gp.gp_Trsf):
+        """
+        Sets the extents of this Part, made of the source transformed by each of the trsfs, from those already known
+        for the source. Translated extents are exact, otherwise they are only a bound until the exact extents are
+        requested.
+        """
+        if source._extents is not None:
+            known = source._extents
+        elif source._extents_bound is not None:
+            known = source._extents_bound
+        else:
+            return
+
+        extents = op.Extents.union(*[known.transformed(t) for t in trsfs])
+
+        is_translation = all(
+            t.Form() in (OCC.Core.gp.gp_TrsfForm.gp_Identity, OCC.Core.gp.gp_TrsfForm.gp_Translation) for t in trsfs)
+
+        if known is source._extents and is_translation:
+            self._extents = extents
+        else:
+            self._extents_bound = extents
+
+    def _propagate_union_extents(self, *parts: Part):
+        """
+        Sets the extents of this Part, a compound of the parts, from those already known for the parts.
+        """
+        if all(p._extents is not None for p in parts):
+            self._extents = op.Extents.union(*[p._extents for p in parts])
+        elif all(p._extents is not None or p._extents_bound is not None for p in parts):
+            self._extents_bound = op.Extents.union(*[p._extents if p._extents is not None else p._extents_bound
+                                                     for p in parts])
+
     @property
     def shape(self) -> OCC.Core.TopoDS.TopoDS_Shape:
         """
@@ -764,7 +1004,7 @@ class Part:
         orphaned subshapes.
         """
 
-        # clone takes a performance hit but is safer
+        # clone is copy-on-write, so this is cheap unless the caller modifies the result
         return self._subshapes.clone()
 
     def compound_subpart(self, name: str, part_filter: typing.Callable[[Part], bool] = None) -> Part:
@@ -934,21 +1174,131 @@ class LazyLoadedPart(Part):
     def __init__(self, cache_token: CacheToken, load_method: typing.Callable[[], Part]):
         self._cache_token = cache_token
         self._load_method = load_method
+        self._load_lock = threading.Lock()
+        self._load_listeners: typing.List[typing.Callable[[], None]] = []
         self._part = None
 
     @property
     def cache_token(self) -> CacheToken:
         return self._cache_token
 
+    @property
+    def is_loaded(self) -> bool:
+        return self._part is not None
+
+    def add_load_listener(self, listener: typing.Callable[[], None]):
+        """
+        @param listener: called once the part has loaded, on the thread that loaded it (e.g. so that a cache can
+        re-estimate its cost). Called immediately if the part is already loaded.
+        """
+        with self._load_lock:
+            if self._part is None:
+                self._load_listeners.append(listener)
+                return
+
+        listener()
+
+    def load(self) -> Part:
+        """
+        Loads the part, if not already loaded. May be called from several threads (e.g. when prefetching), the part
+        is only loaded once and other callers wait for it.
+
+        @return: the loaded part
+        """
+        if self._part is None:
+            listeners = []
+
+            with self._load_lock:
+                if self._part is None:
+                    logger.info(f"Loading lazy part: {self._cache_token.compute_uuid()}")
+                    self._part = self._load_method()
+
+                    listeners = self._load_listeners
+                    self._load_listeners = []
+
+            # outside the lock, listeners may in turn wait on other threads
+            for listener in listeners:
+                listener()
+
+        return self._part
+
     def __getattr__(self, item):
         if item == "cache_token":
             return self._cache_token
 
-        if self._part is None:
-            logger.info(f"Loading lazy part: {self._cache_token.compute_uuid()} for attribute {item}")
-            self._part = self._load_method()
+        return getattr(self.load(), item)
 
-        return getattr(self._part, item)
+
+class DeferredTransformPart(LazyLoadedPart):
+    """
+    A Part transformed by a stack of deferred transformations (see Part.defer_transforms). Further transformations
+    (tr.*, align()) are composed into a single gp_Trsf rather than applied. The transformed part is only created, with
+    a single transformation, when anything else (e.g. the shape, a boolean, exploring) is requested. If the composed
+    transformation is a translation the extents are computed from those of the untransformed part, if it is otherwise
+    rigid they are computed from the untransformed shape moved to its new location, so aligning a rotated part does
+    not create it.
+    """
+
+    def __init__(self, part: Part, trsf: OCC.Core.gp.gp_Trsf, copy: bool = False):
+        super().__init__(PartTransformer.token(part, trsf, copy),
+                         lambda: PartTransformer(part)(trsf, copy=copy))
+
+        self._untransformed_part = part
+        self._trsf = trsf
+        self._copy_geometry = copy
+        self._extents = None
+        self._extents_bound = None
+
+    @property
+    def trsf(self) -> OCC.Core.gp.gp_Trsf:
+        """
+        @return: the composed transformation
+        """
+        return OCC.Core.gp.gp_Trsf(self._trsf)
+
+    def transformed(self, trsf: OCC.Core.gp.gp_Trsf, copy: bool = True) -> DeferredTransformPart:
+        """
+        @return: this part, with the transformation applied after the existing ones. The composed transformation only
+        changes the shape location (see PartTransformer.located) if no transformation in the stack copies.
+        """
+        return DeferredTransformPart(self._untransformed_part, trsf.Multiplied(self._trsf), self._copy_geometry or copy)
+
+    def defer_transforms(self) -> DeferredTransformPart:
+        return self
+
+    def _is_translation(self) -> bool:
+        return self._trsf.Form() in (OCC.Core.gp.gp_TrsfForm.gp_Identity, OCC.Core.gp.gp_TrsfForm.gp_Translation)
+
+    @property
+    def extents(self) -> op.Extents:
+        if self._extents is None:
+            if self.is_loaded:
+                self._extents = self.load().extents
+            elif self._is_translation():
+                self._extents = self._untransformed_part.extents.transformed(self._trsf)
+            elif PartTransformer.is_rigid(self._trsf):
+                self._extents = op.Extents(
+                    self._untransformed_part.shape.Moved(OCC.Core.TopLoc.TopLoc_Location(self._trsf)))
+            else:
+                self._extents = self.load().extents
+
+        return self._extents
+
+    @property
+    def xts_fast(self) -> op.Extents:
+        if self._extents is not None:
+            return self._extents
+
+        if self.is_loaded:
+            return self.load().xts_fast
+
+        if self._is_translation():
+            return self.extents
+
+        if self._extents_bound is None:
+            self._extents_bound = self._untransformed_part.xts_fast.transformed(self._trsf)
+
+        return self._extents_bound
 
 
 class PartAlgorithm:
@@ -1001,7 +1351,7 @@ class PartAlgorithm:
                                 cam_focus: float,
                                 transform_to_camera_plane: bool = True):
         token = self._part.cache_token.mutated("project_to_edge_network",
-                                               inspect.getsource(PartAlgorithm.project_to_edge_network),
+                                               SourceFingerprints.of(PartAlgorithm.project_to_edge_network),
                                                cam_origin,
                                                cam_direction,
                                                is_perspective,
@@ -1346,6 +1696,10 @@ class PartInspect:
 
 class PartSave:
 
+    OCAF_EXTENSION = ".part.cbf"
+
+    BINARY_EXTENSION = ".part.bin"
+
     def __init__(self, part: Part):
         self._part = part
 
@@ -1395,7 +1749,7 @@ class PartSave:
     def load_ocaf(path: str, part_cache: PartCache) -> Part:
         PartSave._validate_ocaf_path(path)
 
-        w = ocaf_wrapper_swig.OcafWrapper(path + ".part.cbf")
+        w = ocaf_wrapper_swig.OcafWrapper(path + PartSave.OCAF_EXTENSION)
         w.load()
 
         root_shape = w.getRootShape()
@@ -1403,24 +1757,114 @@ class PartSave:
         root_shape_shape = PartSave._downcast_shape(root_shape.shape)
         root_shape_attributes = json.loads(root_shape.annotationString)
 
-        shape_names = w.getShapeNames()
+        def load_subshapes() -> typing.Dict[str, typing.List[AnnotatedShape]]:
+            subshapes: typing.Dict[str, typing.List[AnnotatedShape]] = dict()
 
-        subshapes: typing.Dict[str, typing.List[AnnotatedShape]] = dict()
+            for name in w.getShapeNames():
+                subshapes[name] = []
+                for subshape in w.getShapesForName(name):
+                    subshape_shape = PartSave._downcast_shape(subshape.shape)
+                    subshape_attributes = json.loads(subshape.annotationString)
+                    subshapes[name].append(AnnotatedShape(subshape_shape, subshape_attributes))
 
-        for name in shape_names:
-            subshapes[name] = []
-            for subshape in w.getShapesForName(name):
-                subshape_shape = PartSave._downcast_shape(subshape.shape)
-                subshape_attributes = json.loads(subshape.annotationString)
-                subshapes[name].append(AnnotatedShape(subshape_shape, subshape_attributes))
+            return subshapes
 
         uuid = w.getUUID()
 
         from ezocc.part_cache import DefaultCacheToken
 
-        return Part(DefaultCacheToken.with_uuid(uuid, part_cache), SubshapeMap(
+        # saved subshape maps are always pruned. Labelled subshapes are only materialised once they are first accessed,
+        # so parts that are only used for their root shape do not pay for them.
+        return Part(DefaultCacheToken.with_uuid(uuid, part_cache), SubshapeMap.lazy(
             AnnotatedShape(root_shape_shape, root_shape_attributes),
-            subshapes))
+            load_subshapes,
+            is_pruned=True))
+
+    def binary(self, path: str, include_uuid: bool = True) -> None:
+        """
+        Saves the part in the binary part format: a single BinTools stream of the root shape, with labelled subshapes
+        stored as indices into the root shape's indexed map and all annotations in one JSON header. Faster to save and
+        load than ocaf, but only readable by ezocc.
+
+        @param include_uuid: if False, the part's uuid is omitted so that parts with identical content produce identical
+        files. The uuid must then be supplied when loading.
+        """
+        PartSave._validate_ocaf_path(path)
+        path = path + PartSave.BINARY_EXTENSION
+
+        subshapes = self._part._subshapes
+        root_shape = subshapes.root_shape
+
+        named_shapes = [(name, s) for name, shapes in subshapes.items() for s in shapes]
+        indices = BinaryPartWrapper.subshape_indices(
+            root_shape.set_placeable_shape.shape, [s.set_placeable_shape.shape for _, s in named_shapes])
+
+        header_subshapes: typing.Dict[str, typing.List] = dict()
+        for (name, s), index in zip(named_shapes, indices):
+            if index == 0:
+                raise ValueError(f"Labelled shape \"{name}\" is not a subshape of the root shape")
+
+            header_subshapes.setdefault(name, []).append(
+                [index, int(s.set_placeable_shape.shape.Orientation()), s.attributes.values])
+
+        header = {
+            "uuid": self._part.cache_token.compute_uuid() if include_uuid else None,
+            "root_attributes": root_shape.attributes.values,
+            "subshapes": header_subshapes
+        }
+
+        BinaryPartWrapper.write(path, json.dumps(header), root_shape.set_placeable_shape.shape)
+
+    @staticmethod
+    def load_binary(path: str,
+                    part_cache: PartCache,
+                    extension: str = BINARY_EXTENSION,
+                    part_uuid: typing.Optional[str] = None) -> Part:
+        """
+        @param extension: of the file to load, appended to path
+        @param part_uuid: the uuid of the loaded part, required if the file was saved without one
+        """
+        PartSave._validate_ocaf_path(path)
+
+        return PartSave._load_binary_reader(BinaryPartReader(path + extension), part_cache, part_uuid)
+
+    @staticmethod
+    def load_binary_buffer(buffer, part_cache: PartCache) -> Part:
+        """
+        @param buffer: the contents of a binary part file, as any object supporting the buffer protocol (e.g. a
+        memoryview slice of a memory mapped pack file). The buffer is not referenced after this call returns.
+        """
+        return PartSave._load_binary_reader(BinaryPartReader.from_buffer(buffer), part_cache)
+
+    @staticmethod
+    def _load_binary_reader(reader: BinaryPartReader,
+                            part_cache: PartCache,
+                            part_uuid: typing.Optional[str] = None) -> Part:
+        header = json.loads(reader.header())
+
+        if part_uuid is None:
+            part_uuid = header["uuid"]
+
+        if part_uuid is None:
+            raise ValueError("Part was saved without a uuid, one must be specified when loading")
+
+        root_shape = PartSave._downcast_shape(reader.root_shape())
+
+        def load_subshapes() -> typing.Dict[str, typing.List[AnnotatedShape]]:
+            subshapes: typing.Dict[str, typing.List[AnnotatedShape]] = dict()
+
+            for name, entries in header["subshapes"].items():
+                shapes = reader.subshapes([e[0] for e in entries], [e[1] for e in entries])
+                subshapes[name] = [AnnotatedShape(PartSave._downcast_shape(s), e[2]) for s, e in zip(shapes, entries)]
+
+            return subshapes
+
+        from ezocc.part_cache import DefaultCacheToken
+
+        return Part(DefaultCacheToken.with_uuid(part_uuid, part_cache), SubshapeMap.lazy(
+            AnnotatedShape(root_shape, header["root_attributes"]),
+            load_subshapes,
+            is_pruned=True))
 
     @staticmethod
     def _downcast_shape(shape: OCC.Core.TopoDS.TopoDS_Shape):
@@ -1785,22 +2229,25 @@ class PartExplorer:
         explore_results = self._explore_method(self._part.shape, self._shape_type) if self._shape_type is not None \
             else self._explore_method(self._part.shape)
 
-        def _find_subshape(s: OCC.Core.TopoDS.TopoDS_Shape):
-            existing = self._part.subshapes.find_annotated_shapes(op.SetPlaceableShape(s))
-
-            if len(existing) == 0:
-                return AnnotatedShape(s)
-            else:
-                return [*existing][0]
-
-        result = [Part(
-            self._part.cache_token.mutated("explore", s),
-            self._part.subshapes_with_updated_root_shape(_find_subshape(s))) for i, s in
-                  enumerate(explore_results)]
+        result = [PartExplorer.subshape_part(self._part, s) for s in explore_results]
         result = [p for p in result if self._predicate(p)]
         result.sort(key=self._key)
         return result
 
+    @staticmethod
+    def subshape_part(part: Part, s: OCC.Core.TopoDS.TopoDS_Shape) -> Part:
+        """
+        @return: the subshape s of the part as a Part, sharing the part's subshape map
+        """
+        existing = part.subshapes.find_annotated_shapes(op.SetPlaceableShape(s))
+
+        if len(existing) == 0:
+            annotated_shape = AnnotatedShape(s)
+        else:
+            annotated_shape = [*existing][0]
+
+        return Part(part.cache_token.mutated("explore", s), part.subshapes_with_updated_root_shape(annotated_shape))
+
     def get_compound(self) -> Part:
         result = self.get()
 
@@ -2237,28 +2684,75 @@ class PartExtruder:
 
 class PartTransformer:
 
-    def __init__(self, part):
+    def __init__(self, part, copy: bool = True):
+        """
+        @param copy: default for the copy argument of the transformations, see __call__
+        """
         self._part = part
+        self._copy = copy
+
+    @property
+    def located(self) -> PartTransformer:
+        """
+        @return: a transformer applying rigid transformations as shape locations, e.g. part.tr.located.mv(dx=1). See
+        the copy argument of __call__.
+        """
+        return PartTransformer(self._part, copy=False)
+
+    def __call__(self,
+                 trsf_configurer: typing.Union[OCC.Core.gp.gp_Trsf, typing.Callable[[OCC.Core.gp.gp_Trsf], None]],
+                 copy: typing.Optional[bool] = None) -> Part:
+        """
+        @param copy: if True (default, unless this transformer was obtained from located) the geometry is copied and
+        transformed. If False, rigid transformations (translations and rotations) only change the location of the
+        shape, sharing the underlying geometry (TShape) with this part. Transformations that scale or mirror are always
+        copied.
+        """
+        if copy is None:
+            copy = self._copy
 
-    def __call__(self, trsf_configurer: typing.Union[OCC.Core.gp.gp_Trsf, typing.Callable[[OCC.Core.gp.gp_Trsf], None]]) -> Part:
         if isinstance(trsf_configurer, OCC.Core.gp.gp_Trsf):
             trsf = trsf_configurer
         else:
             trsf = OCC.Core.gp.gp_Trsf()
             trsf_configurer(trsf)
 
-        trsf_values = [trsf.Value(int(i / 4) + 1, i % 4 + 1) for i in range(0, 12)]
-        token = self._part.cache_token.mutated("trsf", *trsf_values)
+        if isinstance(self._part, DeferredTransformPart):
+            return self._part.transformed(trsf, copy)
+
+        token = PartTransformer.token(self._part, trsf, copy)
 
         def _do():
+            if not copy and PartTransformer.is_rigid(trsf):
+                return self._part.moved(token, OCC.Core.TopLoc.TopLoc_Location(trsf))
+
             # copy to prevent underlying geom modification
             transformer = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_Transform(self._part.shape, trsf, True)
-            return self._part.perform_make_shape(
+            result = self._part.perform_make_shape(
                 token,
                 transformer)
+            result._propagate_extents(self._part, trsf)
+
+            return result
+
+        if token.is_noop:
+            return _do()
 
         return self._part.cache_token.get_cache().ensure_exists(token, _do)
 
+    @staticmethod
+    def token(part: Part, trsf: OCC.Core.gp.gp_Trsf, copy: bool = True) -> CacheToken:
+        return part.cache_token.mutated_lazy(
+            lambda: ["trsf"] + [trsf.Value(int(i / 4) + 1, i % 4 + 1) for i in range(0, 12)] +
+                    ([] if copy else ["located"]))
+
+    @staticmethod
+    def is_rigid(trsf: OCC.Core.gp.gp_Trsf) -> bool:
+        """
+        @return: True if the transformation only translates and/or rotates, so can be applied as a shape location
+        """
+        return not trsf.IsNegative() and abs(trsf.ScaleFactor() - 1) <= Precision.precision.Confusion()
+
     def mv(self, dx: float = 0, dy: float = 0, dz: float = 0) -> Part:
         return self.translate(dx, dy, dz)
 
@@ -2293,9 +2787,11 @@ class PartTransformer:
         result = self._part
         for t in trsf:
             transformer = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_GTransform(result.shape, t, True)
-            trsf_values = [t.Value(int(i / 4) + 1, i % 4 + 1) for i in range(0, 12)]
 
-            result = result.perform_make_shape(result.cache_token.mutated("g_trsf", trsf_values), transformer)
+            result = result.perform_make_shape(
+                result.cache_token.mutated_lazy(
+                    lambda: ("g_trsf", [t.Value(int(i / 4) + 1, i % 4 + 1) for i in range(0, 12)])),
+                transformer)
 
         return result
 
@@ -2340,8 +2836,26 @@ class PartTransformer:
         return self.g_transform_fields(r0c0=other_axes_val, r1c1=other_axes_val, r2c2=z_scale_factor)
 
 
+class BooleanStrategy(enum.Enum):
+    """
+    How PartBool.cut_many/fuse_many combine many tools.
+    """
+
+    # a single boolean operation with every tool
+    SINGLE_PASS = "single_pass"
+
+    # tools are grouped by their bounding boxes. Cuts skip tools that cannot intersect the part, fuses are performed on
+    # each group of overlapping parts separately and the (disjoint) results combined.
+    GROUPED = "grouped"
+
+    # single pass for fewer than PartBool.AUTO_GROUPING_THRESHOLD tools, grouped otherwise
+    AUTO = "auto"
+
+
 class PartBool:
 
+    AUTO_GROUPING_THRESHOLD = 16
+
     def __init__(self, part: Part, auto_extract_singleton_compound: bool=True):
         """
         @param part:
@@ -2409,9 +2923,180 @@ class PartBool:
                             glue)
 
     def intersects(self, other: Part, glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum] = None) -> bool:
-        common = self.common(other, glue=glue)
+        """
+        @return: True if common(other) would not be empty. Bounding box and distance checks are performed first, so
+        the boolean operation is only performed for parts that touch.
+        """
+        return op.BoolUtils.intersects(self._part.shape, other.shape, glue)
+
+    def intersects_many(self,
+                        others: typing.Sequence[Part],
+                        glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum] = None) -> typing.List[bool]:
+        """
+        @return: for each of the others, whether it intersects this part. Cheaper than calling intersects for each,
+        as the bounding boxes are compared all at once.
+        """
+        return op.BoolUtils.intersects_many(self._part.shape, [o.shape for o in others], glue)
+
+    def cut_many(self,
+                 tools: typing.Sequence[Part],
+                 strategy: BooleanStrategy = BooleanStrategy.AUTO,
+                 glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum] = None) -> Part:
+        """
+        Cuts every tool from this part. Intended for many tools (e.g. drilling patterns), see BooleanStrategy.
+        """
+        if len(tools) == 0:
+            raise ValueError("No tools specified")
+
+        tools = list(tools)
+        strategy = PartBool._resolve_strategy(strategy, tools)
+
+        token = self._part.cache_token.mutated_lazy(
+            lambda: ("boolop", "cut_many", [self._part], tools, glue, strategy.value))
+
+        def _do():
+            start = time.perf_counter()
+
+            if strategy == BooleanStrategy.GROUPED:
+                # tools that cannot intersect the part do not affect the result
+                part_box = op.BoolUtils.bounding_box(self._part.shape)
+                used_tools = [t for t in tools if op.BoolUtils.boxes_overlap(part_box, op.BoolUtils.bounding_box(t.shape))]
+            else:
+                used_tools = tools
+
+            if len(used_tools) == 0:
+                result = self._part.with_cache_token(token)
+            else:
+                result = self._perform_boolop(token, OCC.Core.BRepAlgoAPI.BRepAlgoAPI_Cut(), [self._part], used_tools, glue)
+
+            self._record_strategy(token, "cut_many", strategy, start, tools=len(tools), used_tools=len(used_tools))
+
+            return result
+
+        if token.is_noop:
+            return _do()
+
+        return token.get_cache().ensure_exists(token, _do)
+
+    def fuse_many(self,
+                  tools: typing.Sequence[Part],
+                  strategy: BooleanStrategy = BooleanStrategy.AUTO,
+                  glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum] = None) -> Part:
+        """
+        Fuses every tool with this part. Intended for many tools (e.g. lattices), see BooleanStrategy.
+        """
+        if len(tools) == 0:
+            raise ValueError("No tools specified")
+
+        tools = list(tools)
+        strategy = PartBool._resolve_strategy(strategy, tools)
+
+        token = self._part.cache_token.mutated_lazy(
+            lambda: ("boolop", "fuse_many", [self._part], tools, glue, strategy.value))
+
+        def _do():
+            start = time.perf_counter()
+
+            if strategy == BooleanStrategy.SINGLE_PASS:
+                result = self._perform_boolop(token, OCC.Core.BRepAlgoAPI.BRepAlgoAPI_Fuse(), [self._part], tools, glue)
+                group_count = 1
+            else:
+                result, group_count = self._fuse_grouped(token, tools, glue)
+
+            self._record_strategy(token, "fuse_many", strategy, start, tools=len(tools), groups=group_count)
+
+            return result
+
+        if token.is_noop:
+            return _do()
+
+        return token.get_cache().ensure_exists(token, _do)
+
+    def _fuse_grouped(self,
+                      cache_token: CacheToken,
+                      tools: typing.List[Part],
+                      glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum]) -> typing.Tuple[Part, int]:
+        """
+        Fuses each group of parts with overlapping bounding boxes separately. The groups cannot intersect each other, so
+        the result is the compound of the group results. The histories of the group operations are combined (see
+        _add_history) so that subshapes are mapped once.
+        """
+        parts = [self._part] + tools
+
+        groups = op.BoolUtils.group_overlapping([p.shape for p in parts])
+
+        history = OCC.Core.BRepTools.BRepTools_History()
+        shapes = []
+
+        for group in groups:
+            if len(group) == 1:
+                shapes.append(parts[group[0]].shape)
+                continue
+
+            algo = OCC.Core.BRepAlgoAPI.BRepAlgoAPI_Fuse()
+            PartBool._build(algo, [parts[group[0]]], [parts[i] for i in group[1:]], glue)
+
+            for i in group:
+                PartBool._add_history(history, algo, parts[i].shape)
+
+            shapes.append(algo.Shape())
 
-        return not op.InterrogateUtils.is_empty_compound(common.shape)
+        shape = shapes[0] if len(shapes) == 1 else op.GeomUtils.make_compound(*shapes)
+
+        return self._result_part(cache_token, shape, parts, history), len(groups)
+
+    @staticmethod
+    def _add_history(history: OCC.Core.BRepTools.BRepTools_History,
+                     algo: OCC.Core.BRepAlgoAPI.BRepAlgoAPI_BooleanOperation,
+                     shape: OCC.Core.TopoDS.TopoDS_Shape):
+        """
+        Copies the history of the subshapes of shape (an input of algo) into history. BRepTools_History.Merge is not
+        suitable for combining independent operations, as it composes the histories in sequence. Subshapes without
+        history are kept unchanged, as are the inputs of groups with no operation.
+        """
+        # the shape types BRepTools_History supports
+        for shape_type in (ta.TopAbs_VERTEX, ta.TopAbs_EDGE, ta.TopAbs_FACE, ta.TopAbs_SOLID):
+            subshapes = OCC.Core.TopTools.TopTools_IndexedMapOfShape()
+            OCC.Core.TopExp.topexp.MapShapes(shape, shape_type, subshapes)
+
+            for i in range(1, subshapes.Size() + 1):
+                subshape = subshapes.FindKey(i)
+
+                if algo.IsDeleted(subshape):
+                    history.Remove(subshape)
+                    continue
+
+                for modified in op.ListUtils.iterate_list(algo.Modified(subshape)):
+                    history.AddModified(subshape, modified)
+
+                for generated in op.ListUtils.iterate_list(algo.Generated(subshape)):
+                    history.AddGenerated(subshape, generated)
+
+    @staticmethod
+    def _resolve_strategy(strategy: BooleanStrategy, tools: typing.List[Part]) -> BooleanStrategy:
+        if strategy != BooleanStrategy.AUTO:
+            return strategy
+
+        if len(tools) >= PartBool.AUTO_GROUPING_THRESHOLD:
+            return BooleanStrategy.GROUPED
+
+        return BooleanStrategy.SINGLE_PASS
+
+    def _record_strategy(self, cache_token: CacheToken, operation: str, strategy: BooleanStrategy, start: float,
+                         **details):
+        instrumentation = self._part.cache_token.get_cache().instrumentation
+
+        if not instrumentation.enabled:
+            return
+
+        instrumentation.record_event("boolean",
+                                     cache_token.label,
+                                     start,
+                                     time.perf_counter() - start,
+                                     None if cache_token.is_noop else cache_token.compute_uuid(),
+                                     operation=operation,
+                                     strategy=strategy.value,
+                                     **details)
 
     def _boolop(self,
                 cache_token: CacheToken,
@@ -2421,61 +3106,80 @@ class PartBool:
                 glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum] = None) -> Part:
 
         def _do():
-            algo.SetRunParallel(True)
-            algo.SetUseOBB(True)
-            algo.SetNonDestructive(True)
-            algo.SetArguments(op.ListUtils.list([p.shape for p in args]))
-            algo.SetTools(op.ListUtils.list([p.shape for p in tools]))
+            return self._perform_boolop(cache_token, algo, args, tools, glue)
 
-            if glue is not None:
-                algo.SetGlue(glue)
+        return cache_token.get_cache().ensure_exists(cache_token, _do)
 
-            algo.Build()
+    def _perform_boolop(self,
+                        cache_token: CacheToken,
+                        algo: OCC.Core.BRepAlgoAPI.BRepAlgoAPI_BooleanOperation,
+                        args: typing.List[Part],
+                        tools: typing.List[Part],
+                        glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum] = None) -> Part:
+        PartBool._build(algo, args, tools, glue)
 
-            if algo.HasErrors():
-                report = algo.GetReport()
+        return self._result_part(cache_token, algo.Shape(), args + tools, algo)
 
-                alerts = report.GetAlerts(Message_Gravity.Message_Fail)
+    @staticmethod
+    def _build(algo: OCC.Core.BRepAlgoAPI.BRepAlgoAPI_BooleanOperation,
+               args: typing.List[Part],
+               tools: typing.List[Part],
+               glue: typing.Optional[OCC.Core.BOPAlgo.BOPAlgo_GlueEnum]):
+        algo.SetRunParallel(True)
+        algo.SetUseOBB(True)
+        algo.SetNonDestructive(True)
+        algo.SetArguments(op.ListUtils.list([p.shape for p in args]))
+        algo.SetTools(op.ListUtils.list([p.shape for p in tools]))
 
-                alert_values = []
-                while alerts.Size() != 0:
-                    alert_values.append(alerts.First())
-                    alerts.RemoveFirst()
+        if glue is not None:
+            algo.SetGlue(glue)
 
-                alert_values = [a.GetMessageKey() for a in alert_values]
+        algo.Build()
 
-                arg_str = '\n'.join(str(p) for p in args)
-                tools_str = '\n'.join(str(p) for p in tools)
+        if algo.HasErrors():
+            report = algo.GetReport()
 
-                logger.error(f"Bool op failed with following alerts: {alert_values}\n\nArgs:\n{arg_str}\n\nTools\n\n{tools_str}\n\n")
+            alerts = report.GetAlerts(Message_Gravity.Message_Fail)
 
-                raise RuntimeError(f"bool op failed with the following alerts: {alert_values} "
-                                   f"(operation was performed with args {arg_str}, tools: {tools_str})")
+            alert_values = []
+            while alerts.Size() != 0:
+                alert_values.append(alerts.First())
+                alerts.RemoveFirst()
 
-            shape = algo.Shape()
+            alert_values = [a.GetMessageKey() for a in alert_values]
 
-            union_subshapes = self._part.subshapes_with_updated_root_shape(shape)
-            for p in args:
-                union_subshapes.merge(p.subshapes.map_subshape_changes(union_subshapes.root_shape, mks=algo))
+            arg_str = '\n'.join(str(p) for p in args)
+            tools_str = '\n'.join(str(p) for p in tools)
 
-            for p in tools:
-                union_subshapes.merge(p.subshapes.map_subshape_changes(union_subshapes.root_shape, mks=algo))
+            logger.error(f"Bool op failed with following alerts: {alert_values}\n\nArgs:\n{arg_str}\n\nTools\n\n{tools_str}\n\n")
 
-            result = Part(cache_token, union_subshapes)
+            raise RuntimeError(f"bool op failed with the following alerts: {alert_values} "
+                               f"(operation was performed with args {arg_str}, tools: {tools_str})")
 
-            if self._auto_extract_singleton_compound and not self._part.inspect.is_compound() \
-                and op.InterrogateUtils.is_singleton_compound(shape):
+    def _result_part(self,
+                     cache_token: CacheToken,
+                     shape: OCC.Core.TopoDS.TopoDS_Shape,
+                     inputs: typing.List[Part],
+                     mks: T_MKS) -> Part:
+        union_subshapes = self._part.subshapes_with_updated_root_shape(shape)
 
-                direct_subshape = next(s for s in op.InterrogateUtils.traverse_direct_subshapes(result.shape))
+        # the subshapes of every input are mapped through the operation history at once
+        union_subshapes.merge(SubshapeMap.map_subshape_changes_many(
+            [p.subshapes for p in inputs], union_subshapes.root_shape, mks=mks))
 
-                logger.info(f"Boolop output is compound of single part of type {Humanize.shape_type(direct_subshape.ShapeType())}, "
-                            f"and input shape is not a compound. Reducing output to a single shape for simplicity.")
+        result = Part(cache_token, union_subshapes)
 
-                result = Part(cache_token, union_subshapes.with_updated_root_shape(direct_subshape))
+        if self._auto_extract_singleton_compound and not self._part.inspect.is_compound() \
+            and op.InterrogateUtils.is_singleton_compound(shape):
 
-            return result
+            direct_subshape = next(s for s in op.InterrogateUtils.traverse_direct_subshapes(result.shape))
 
-        return cache_token.get_cache().ensure_exists(cache_token, _do)
+            logger.info(f"Boolop output is compound of single part of type {Humanize.shape_type(direct_subshape.ShapeType())}, "
+                        f"and input shape is not a compound. Reducing output to a single shape for simplicity.")
+
+            result = Part(cache_token, union_subshapes.with_updated_root_shape(direct_subshape))
+
+        return result
 
 
 class PartMirror:
@@ -2771,9 +3475,13 @@ class PartAligner:
                             "(y(min|max|mid)(min|max|mid)?)?\\.?"
                             "(z(min|max|mid)(min|max|mid)?)?")
 
-    def __init__(self, part, *subshape_names: str):
+    def __init__(self, part, *subshape_names: str, fast: bool = False):
         self._part = part
         self._subshape_names = subshape_names
+        self._fast = fast
+
+    def _extents(self, part: Part) -> op.Extents:
+        return part.xts_fast if self._fast else part.extents
 
     def com_to_origin(self) -> Part:
         com = op.InterrogateUtils.center_of_mass(self._part.shape)
@@ -2804,7 +3512,7 @@ class PartAligner:
     def by(self, command: str, other: Part) -> Part:
         token = self._part.cache_token.mutated(
             "part_aligner", "align_by",
-            self._subshape_names, command, other)
+            self._subshape_names, command, other, *(["fast"] if self._fast else []))
 
         return self._part.cache_token.get_cache().ensure_exists(
             token,
@@ -2842,7 +3550,8 @@ class PartAligner:
             if dest_ext is None:
                 dest_ext = source_ext
 
-            result = result.align(*self._subshape_names).__getattr__(f"{axis}_{source_ext}_to_{dest_ext}")(other)
+            result = result.align(*self._subshape_names, fast=self._fast)\
+                .__getattr__(f"{axis}_{source_ext}_to_{dest_ext}")(other)
 
             command = pull_separator(command)
 
@@ -2858,11 +3567,11 @@ class PartAligner:
         source_part = align_args[1]
 
         if len(self._subshape_names) == 0:
-            source_extents = self._part.extents
+            source_extents = self._extents(self._part)
         elif len(self._subshape_names) == 1:
-            source_extents = self._part.compound_subpart(self._subshape_names[0]).extents
+            source_extents = self._extents(self._part.compound_subpart(self._subshape_names[0]))
         else:
-            source_extents = self._part.sp(*self._subshape_names).extents
+            source_extents = self._extents(self._part.sp(*self._subshape_names))
 
         if len(align_args) < 4:
             def result_fn_coords(**kwargs) -> Part:
@@ -2882,13 +3591,15 @@ class PartAligner:
 
         dest_part = align_args[3]
 
-        def result_fn(dest_shape: typing.Union[OCC.Core.TopoDS.TopoDS_Shape, Part]) -> Part:
-            if not isinstance(dest_shape, OCC.Core.TopoDS.TopoDS_Shape):
-                # must be a part
-                dest_shape = dest_shape.shape
+        def result_fn(dest: typing.Union[OCC.Core.TopoDS.TopoDS_Shape, Part]) -> Part:
+            if isinstance(dest, OCC.Core.TopoDS.TopoDS_Shape):
+                dest_extents = op.Extents(dest, optimal=not self._fast)
+            else:
+                # must be a part, which may already know its extents
+                dest_extents = self._extents(dest)
 
             align_source = getattr(source_extents, f"xyz_{source_part}")
-            align_dest = getattr(op.Extents(dest_shape), f"xyz_{dest_part}")
+            align_dest = getattr(dest_extents, f"xyz_{dest_part}")
 
             dx = align_dest[0] - align_source[0] if "x" in axes else 0
             dy = align_dest[1] - align_source[1] if "y" in axes else 0
@@ -3237,7 +3948,7 @@ class PartFactory:
 
     def torus(self, r_major: float, r_minor: float):
 
-        token = self._cache.create_token(inspect.getsource(PartFactory.torus), r_major, r_minor)
+        token = self._cache.create_token(SourceFingerprints.of(PartFactory.torus), r_major, r_minor)
 
         def _do():
             shape = OCC.Core.BRepPrim.BRepPrim_Torus(r_major, r_minor).Shell()
@@ -3725,8 +4436,8 @@ class PartFactory:
                                          cube_hex_effect_a,
                                          cube_hex_effect_b,
                                          cube_hex_line_thickness,
-                                         inspect.getsource(modifier_callback) if modifier_callback is not None else None,
-                                         inspect.getsource(PartFactory))
+                                         SourceFingerprints.of(modifier_callback) if modifier_callback is not None else None,
+                                         SourceFingerprints.of(PartFactory))
 
         def _do():
             if modifier_callback is None:
@@ -4534,21 +5245,27 @@ class PartSelectionResolver:
 
 class PartPickResult:
 
-    def __init__(self, section, line: OCC.Core.gp.gp_Lin, picked_part: Part):
+    def __init__(self,
+                 hits: typing.List[RayHit],
+                 origin: typing.Tuple[float, float, float],
+                 direction: typing.Tuple[float, float, float],
+                 picked_part: Part):
         self._picked_part = picked_part
-        curve = OCC.Core.GC.GC_MakeLine(line).Value()
-
-        verts: typing.List[OCC.Core.TopoDS.TopAbs_VERTEX] = section.explore.vertex.get()
+        self._hits = hits
 
-        def get_vert_param(vert):
-            return OCC.Core.GeomAPI.GeomAPI_ProjectPointOnCurve(
-                OCC.Core.BRep.BRep_Tool.Pnt(vert.shape), curve).Parameter(1)
+        self._verts = [
+            Part(picked_part.cache_token.mutated("pick", origin, direction, i),
+                 SubshapeMap.from_single_shape(
+                     OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeVertex(OCC.Core.gp.gp_Pnt(*h.point)).Vertex()))
+            for i, h in enumerate(hits)]
 
-        pruned_verts = [v for v in verts if get_vert_param(v) >= 0]
-
-        pruned_verts.sort(key=get_vert_param)
-
-        self._verts = pruned_verts
+    @property
+    def hits(self) -> typing.List[RayHit]:
+        """
+        @return: the points where the ray meets the picked part, nearest first, with the faces/edges/vertices they
+        lie on and their distance along the ray
+        """
+        return list(self._hits)
 
     def first(self) -> Part:
         return self._verts[0]
@@ -4560,26 +5277,20 @@ class PartPickResult:
         return self.nth_edge(0)
 
     def nth_face(self, n: int) -> Part:
-        vertex = self.as_list()[n]
+        faces = self._hits[n].faces
 
-        for f in self._picked_part.explore.face.get():
-            section = vertex.bool.common(f)
+        if len(faces) == 0:
+            raise ValueError("No faces picked.")
 
-            if len(section.explore.vertex.get()) != 0:
-                return f
-
-        raise ValueError("No faces picked.")
+        return PartExplorer.subshape_part(self._picked_part, faces[0])
 
     def nth_edge(self, n: int) -> Part:
-        vertex = self.as_list()[n]
-
-        for e in self._picked_part.explore.edge.get():
-            section = vertex.bool.common(e)
+        edges = self._hits[n].edges
 
-            if len(section.explore.vertex.get()) != 0:
-                return e
+        if len(edges) == 0:
+            raise ValueError("No edges picked.")
 
-        raise ValueError("No edges picked.")
+        return PartExplorer.subshape_part(self._picked_part, edges[0])
 
     def face_list(self) -> typing.List[Part]:
         return [self.nth_face(i) for i in range(0, len(self.as_list()))]
@@ -4615,16 +5326,10 @@ class PartPick:
     def dir(self,
             origin: typing.Tuple[float, float, float],
             direction: typing.Tuple[float, float, float]) -> PartPickResult:
-        origin_pnt = OCC.Core.gp.gp_Pnt(*origin)
-        direction_dir = OCC.Core.gp.gp_Dir(OCC.Core.gp.gp_Vec(*direction).Normalized())
-
-        line = OCC.Core.gp.gp_Lin(origin_pnt, direction_dir)
-        shape = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeEdge(line).Edge()
-        ray = Part(self._part.cache_token.mutated("pick", shape), SubshapeMap.from_single_shape(shape))
-
-        section = ray.bool.section(self._part)
+        origin = tuple(origin)
+        direction = tuple(direction)
 
-        return PartPickResult(section, line, self._part)
+        return PartPickResult(self._part.spatial_index.ray_cast(origin, direction), origin, direction, self._part)
 
 
 class PartCast:
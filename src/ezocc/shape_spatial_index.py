@@ -0,0 +1,263 @@
+"""
+Spatial index over the faces, edges and vertices of a shape, for ray casts (see PartPick) and proximity queries.
+
+The bounding boxes of the subshapes are held in NumPy arrays, so each query first rejects every subshape whose box
+the ray (or query sphere) misses in a single vectorized pass. Exact intersection/distance computations are then only
+performed for the few remaining subshapes, rather than e.g. sectioning the ray with the whole shape.
+"""
+from __future__ import annotations
+
+import typing
+
+import OCC.Core.BRep
+import OCC.Core.BRepBndLib
+import OCC.Core.BRepBuilderAPI
+import OCC.Core.BRepExtrema
+import OCC.Core.Bnd
+import OCC.Core.Extrema
+import OCC.Core.IntCurvesFace
+import OCC.Core.TopAbs
+import OCC.Core.TopoDS
+import OCC.Core.gp
+import numpy
+
+from ezocc.occutils_python import ExploreUtils, SetPlaceableShape
+
+T_XYZ = typing.Tuple[float, float, float]
+
+
+class RayHit:
+    """
+    A point where a ray meets the shape, with the subshapes that the point lies on. Subshapes are in the order in
+    which TopExp_Explorer visits them.
+    """
+
+    def __init__(self,
+                 parameter: float,
+                 point: T_XYZ,
+                 faces: typing.List[OCC.Core.TopoDS.TopoDS_Shape],
+                 edges: typing.List[OCC.Core.TopoDS.TopoDS_Shape],
+                 vertices: typing.List[OCC.Core.TopoDS.TopoDS_Shape]):
+        """
+        @param parameter: distance of the point along the ray from its origin
+        """
+        self.parameter = parameter
+        self.point = point
+        self.faces = faces
+        self.edges = edges
+        self.vertices = vertices
+
+    def __repr__(self):
+        return f"RayHit(parameter={self.parameter}, point={self.point}, faces={len(self.faces)}, " \
+               f"edges={len(self.edges)}, vertices={len(self.vertices)})"
+
+
+class ShapeSpatialIndex:
+
+    FACE = OCC.Core.TopAbs.TopAbs_FACE
+
+    EDGE = OCC.Core.TopAbs.TopAbs_EDGE
+
+    VERTEX = OCC.Core.TopAbs.TopAbs_VERTEX
+
+    def __init__(self, shape: OCC.Core.TopoDS.TopoDS_Shape, tolerance: float = 1e-6):
+        """
+        @param tolerance: points closer than this are considered to coincide
+        """
+        self._tolerance = tolerance
+
+        self._subshapes: typing.Dict[OCC.Core.TopAbs.TopAbs_ShapeEnum, typing.List[OCC.Core.TopoDS.TopoDS_Shape]] = {}
+        self._boxes: typing.Dict[OCC.Core.TopAbs.TopAbs_ShapeEnum, numpy.ndarray] = {}
+
+        for shape_type in [ShapeSpatialIndex.FACE, ShapeSpatialIndex.EDGE, ShapeSpatialIndex.VERTEX]:
+            subshapes = ShapeSpatialIndex._unique(ExploreUtils.explore_iterate(shape, shape_type))
+
+            self._subshapes[shape_type] = subshapes
+            self._boxes[shape_type] = numpy.array([ShapeSpatialIndex._box(s) for s in subshapes]).reshape(-1, 6)
+
+        self._vertex_points = numpy.array([
+            ShapeSpatialIndex._xyz(OCC.Core.BRep.BRep_Tool.Pnt(v)) for v in self._subshapes[ShapeSpatialIndex.VERTEX]
+        ]).reshape(-1, 3)
+
+        # created when a face is first a candidate of a ray cast
+        self._face_intersectors: typing.Dict[int, OCC.Core.IntCurvesFace.IntCurvesFace_Intersector] = {}
+
+    def subshapes(self, shape_type: OCC.Core.TopAbs.TopAbs_ShapeEnum) -> typing.List[OCC.Core.TopoDS.TopoDS_Shape]:
+        """
+        @return: the indexed subshapes of the type, each once, in explore order
+        """
+        return list(self._subshapes[shape_type])
+
+    def ray_cast(self, origin: T_XYZ, direction: T_XYZ) -> typing.List[RayHit]:
+        """
+        @return: the points where the ray meets the shape, nearest first
+        """
+        o = numpy.array(origin, dtype=float)
+        d = numpy.array(direction, dtype=float)
+        d /= numpy.linalg.norm(d)
+
+        line = OCC.Core.gp.gp_Lin(OCC.Core.gp.gp_Pnt(*o), OCC.Core.gp.gp_Dir(*d))
+
+        # (parameter, point, shape type, subshape index)
+        raw_hits: typing.List[typing.Tuple[float, T_XYZ, OCC.Core.TopAbs.TopAbs_ShapeEnum, int]] = []
+
+        hit, t_min, t_max = self._ray_box_intervals(self._boxes[ShapeSpatialIndex.FACE], o, d)
+        for i in numpy.nonzero(hit)[0]:
+            intersector = self._face_intersector(i)
+            intersector.Perform(line, t_min[i] - self._tolerance, t_max[i] + self._tolerance)
+
+            for k in range(1, intersector.NbPnt() + 1):
+                if intersector.WParameter(k) >= 0:
+                    raw_hits.append((intersector.WParameter(k),
+                                     ShapeSpatialIndex._xyz(intersector.Pnt(k)),
+                                     ShapeSpatialIndex.FACE,
+                                     i))
+
+        hit, t_min, t_max = self._ray_box_intervals(self._boxes[ShapeSpatialIndex.EDGE], o, d)
+        candidates = numpy.nonzero(hit)[0]
+        if len(candidates) > 0:
+            # a segment of the ray, covering every candidate box
+            t0 = float(numpy.min(t_min[candidates]))
+            t1 = max(float(numpy.max(t_max[candidates])), t0 + 1)
+            segment = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeEdge(
+                OCC.Core.gp.gp_Pnt(*(o + t0 * d)), OCC.Core.gp.gp_Pnt(*(o + t1 * d))).Edge()
+
+            for i in candidates:
+                dist = OCC.Core.BRepExtrema.BRepExtrema_DistShapeShape(
+                    segment, self._subshapes[ShapeSpatialIndex.EDGE][i], OCC.Core.Extrema.Extrema_ExtFlag_MIN)
+
+                if not dist.IsDone() or dist.Value() > self._tolerance:
+                    continue
+
+                for k in range(1, dist.NbSolution() + 1):
+                    point = ShapeSpatialIndex._xyz(dist.PointOnShape1(k))
+                    raw_hits.append((float(numpy.dot(numpy.array(point) - o, d)), point, ShapeSpatialIndex.EDGE, i))
+
+        relative = self._vertex_points - o
+        t = relative @ d
+        off_ray = numpy.linalg.norm(relative - numpy.outer(t, d), axis=1)
+        for i in numpy.nonzero((t >= 0) & (off_ray <= self._tolerance))[0]:
+            raw_hits.append((float(t[i]), tuple(self._vertex_points[i]), ShapeSpatialIndex.VERTEX, i))
+
+        return self._group_hits(raw_hits)
+
+    def near(self,
+             xyz: T_XYZ,
+             distance: float,
+             shape_type: OCC.Core.TopAbs.TopAbs_ShapeEnum) -> typing.List[OCC.Core.TopoDS.TopoDS_Shape]:
+        """
+        @return: the subshapes of the type within the distance of the point, in explore order
+        """
+        p = numpy.array(xyz, dtype=float)
+        boxes = self._boxes[shape_type]
+
+        # distance from the point to each box, zero inside it
+        outside = numpy.maximum(numpy.maximum(boxes[:, 0:3] - p, p - boxes[:, 3:6]), 0)
+        candidates = numpy.nonzero(numpy.linalg.norm(outside, axis=1) <= distance + self._tolerance)[0]
+
+        vertex = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeVertex(OCC.Core.gp.gp_Pnt(*p)).Vertex()
+
+        result = []
+        for i in candidates:
+            subshape = self._subshapes[shape_type][i]
+            dist = OCC.Core.BRepExtrema.BRepExtrema_DistShapeShape(
+                vertex, subshape, OCC.Core.Extrema.Extrema_ExtFlag_MIN)
+
+            if dist.IsDone() and dist.Value() <= distance:
+                result.append(subshape)
+
+        return result
+
+    def _face_intersector(self, i: int) -> OCC.Core.IntCurvesFace.IntCurvesFace_Intersector:
+        if i not in self._face_intersectors:
+            self._face_intersectors[i] = OCC.Core.IntCurvesFace.IntCurvesFace_Intersector(
+                self._subshapes[ShapeSpatialIndex.FACE][i], self._tolerance)
+
+        return self._face_intersectors[i]
+
+    def _ray_box_intervals(self,
+                           boxes: numpy.ndarray,
+                           o: numpy.ndarray,
+                           d: numpy.ndarray) -> typing.Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        @return: whether the ray (from the origin onwards) meets each box, and the parameter range in which it does
+        """
+        box_min = boxes[:, 0:3] - self._tolerance
+        box_max = boxes[:, 3:6] + self._tolerance
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            t1 = (box_min - o) / d
+            t2 = (box_max - o) / d
+
+        # a ray parallel to a pair of box faces meets the box only if it lies between them
+        parallel = d == 0
+        between = (box_min <= o) & (o <= box_max)
+
+        t_near = numpy.where(parallel, numpy.where(between, -numpy.inf, numpy.inf), numpy.minimum(t1, t2))
+        t_far = numpy.where(parallel, numpy.where(between, numpy.inf, -numpy.inf), numpy.maximum(t1, t2))
+
+        t_min = numpy.maximum(numpy.max(t_near, axis=1), 0)
+        t_max = numpy.min(t_far, axis=1)
+
+        # void boxes are NaN, which compare as not hit
+        return t_max >= t_min, t_min, t_max
+
+    def _group_hits(self,
+                    raw_hits: typing.List[typing.Tuple[float, T_XYZ, OCC.Core.TopAbs.TopAbs_ShapeEnum, int]]) -> \
+            typing.List[RayHit]:
+        """
+        Merges hits on different subshapes at the same point (e.g. on an edge and both its faces)
+        """
+        raw_hits.sort(key=lambda h: h[0])
+
+        groups: typing.List[typing.List[typing.Tuple[float, T_XYZ, OCC.Core.TopAbs.TopAbs_ShapeEnum, int]]] = []
+        for h in raw_hits:
+            if len(groups) > 0 and h[0] - groups[-1][0][0] <= self._tolerance:
+                groups[-1].append(h)
+            else:
+                groups.append([h])
+
+        result = []
+        for group in groups:
+            def subshapes_of_type(shape_type: OCC.Core.TopAbs.TopAbs_ShapeEnum) -> typing.List[OCC.Core.TopoDS.TopoDS_Shape]:
+                return [self._subshapes[shape_type][i] for i in sorted({h[3] for h in group if h[2] == shape_type})]
+
+            result.append(RayHit(group[0][0],
+                                 group[0][1],
+                                 subshapes_of_type(ShapeSpatialIndex.FACE),
+                                 subshapes_of_type(ShapeSpatialIndex.EDGE),
+                                 subshapes_of_type(ShapeSpatialIndex.VERTEX)))
+
+        return result
+
+    @staticmethod
+    def _unique(shapes: typing.Iterable[OCC.Core.TopoDS.TopoDS_Shape]) -> typing.List[OCC.Core.TopoDS.TopoDS_Shape]:
+        """
+        @return: the shapes, without repeats of the same shape (e.g. an edge visited once for each of its faces)
+        """
+        seen: typing.Set[SetPlaceableShape] = set()
+        result = []
+
+        for s in shapes:
+            sps = SetPlaceableShape(s)
+
+            if sps not in seen:
+                seen.add(sps)
+                result.append(s)
+
+        return result
+
+    @staticmethod
+    def _box(shape: OCC.Core.TopoDS.TopoDS_Shape) -> typing.Tuple[float, ...]:
+        bnd_box = OCC.Core.Bnd.Bnd_Box()
+        OCC.Core.BRepBndLib.brepbndlib.Add(shape, bnd_box, False)
+
+        # e.g. degenerated edges
+        if bnd_box.IsVoid():
+            return (numpy.nan,) * 6
+
+        return bnd_box.Get()
+
+    @staticmethod
+    def _xyz(pnt: OCC.Core.gp.gp_Pnt) -> T_XYZ:
+        return pnt.X(), pnt.Y(), pnt.Z()
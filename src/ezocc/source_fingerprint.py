@@ -0,0 +1,90 @@
+"""
+Short digests of class/function source code, for use in cache tokens. Including the source of a builder in its token
+means cached parts are regenerated when the builder changes.
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import linecache
+import os
+import threading
+import typing
+
+
+class _SourceFingerprintEntry:
+
+    def __init__(self, source_file: typing.Optional[str], mtime_ns: typing.Optional[int], digest: str):
+        self.source_file = source_file
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+
+
+class SourceFingerprints:
+    """
+    Process wide registry of source digests. Each class or callable has its source read and hashed once, the digest is
+    only recomputed if the modification time of its source file changes.
+    """
+
+    DIGEST_SIZE = 16
+
+    _entries: typing.Dict[typing.Any, _SourceFingerprintEntry] = dict()
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def of(obj: typing.Any) -> str:
+        """
+        @param obj: a class, function or method
+        @return: a hex digest of the source code of obj
+        """
+        key = SourceFingerprints._key(obj)
+
+        with SourceFingerprints._lock:
+            entry = SourceFingerprints._entries.get(key)
+
+        if entry is not None and entry.mtime_ns == SourceFingerprints._mtime_ns(entry.source_file):
+            return entry.digest
+
+        source_file = inspect.getsourcefile(obj)
+        mtime_ns = SourceFingerprints._mtime_ns(source_file)
+
+        if entry is not None and source_file is not None:
+            # inspect reads source via linecache, which does not notice the file changing on its own
+            linecache.checkcache(source_file)
+
+        digest = hashlib.blake2b(
+            inspect.getsource(obj).encode("utf-8"),
+            digest_size=SourceFingerprints.DIGEST_SIZE).hexdigest()
+
+        with SourceFingerprints._lock:
+            SourceFingerprints._entries[key] = _SourceFingerprintEntry(source_file, mtime_ns, digest)
+
+        return digest
+
+    @staticmethod
+    def clear():
+        with SourceFingerprints._lock:
+            SourceFingerprints._entries.clear()
+
+    @staticmethod
+    def _key(obj: typing.Any) -> typing.Any:
+        # bound methods are recreated on each access, and lambdas on each evaluation. Their code is stable, so is used
+        # as the key instead
+        if inspect.ismethod(obj):
+            obj = obj.__func__
+
+        if inspect.isfunction(obj):
+            return obj.__code__
+
+        return obj
+
+    @staticmethod
+    def _mtime_ns(source_file: typing.Optional[str]) -> typing.Optional[int]:
+        if source_file is None:
+            return None
+
+        try:
+            return os.stat(source_file).st_mtime_ns
+        except OSError:
+            return None
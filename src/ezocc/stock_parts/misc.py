@@ -1,4 +1,3 @@
-import inspect
 import logging
 import math
 import typing
@@ -14,6 +13,7 @@ import ezocc.occutils_python as op
 from ezocc.constants import Constants
 from ezocc.part_manager import Part, PartFactory, CacheToken, PartCache, NoOpCacheToken, PartDriver
 from ezocc.occutils_python import WireSketcher
+from ezocc.source_fingerprint import SourceFingerprints
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +35,7 @@ class StockParts:
 
     def pir_module(self):
         factory = self._factory
-        token = self._part_cache.create_token(inspect.getsource(StockParts), "pir_module")
+        token = self._part_cache.create_token(SourceFingerprints.of(StockParts), "pir_module")
 
         def _do():
             board = factory.box(32.5, 24, 1.5)
@@ -93,7 +93,7 @@ class StockParts:
 
     def aviation_connector(self):
 
-        token = self._part_cache.create_token(inspect.getsource(StockParts.aviation_connector))
+        token = self._part_cache.create_token(SourceFingerprints.of(StockParts.aviation_connector))
 
         def _do():
 
@@ -127,7 +127,7 @@ class StockParts:
         return self._part_cache.ensure_exists(token, _do)
 
     def led(self):
-        token = self._part_cache.create_token(inspect.getsource(StockParts), "led")
+        token = self._part_cache.create_token(SourceFingerprints.of(StockParts), "led")
 
         def _do():
             body = self._factory.cylinder(4.64 / 2, 6.2)
@@ -310,7 +310,7 @@ class StockParts:
         return usb_connector
 
     def esp32(self):
-        token = self._part_cache.create_token("stock_parts" "make_esp32", inspect.getsource(self.esp32))
+        token = self._part_cache.create_token("stock_parts" "make_esp32", SourceFingerprints.of(self.esp32))
 
         def _do():
             factory = PartFactory(self._part_cache)
@@ -1201,7 +1201,7 @@ class StockParts:
 
     def stepper_28byJ48(self) -> Part:
 
-        token = self._part_cache.create_token("stock_parts", inspect.getsource(StockParts.stepper_28byJ48))
+        token = self._part_cache.create_token("stock_parts", SourceFingerprints.of(StockParts.stepper_28byJ48))
 
         def _do():
             body = self._factory.cylinder(28 / 2, 19) #.do(lambda p: p.fillet.chamfer_faces(2, p.pick.from_dir(0, 0, -1).first_face()))
@@ -1241,7 +1241,7 @@ class StockParts:
         return self._part_cache.ensure_exists(token, _do)
 
     def nema_17_stepper(self) -> Part:
-        token = self._part_cache.create_token("stock_parts", "nema_17_stepper", inspect.getsource(StockParts))
+        token = self._part_cache.create_token("stock_parts", "nema_17_stepper", SourceFingerprints.of(StockParts))
 
         def _do():
             def make_chamfered_square(square_length: float,
@@ -1314,7 +1314,7 @@ class StockParts:
         return self._part_cache.ensure_exists(token, _do)
 
     def gear_motor(self) -> Part:
-        token = self._part_cache.create_token("stock_parts", "gear_motor", inspect.getsource(StockParts))
+        token = self._part_cache.create_token("stock_parts", "gear_motor", SourceFingerprints.of(StockParts))
 
         def _do():
             gearbox = self._factory.box(46.1, 23, 32) \
@@ -1,4 +1,3 @@
-import inspect
 import logging
 import math
 
@@ -9,6 +8,7 @@ from ezocc.alg.math import lerp
 from ezocc.alg.offset_face_with_holes import offset_face_with_holes
 from ezocc.constants import Constants
 from ezocc.occutils_python import WireSketcher, InterrogateUtils, MathUtils
+from ezocc.source_fingerprint import SourceFingerprints
 from ezocc.part_cache import FileBasedPartCache, InMemoryPartCache
 from ezocc.part_manager import PartCache, Part, PartFactory
 from ezocc.precision import Compare
@@ -36,7 +36,7 @@ class ModularEnclosureFactory:
             x_unit_length,
             y_unit_length,
             z_unit_length,
-            inspect.getsource(ModularEnclosureFactory))
+            SourceFingerprints.of(ModularEnclosureFactory))
 
         z_length = z_units * z_unit_length
 
@@ -144,7 +144,7 @@ class ModularEnclosureFactory:
                                         dovetail: Part):
 
         token = self._cache.create_token(
-            inspect.getsource(ModularEnclosureFactory._make_dovetail_clearance_cuts),
+            SourceFingerprints.of(ModularEnclosureFactory._make_dovetail_clearance_cuts),
             x_units,
             y_units,
             z_units,
@@ -181,7 +181,7 @@ class ModularEnclosureFactory:
         return self._cache.ensure_exists(token, _do)
 
     def _make_shadow_line(self, box: Part, clearance_cuts: Part) -> Part:
-        token = self._cache.create_token(inspect.getsource(ModularEnclosureFactory), box, clearance_cuts)
+        token = self._cache.create_token(SourceFingerprints.of(ModularEnclosureFactory), box, clearance_cuts)
 
         def _do():
             lid_profile = (box.explore.face.get_max(lambda f: f.xts.z_mid)
@@ -215,7 +215,7 @@ class ModularEnclosureFactory:
                    y_slot_unit_length: int) -> Part:
 
         token = self._cache.create_token(
-            inspect.getsource(ModularEnclosureFactory),
+            SourceFingerprints.of(ModularEnclosureFactory),
             result_top, result_bottom,
             dovetail_alignment_face,
             x_slot_unit_length,
@@ -244,7 +244,7 @@ class ModularEnclosureFactory:
     def _make_cap_bridge(self, clearance_cuts: Part, result_top: Part, result_bottom: Part, dovetail_alignment_face: Part):
         factory = PartFactory(self._cache)
 
-        token = self._cache.create_token(inspect.getsource(ModularEnclosureFactory._make_cap_bridge),
+        token = self._cache.create_token(SourceFingerprints.of(ModularEnclosureFactory._make_cap_bridge),
                                          clearance_cuts,
                                          result_top,
                                          result_bottom,
@@ -294,7 +294,7 @@ class ModularEnclosureFactory:
             z_unit_length,
             x_slot_unit_length,
             y_slot_unit_length,
-            inspect.getsource(ModularEnclosureFactory.make_unit))
+            SourceFingerprints.of(ModularEnclosureFactory.make_unit))
 
         def _do():
             factory = PartFactory(self._cache)
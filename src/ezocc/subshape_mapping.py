@@ -3,11 +3,14 @@ from __future__ import annotations
 import json
 import logging
 import traceback
+import types
 
+import OCC.Core.TopLoc
 import OCC.Core.TopoDS
 import typing
 
-from ezocc.occutils_python import SetPlaceableShape, InterrogateUtils, ListUtils
+from ezocc.occutils_python import SetPlaceableShape, InterrogateUtils, GeomUtils
+from util_wrapper_swig import UtilWrapper
 
 T_MKS = typing.Union[
                 OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeShape,
@@ -117,6 +120,20 @@ class SubshapeMap:
     """
     Note: subshape map is mutable. callers should create a copy before making modifications if they require
     immutability.
+
+    Copies are cheap: clone() shares the underlying name -> shape set storage with the source map, and the storage is
+    only copied (shallowly, and per name) when either map is first modified. AnnotatedShapes are treated as immutable,
+    so they are shared between copies rather than cloned.
+
+    Pruning is lazy: pruned() only marks the copy as requiring a prune, the traversal of the root shape is deferred
+    until the entries are first read. Maps that are already known to be pruned against their root shape are not
+    re-pruned.
+
+    Each labelled shape is indexed by its SetPlaceableShape, so membership tests, ambiguity checks and name lookups do
+    not scan the map.
+
+    Maps created with SubshapeMap.lazy only load their entries when they are first read, the root shape is available
+    immediately.
     """
 
     logger = logging.getLogger(__name__ + ".SubshapeMap")
@@ -126,15 +143,49 @@ class SubshapeMap:
                  map: typing.Dict[str, typing.Set[AnnotatedShape]] = None):
         self._root_shape = root_shape
 
+        self._map: typing.Dict[str, typing.Set[AnnotatedShape]] = dict()
+
+        # reverse lookup of every labelled shape, to the AnnotatedShape stored for it and the names it is placed under
+        # (in placement order). Maintained by every mutator.
+        self._index: typing.Dict[SetPlaceableShape, typing.Tuple[AnnotatedShape, typing.Tuple[str, ...]]] = dict()
+
         if map is not None:
-            self._map = SubshapeMap.copy_map(map)
-        else:
-            self._map: typing.Dict[str, typing.Set[AnnotatedShape]] = dict()
+            for name, shapes in map.items():
+                self._map[name] = set(shapes)
+
+                for shape in self._map[name]:
+                    if self._is_ambiguous(shape):
+                        raise ValueError("Shape set contains ambiguous annotated shapes")
 
-        set_placeable_shape_set = {ss.set_placeable_shape for s in self._map.values() for ss in s}
+                    self._index_add(name, shape)
 
-        if any(len(self.find_annotated_shapes(s)) != 1 for s in set_placeable_shape_set):
-            raise ValueError("Shape set contains ambiguous annotated shapes")
+        # copy-on-write state. _owns_map is False when the dict and index are shared with another SubshapeMap,
+        # _owned_names holds the names whose shape sets are private to this map
+        self._owns_map = True
+        self._owned_names: typing.Set[str] = set(self._map.keys())
+
+        # True when all entries are known to be subshapes of the root shape
+        self._is_pruned = len(self._map) == 0
+        self._prune_pending = False
+
+        # set when the entries have not been loaded yet, shared between copies of the map
+        self._lazy_entries: typing.Optional[_LazyEntries] = None
+
+    @staticmethod
+    def lazy(root_shape: AnnotatedShape,
+             loader: typing.Callable[[], typing.Dict[str, typing.Collection[AnnotatedShape]]],
+             is_pruned: bool = False) -> SubshapeMap:
+        """
+        @param root_shape: the root shape of the map
+        @param loader: invoked (at most once) when the entries of the map, or of any copy of it, are first read
+        @param is_pruned: True if the loaded entries are known to be subshapes of the root shape
+        """
+        result = SubshapeMap(root_shape)
+        result._owns_map = False
+        result._is_pruned = is_pruned
+        result._lazy_entries = _LazyEntries(root_shape, loader)
+
+        return result
 
     @staticmethod
     def from_single_shape(shape: OCC.Core.TopoDS.TopoDS_Shape):
@@ -156,15 +207,151 @@ class SubshapeMap:
         return self._root_shape
 
     @property
-    def map(self) -> typing.Dict[str, typing.Set[AnnotatedShape]]:
+    def map(self) -> typing.Mapping[str, typing.Set[AnnotatedShape]]:
+        """
+        @return: a read-only view of the name -> shape set mapping. The view is shared with other copies of this map,
+        the shape sets must not be modified. Use place/remove (on a clone() if the original must be kept) to modify the
+        map, so that the storage is copied as needed and the shape index kept up to date.
+        """
+        return types.MappingProxyType(self._entries())
+
+    def _entries(self) -> typing.Dict[str, typing.Set[AnnotatedShape]]:
+        """
+        @return: the underlying storage, with any pending load and prune applied. Must be treated as read-only.
+        """
+        if self._lazy_entries is not None:
+            loaded = self._lazy_entries.resolve()
+            self._lazy_entries = None
+            self._map = loaded._map
+            self._index = loaded._index
+            self._owns_map = False
+            self._owned_names = set()
+
+        if self._prune_pending:
+            self._apply_prune()
+
         return self._map
 
-    def with_updated_root_shape(self, new_shape: typing.Union[OCC.Core.TopoDS.TopoDS_Shape, AnnotatedShape]) -> SubshapeMap:
+    def _writable_entries(self) -> typing.Dict[str, typing.Set[AnnotatedShape]]:
+        """
+        @return: the underlying storage, copied if it is shared with another map. Shape sets are still shared, use
+        _writable_set before modifying one.
+        """
+        self._entries()
 
-        if logging.DEBUG >= SubshapeMap.logger.level:
-            msg = f"updating root shape to: {new_shape}"
-        else:
-            msg = None
+        if not self._owns_map:
+            self._map = dict(self._map)
+            self._index = dict(self._index)
+            self._owns_map = True
+            self._owned_names = set()
+
+        return self._map
+
+    def _writable_set(self, name: str) -> typing.Set[AnnotatedShape]:
+        entries = self._writable_entries()
+
+        if name not in entries:
+            entries[name] = set()
+            self._owned_names.add(name)
+        elif name not in self._owned_names:
+            entries[name] = set(entries[name])
+            self._owned_names.add(name)
+
+        return entries[name]
+
+    def _is_ambiguous(self, shape: AnnotatedShape) -> bool:
+        """
+        @return: True if a different AnnotatedShape is already stored for the same shape
+        """
+        if shape.set_placeable_shape == self._root_shape.set_placeable_shape and shape != self._root_shape:
+            return True
+
+        indexed = self._index.get(shape.set_placeable_shape)
+
+        return indexed is not None and indexed[0] != shape
+
+    def _index_add(self, name: str, shape: AnnotatedShape):
+        indexed = self._index.get(shape.set_placeable_shape)
+
+        if indexed is None:
+            self._index[shape.set_placeable_shape] = (shape, (name,))
+        elif name not in indexed[1]:
+            self._index[shape.set_placeable_shape] = (shape, indexed[1] + (name,))
+
+    def _replace_shape(self, old_shape: AnnotatedShape, new_shape: AnnotatedShape):
+        """
+        Replaces old_shape with new_shape under every name it is placed under. Both must have the same
+        SetPlaceableShape.
+        """
+        self._writable_entries()
+
+        names = self._index[old_shape.set_placeable_shape][1]
+
+        for name in names:
+            shapes = self._writable_set(name)
+            shapes.remove(old_shape)
+            shapes.add(new_shape)
+
+        self._index[new_shape.set_placeable_shape] = (new_shape, names)
+
+    def _apply_prune(self):
+        self._prune_pending = False
+
+        self._retain_subshapes_of(InterrogateUtils.all_subshapes_set(self._root_shape.set_placeable_shape.shape))
+
+    def _retain_subshapes_of(self, all_subshapes: typing.Set[SetPlaceableShape]):
+        """
+        Removes any entries not present in all_subshapes. Shape sets that are unaffected remain shared.
+        """
+        pruned_map = dict()
+        for name, shapes in self._map.items():
+            retained = {s for s in shapes if s.set_placeable_shape in all_subshapes}
+
+            if len(retained) == 0:
+                continue
+            elif len(retained) == len(shapes):
+                pruned_map[name] = shapes
+            else:
+                pruned_map[name] = retained
+
+        self._map = pruned_map
+        self._index = {k: v for k, v in self._index.items() if k in all_subshapes}
+        self._owns_map = True
+        self._owned_names = set()
+        self._is_pruned = True
+
+    def _copy(self) -> SubshapeMap:
+        """
+        @return: a copy of this map sharing the underlying storage. Neither map may modify the storage in place after
+        this call.
+        """
+        result = SubshapeMap.__new__(SubshapeMap)
+        result._root_shape = self._root_shape
+        result._owns_map = False
+        result._owned_names = set()
+        result._is_pruned = self._is_pruned
+
+        if self._lazy_entries is not None:
+            # the copy shares the loader rather than forcing the load
+            result._map = self._map
+            result._index = self._index
+            result._prune_pending = self._prune_pending
+            result._lazy_entries = self._lazy_entries
+            return result
+
+        self._entries()
+
+        result._map = self._map
+        result._index = self._index
+        result._prune_pending = False
+        result._lazy_entries = None
+
+        self._owns_map = False
+        self._owned_names = set()
+
+        return result
+
+    def with_updated_root_shape(self, new_shape: typing.Union[OCC.Core.TopoDS.TopoDS_Shape, AnnotatedShape]) -> SubshapeMap:
 
         if isinstance(new_shape, OCC.Core.TopoDS.TopoDS_Shape):
             new_shape = self._root_shape.with_updated_shape(new_shape)
@@ -172,46 +359,49 @@ class SubshapeMap:
         if not isinstance(new_shape, AnnotatedShape):
             raise ValueError("Expected AnnotatedShape")
 
-        if logging.DEBUG >= SubshapeMap.logger.level:
-            msg += f"\nsubshape map root shape updated\n      {self.root_shape}>{self._map}\n"
+        self._entries()
+
+        result = self._copy()
+        result._root_shape = new_shape
 
-        new_map = SubshapeMap.copy_map(self._map)
+        if new_shape.set_placeable_shape != self._root_shape.set_placeable_shape:
+            result._is_pruned = False
 
         # the root shape refers to itself, this should be updated in the new map
         changes = []
-        for name in new_map.keys():
-            existing_shape = [s for s in new_map[name] if s.set_placeable_shape == new_shape.set_placeable_shape]
-            if len(existing_shape) != 0:
-                changes.append(f"{existing_shape[0]} -> {new_shape}")
-                new_map[name].remove(existing_shape[0])
-                new_map[name].add(new_shape)
+        existing_shape = self._index.get(new_shape.set_placeable_shape)
+        if existing_shape is not None and existing_shape[0] != new_shape:
+            changes.append(f"{existing_shape[0]} -> {new_shape}")
+            result._replace_shape(existing_shape[0], new_shape)
 
-        if logging.DEBUG >= SubshapeMap.logger.level:
-            msg += f"    ----->{new_shape} {new_map}\n{','.join(changes)}\n"
+        if SubshapeMap.logger.isEnabledFor(logging.DEBUG):
+            SubshapeMap.logger.debug(f"updating root shape to: {new_shape}"
+                                     f"\nsubshape map root shape updated\n      {self.root_shape}>{self._map}\n"
+                                     f"    ----->{new_shape} {result._map}\n{','.join(changes)}\n")
 
-            SubshapeMap.logger.debug(msg)
-
-        return SubshapeMap(new_shape, new_map)
+        return result
 
     def place(self, name: str, shape: AnnotatedShape):
         if not isinstance(shape, AnnotatedShape):
             raise ValueError("Expected annotated shape")
 
-        if logging.DEBUG >= SubshapeMap.logger.level:
+        if SubshapeMap.logger.isEnabledFor(logging.DEBUG):
             SubshapeMap.logger.debug(f"Placing annotated shape in subshape map {name}, {shape} -----> {self._map}")
 
-        for s in self._map.values():
-            for ss in s:
-                if ss.set_placeable_shape == shape.set_placeable_shape and ss != shape:
-                    raise ValueError("Inconsistent AnnotatedShape: an AnnotatedShape already exists for this shape")
+        self._entries()
 
-        if name not in self._map:
-            self._map[name] = set()
+        indexed = self._index.get(shape.set_placeable_shape)
+        if indexed is not None and indexed[0] != shape:
+            raise ValueError("Inconsistent AnnotatedShape: an AnnotatedShape already exists for this shape")
 
-        self._map[name].add(shape)
+        self._writable_set(name).add(shape)
+        self._index_add(name, shape)
+
+        if shape.set_placeable_shape != self._root_shape.set_placeable_shape:
+            self._is_pruned = False
 
     def merge(self, subshape_map: SubshapeMap):
-        for name, shapes in subshape_map._map.items():
+        for name, shapes in subshape_map._entries().items():
             for shape in shapes:
                 self.place(name, shape)
 
@@ -236,33 +426,33 @@ class SubshapeMap:
         return next(s for s in result)
 
     def _assert_has(self, name: str):
-        if name not in self._map:
+        if name not in self._entries():
             raise ValueError(f"Subshape name \"{name}\" not present: available names are: {self._map.keys()}")
 
     def keys(self):
-        return self._map.keys()
+        return self._entries().keys()
 
     def values(self) -> typing.Set[typing.Set[AnnotatedShape]]:
-        return {v.copy() for v in self._map.values()}
+        return {v.copy() for v in self._entries().values()}
 
     def name_for_shape(self, shape: AnnotatedShape) -> str:
         if not isinstance(shape, AnnotatedShape):
             raise ValueError("Annotated shape expected")
 
-        for name, s in self._map.items():
-            if shape in s:
-                return name
+        self._entries()
+
+        indexed = self._index.get(shape.set_placeable_shape)
+        if indexed is None or indexed[0] != shape:
+            raise ValueError(f"Unable to determine name for shape")
 
-        raise ValueError(f"Unable to determine name for shape")
+        return indexed[1][0]
 
     def contains_shape(self, shape: typing.Union[AnnotatedShape, SetPlaceableShape]) -> bool:
         set_pl = shape if isinstance(shape, SetPlaceableShape) else shape.set_placeable_shape
 
-        for s in self._map.values():
-            if any(ss.set_placeable_shape == set_pl for ss in s):
-                return True
+        self._entries()
 
-        return False
+        return set_pl in self._index
 
     def find_annotated_shapes(self, shape: SetPlaceableShape) -> typing.Set[AnnotatedShape]:
         """
@@ -273,34 +463,53 @@ class SubshapeMap:
         if self._root_shape.set_placeable_shape == shape:
             result.add(self._root_shape)
 
-        for s in self.map.values():
-            for ss in s:
-                if ss.set_placeable_shape == shape:
-                    result.add(ss)
+        self._entries()
+
+        indexed = self._index.get(shape)
+        if indexed is not None:
+            result.add(indexed[0])
 
         return result
 
     def items(self) -> typing.Generator[typing.Tuple[str, typing.Set[AnnotatedShape]], None, None]:
-        for k, v in self._map.items():
+        for k, v in self._entries().items():
             yield k, v.copy()
 
     def remove(self, shape: AnnotatedShape):
-        for n, s in self._map.items():
-            if shape in s:
-                s.remove(shape)
+        self._entries()
+
+        indexed = self._index.get(shape.set_placeable_shape)
+        if indexed is None or indexed[0] != shape:
+            return
+
+        for n in indexed[1]:
+            self._writable_set(n).remove(shape)
+
+        del self._index[shape.set_placeable_shape]
 
     def rename(self, old_name: str, new_name: str):
-        if old_name not in self._map:
+        if old_name not in self._entries():
             raise ValueError(f"Old subshape set name {old_name} not present in subshape map")
 
         if new_name in self._map:
             raise ValueError(f"New name {new_name} already has a subshape set associated with it")
 
-        self._map[new_name] = self._map[old_name]
-        del self._map[old_name]
+        entries = self._writable_entries()
+        entries[new_name] = entries[old_name]
+        del entries[old_name]
+
+        for shape in entries[new_name]:
+            indexed = self._index[shape.set_placeable_shape]
+            self._index[shape.set_placeable_shape] = (
+                indexed[0],
+                tuple(new_name if n == old_name else n for n in indexed[1]))
+
+        if old_name in self._owned_names:
+            self._owned_names.remove(old_name)
+            self._owned_names.add(new_name)
 
     def annotate_subshape(self, name: str, key: str, value: str):
-        if name not in self._map:
+        if name not in self._entries():
             raise ValueError(f"No label with name: {name}")
 
         annotated_shapes = self._map[name]
@@ -308,15 +517,16 @@ class SubshapeMap:
         if len(annotated_shapes) != 1:
             raise ValueError("Can only annotate based on label when exactly one shape is labelled")
 
-        self._map[name] = { next(s for s in annotated_shapes).with_updated_attribute(key, value)}
+        # the shape is re-annotated under every name it is placed under, so that the map stays unambiguous
+        annotated_shape = next(s for s in annotated_shapes)
+        self._replace_shape(annotated_shape, annotated_shape.with_updated_attribute(key, value))
 
     def annotate_subshapes(self, name: str, key: str, value: str):
-        if name not in self._map:
+        if name not in self._entries():
             raise ValueError(f"No label with name: {name}")
 
-        annotated_shapes = self._map[name]
-
-        self._map[name] = {s.with_updated_attribute(key, value) for s in annotated_shapes}
+        for s in list(self._map[name]):
+            self._replace_shape(s, s.with_updated_attribute(key, value))
 
     def map_subshape_changes(
             self,
@@ -324,61 +534,114 @@ class SubshapeMap:
             mks: T_MKS,
             map_is_partner: bool = False,
             map_is_same: bool = False) -> SubshapeMap:
+        """
+        Tries to track the history of the subshape map according to the changes applied by mks.
+        """
+        return SubshapeMap.map_subshape_changes_many([self], new_shape, mks, map_is_partner, map_is_same)
 
+    @staticmethod
+    def map_subshape_changes_many(
+            subshape_maps: typing.List[SubshapeMap],
+            new_shape: AnnotatedShape,
+            mks: T_MKS,
+            map_is_partner: bool = False,
+            map_is_same: bool = False) -> SubshapeMap:
+        """
+        Tracks the history of several subshape maps (e.g. of every argument and tool of a boolean operation) through
+        mks, merging the results into one map. The history of all the maps is resolved in a single pass, rather than
+        once per map.
+        """
         if not isinstance(new_shape, AnnotatedShape):
             raise ValueError("Expected annotated shape")
 
-        """
-        Tries to track the history of the subshape map according to the changes applied by mks.
-        """
-        get_is_deleted = SubshapeMap._get_is_deleted_method(mks)
+        SubshapeMap._assert_supported_mks(mks)
+
+        sources: typing.Dict[AnnotatedShape, None] = dict()
+        for m in subshape_maps:
+            m._entries()
+            for annotated_shape, _ in m._index.values():
+                sources[annotated_shape] = None
+
+        if len(subshape_maps) == 1:
+            old_root = subshape_maps[0]._root_shape.set_placeable_shape.shape
+        else:
+            old_root = GeomUtils.make_compound(*[m._root_shape.set_placeable_shape.shape for m in subshape_maps])
+
+        # the history of every labelled shape is resolved in a single native call
+        mapped_shapes = UtilWrapper.map_shape_history(
+            mks,
+            [s.set_placeable_shape.shape for s in sources.keys()],
+            old_root,
+            new_shape.set_placeable_shape.shape,
+            map_is_same,
+            map_is_partner)
 
-        all_old_shapes: typing.Set[SetPlaceableShape] = {
-            SetPlaceableShape(s) for s in InterrogateUtils.traverse_all_subshapes(self._root_shape.set_placeable_shape.shape)}\
-            .union({self._root_shape.set_placeable_shape})
-        all_new_shapes: typing.Set[SetPlaceableShape] = {SetPlaceableShape(s) for s in
-                          InterrogateUtils.traverse_all_subshapes(new_shape.set_placeable_shape.shape)}\
-            .union({new_shape.set_placeable_shape})
+        root_shapes = {m._root_shape for m in subshape_maps}
 
         shape_conversions: typing.Dict[AnnotatedShape, typing.Set[AnnotatedShape]] = dict()
+        for source, mapped in zip(sources.keys(), mapped_shapes):
+            converted = {source.with_updated_shape(s) for s in mapped}
 
-        for name, shapes in self._map.items():
+            # the top level source and new shapes are always linked
+            if source in root_shapes:
+                converted.add(new_shape)
 
-            for shape in shapes:
-                shape_conversions[shape] = SubshapeMap._get_single_shape_mapping(
-                    self._root_shape,
-                    new_shape,
-                    shape,
-                    mks,
-                    all_old_shapes,
-                    all_new_shapes,
-                    get_is_deleted,
-                    map_is_same,
-                    map_is_partner)
+            shape_conversions[source] = converted
+
+        all_new_shapes: typing.Set[SetPlaceableShape] = \
+            InterrogateUtils.all_subshapes_set(new_shape.set_placeable_shape.shape)
 
         # now build the new subshape map:
         result = SubshapeMap(new_shape)
-        for name, shapes in self._map.items():
-            for shape in shapes:
-                for mapped_shape in shape_conversions[shape]:
-                    result.place(name, mapped_shape)
+        for m in subshape_maps:
+            for name, shapes in m._map.items():
+                for shape in shapes:
+                    for mapped_shape in shape_conversions[shape]:
+                        result.place(name, mapped_shape)
+
+        # all subshapes of the new shape are already known, so the result can be pruned without another traversal
+        result._retain_subshapes_of(all_new_shapes)
 
         return result
 
+    def moved(self, location: OCC.Core.TopLoc.TopLoc_Location) -> SubshapeMap:
+        """
+        @return: a copy of this map with the root shape and every labelled shape moved by the location. No shape
+        history is needed: the subshapes of the moved root shape are exactly the moved subshapes. The labelled shapes
+        are moved when the entries of the copy are first read.
+        """
+        root_shape = self._root_shape.with_updated_shape(self._root_shape.shape.Moved(location))
+        source = self._copy()
+
+        def _load() -> typing.Dict[str, typing.Set[AnnotatedShape]]:
+            source._entries()
+
+            indexed = list(source._index.values())
+            moved_shapes = SetPlaceableShape.of_many(a.shape.Moved(location) for a, _ in indexed)
+
+            result: typing.Dict[str, typing.Set[AnnotatedShape]] = dict()
+            for (annotated_shape, names), moved_shape in zip(indexed, moved_shapes):
+                moved_annotated_shape = AnnotatedShape(moved_shape, annotated_shape.attributes)
+
+                for name in names:
+                    result.setdefault(name, set()).add(moved_annotated_shape)
+
+            return result
+
+        return SubshapeMap.lazy(root_shape, _load, is_pruned=self._is_pruned)
+
     def clone(self):
-        return SubshapeMap(self._root_shape, self._map)
+        return self._copy()
 
     def pruned(self) -> SubshapeMap:
-        result = SubshapeMap(self._root_shape)
-
-        all_subshapes = {SetPlaceableShape(s) for s in
-                         InterrogateUtils.traverse_all_subshapes(self.root_shape.set_placeable_shape.shape)}
-        all_subshapes.add(self._root_shape.set_placeable_shape)
+        """
+        @return: a copy of this map with any entries that are not subshapes of the root shape removed. The removal is
+        deferred until the entries of the copy are first accessed.
+        """
+        result = self._copy()
 
-        for name, shapes in self._map.items():
-            for s in shapes:
-                if s.set_placeable_shape in all_subshapes:
-                    result.place(name, s)
+        if not result._is_pruned:
+            result._prune_pending = True
 
         return result
 
@@ -386,70 +649,32 @@ class SubshapeMap:
         if not isinstance(item, str):
             raise ValueError(f"Index must be a string. Was instead: {type(item)}")
 
-        return self._map[item].copy()
+        return self._entries()[item].copy()
 
     @staticmethod
-    def _get_is_deleted_method(mks: T_MKS) -> typing.Callable[[AnnotatedShape], bool]:
-        if isinstance(mks, OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeShape):
-            return lambda s: mks.IsDeleted(s.set_placeable_shape.shape)
-        elif isinstance(mks, OCC.Core.BRepOffset.BRepOffset_MakeOffset):
-            return lambda s: mks.IsDeleted(s.set_placeable_shape.shape)
-        elif isinstance(mks, OCC.Core.BRepTools.BRepTools_History):
-            return lambda s: mks.IsRemoved(s.set_placeable_shape.shape)
-        else:
+    def _assert_supported_mks(mks: T_MKS):
+        if not isinstance(mks, (
+                OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeShape,
+                OCC.Core.BRepOffset.BRepOffset_MakeOffset,
+                OCC.Core.BRepTools.BRepTools_History)):
             raise ValueError("Unsupported MakeShape type")
 
-    @staticmethod
-    def _get_single_shape_mapping(
-            top_level_source_shape: AnnotatedShape,
-            top_level_new_shape: AnnotatedShape,
-            source_shape: AnnotatedShape,
-            mks: T_MKS,
-            all_old_subshapes: typing.Set[SetPlaceableShape],
-            all_new_subshapes: typing.Set[SetPlaceableShape],
-            get_is_deleted: typing.Callable[[AnnotatedShape], bool],
-            map_is_same: bool,
-            map_is_partner: bool) -> typing.Set[AnnotatedShape]:
-
-        if get_is_deleted(source_shape):
-            return set()
 
-        if source_shape.set_placeable_shape not in all_old_subshapes:
-            # the source shape cannot be mapped because the operation is only performed on the top level source shape,
-            # orphan shapes are dropped
-            return set()
-
-        result: typing.Set[AnnotatedShape] = set()
-
-        if map_is_same or map_is_partner:
-            for s in all_new_subshapes:
-                if map_is_same and s.shape.IsSame(source_shape.set_placeable_shape.shape):
-                    result.add(source_shape.with_updated_shape(s.shape))
-
-                if map_is_partner and s.shape.IsPartner(source_shape.set_placeable_shape.shape):
-                    result.add(source_shape.with_updated_shape(s.shape))
-
-        for s in ListUtils.iterate_list(mks.Modified(source_shape.set_placeable_shape.shape)):
-            result.add(source_shape.with_updated_shape(s))
-
-        for s in ListUtils.iterate_list(mks.Generated(source_shape.set_placeable_shape.shape)):
-            result.add(source_shape.with_updated_shape(s))
-
-        # the top level source and new shapes are always linked
-        if source_shape == top_level_source_shape:
-            result.add(top_level_new_shape)
-
-        if source_shape.set_placeable_shape in all_new_subshapes:
-            result.add(source_shape)
+class _LazyEntries:
+    """
+    Loads the entries for SubshapeMap.lazy. The loaded storage is shared by every copy of the lazy map.
+    """
 
-        return result
+    def __init__(self,
+                 root_shape: AnnotatedShape,
+                 loader: typing.Callable[[], typing.Dict[str, typing.Collection[AnnotatedShape]]]):
+        self._root_shape = root_shape
+        self._loader = loader
+        self._loaded: typing.Optional[SubshapeMap] = None
 
-    @staticmethod
-    def copy_map(map: typing.Dict[str, typing.Set[AnnotatedShape]]) -> typing.Dict[str, typing.Set[AnnotatedShape]]:
-        result = dict()
-        for k, v in map.items():
-            result[k] = set()
-            for vv in v:
-                result[k].add(vv.clone())
+    def resolve(self) -> SubshapeMap:
+        if self._loaded is None:
+            self._loaded = SubshapeMap(self._root_shape, self._loader())
+            self._loader = None
 
-        return result
+        return self._loaded
@@ -2,16 +2,19 @@ import pdb
 import tempfile
 import unittest
 import uuid
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import OCC.Core.TopoDS
 from OCC.Core import gp
 
 from ezocc.gears.gear_generator import GearSpec, GearPairSpec
 from ezocc.part_cache import DefaultCacheToken, InMemoryPartCache, FileBasedPartCache
-from ezocc.part_manager import Part, LazyLoadedPart, NoOpPartCache
+from ezocc.part_manager import Part, LazyLoadedPart, NoOpPartCache, NoOpCacheToken, PartFactory
 
 import OCC.Core.BRepBuilderAPI
+import OCC.Core.BRepMesh
+import OCC.Core.BRepPrimAPI
+import OCC.Core.ShapeFix
 
 import OCC.Core.gp
 
@@ -90,3 +93,106 @@ class TestCacheToken(unittest.TestCase):
             self.assertEqual(
                 DefaultCacheToken(self._cache, *a).compute_uuid(),
                 DefaultCacheToken(self._cache, *a).compute_uuid())
+
+    def test_shape_args_are_hashed_exactly(self):
+        box_a = OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(1, 1, 1).Shape()
+        box_b = OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(1, 1, 1).Shape()
+        box_c = OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(1, 2, 1).Shape()
+
+        self.assertEqual(
+            DefaultCacheToken(self._cache, box_a).compute_uuid(),
+            DefaultCacheToken(self._cache, box_b).compute_uuid())
+
+        self.assertNotEqual(
+            DefaultCacheToken(self._cache, box_a).compute_uuid(),
+            DefaultCacheToken(self._cache, box_c).compute_uuid())
+
+        # identical geometry, so would agree at any sample points, but different tolerances
+        box_d = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_Copy(box_a).Shape()
+        OCC.Core.ShapeFix.ShapeFix_ShapeTolerance().SetTolerance(box_d, 0.1)
+
+        self.assertNotEqual(
+            DefaultCacheToken(self._cache, box_a).compute_uuid(),
+            DefaultCacheToken(self._cache, box_d).compute_uuid())
+
+        # meshing a shape (e.g. to display it) does not change its uuid
+        box_a_uuid = DefaultCacheToken(self._cache, box_a).compute_uuid()
+        OCC.Core.BRepMesh.BRepMesh_IncrementalMesh(box_a, 0.1)
+        self.assertEqual(DefaultCacheToken(self._cache, box_a).compute_uuid(), box_a_uuid)
+
+    def test_argument_structure_affects_uuid(self):
+        root_token = DefaultCacheToken(self._cache)
+
+        self.assertNotEqual(root_token.mutated("1").compute_uuid(), root_token.mutated(1).compute_uuid())
+        self.assertNotEqual(root_token.mutated([1, 2]).compute_uuid(), root_token.mutated(1, 2).compute_uuid())
+        self.assertNotEqual(root_token.mutated(1).compute_uuid(), root_token.mutated(1).mutated(1).compute_uuid())
+
+        self.assertEqual(
+            root_token.mutated(a=1, b=2).compute_uuid(),
+            root_token.mutated(b=2, a=1).compute_uuid())
+
+        self.assertEqual(
+            root_token.mutated({"x", "y", "z"}).compute_uuid(),
+            root_token.mutated({"z", "y", "x"}).compute_uuid())
+
+    def test_with_uuid_round_trips(self):
+        token_uuid = DefaultCacheToken(self._cache, "foo").compute_uuid()
+
+        self.assertEqual(DefaultCacheToken.with_uuid(token_uuid, self._cache).compute_uuid(), token_uuid)
+
+    def test_lazy_mutation(self):
+        root_token = DefaultCacheToken(self._cache, "foo")
+
+        self.assertEqual(root_token.mutated_lazy(lambda: ("trsf", 1.0, 2.0)).compute_uuid(),
+                         root_token.mutated("trsf", 1.0, 2.0).compute_uuid())
+
+    def test_noop_token_skips_lazy_args(self):
+        token = NoOpPartCache.instance().create_token("foo")
+        args_supplier = MagicMock()
+
+        self.assertTrue(token.is_noop)
+        self.assertIs(token.mutated_lazy(args_supplier), token)
+        args_supplier.assert_not_called()
+
+        part = Part(token, SubshapeMap.from_single_shape(
+            OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(1, 1, 1).Shape()))
+        self.assertTrue(part.tr.mv(dx=1).cache_token.is_noop)
+
+    def test_noop_token_never_evaluates_args(self):
+        class Unevaluable:
+            def __hash__(self):
+                raise AssertionError("argument evaluated")
+
+            def __repr__(self):
+                raise AssertionError("argument evaluated")
+
+            def __reduce__(self):
+                raise AssertionError("argument evaluated")
+
+        token = NoOpPartCache.instance().create_token(Unevaluable())
+        self.assertIs(token.mutated(Unevaluable(), key=Unevaluable()), token)
+
+        def _fail():
+            raise AssertionError("lazy arguments evaluated")
+
+        self.assertIs(token.mutated_lazy(_fail), token)
+
+        # the arguments suppliers passed by part operations are never called either
+        supplier_calls = []
+        suppliers = []
+        mutated_lazy = NoOpCacheToken.mutated_lazy
+
+        def _counting_mutated_lazy(self, args_supplier):
+            def _counting_supplier():
+                supplier_calls.append(args_supplier)
+                return args_supplier()
+
+            suppliers.append(_counting_supplier)
+            return mutated_lazy(self, _counting_supplier)
+
+        with patch.object(NoOpCacheToken, "mutated_lazy", _counting_mutated_lazy):
+            part = PartFactory(NoOpPartCache.instance()).box(1, 1, 1).tr.mv(dx=1).tr.rz(1)
+            self.assertFalse(part.shape.IsNull())
+
+        self.assertGreater(len(suppliers), 0)
+        self.assertEqual(supplier_calls, [])
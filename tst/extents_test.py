@@ -1,3 +1,4 @@
+import math
 import unittest
 
 import OCC
@@ -45,3 +46,33 @@ class TestExtents(unittest.TestCase):
         self.assertEqual(extents.yx_max, [extents.y_max, extents.x_max])
         self.assertEqual(extents.xx_max, [extents.x_max, extents.x_max])
         self.assertEqual(extents.xyz_max, [extents.x_max, extents.y_max, extents.z_max])
+
+    def test_transformed(self):
+        box = OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(gp.gp_Pnt(0, 1, 2), gp.gp_Pnt(10, 5, 19)).Shape()
+        extents = op.Extents(box)
+
+        translation = gp.gp_Trsf()
+        translation.SetTranslation(gp.gp_Vec(1, 2, 3))
+        translated = extents.transformed(translation)
+        self.assertEqual(translated.xyz_min, [1, 3, 5])
+        self.assertEqual(translated.xyz_max, [11, 7, 22])
+
+        rotation = gp.gp_Trsf()
+        rotation.SetRotation(gp.gp.OZ(), math.radians(45))
+        rotated = extents.transformed(rotation)
+        exact = op.Extents(OCC.Core.BRepBuilderAPI.BRepBuilderAPI_Transform(box, rotation, True).Shape())
+
+        for bound, actual in zip(rotated.xyz_min, exact.xyz_min):
+            self.assertLessEqual(bound, actual + 1e-9)
+
+        for bound, actual in zip(rotated.xyz_max, exact.xyz_max):
+            self.assertGreaterEqual(bound, actual - 1e-9)
+
+    def test_union(self):
+        a = op.Extents(OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(gp.gp_Pnt(0, 0, 0), gp.gp_Pnt(1, 1, 1)).Shape())
+        b = op.Extents(OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(gp.gp_Pnt(5, -1, 0), gp.gp_Pnt(6, 0, 2)).Shape())
+
+        union = op.Extents.union(a, b)
+        self.assertEqual(union.xyz_min, [0, -1, 0])
+        self.assertEqual(union.xyz_max, [6, 1, 2])
+
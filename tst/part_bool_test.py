@@ -1,6 +1,7 @@
 import math
 import pdb
 import unittest
+import unittest.mock
 
 import OCC
 import OCC.Core.BOPAlgo
@@ -22,7 +23,8 @@ from OCC.Core.gp import gp_Vec
 
 import ezocc.occutils_python as op
 from ezocc.part_cache import InMemoryPartCache
-from ezocc.part_manager import Part, PartFactory, NoOpPartCache, CacheToken, NoOpCacheToken
+from ezocc.part_cache_instrumentation import PartCacheEventRecorder
+from ezocc.part_manager import Part, PartFactory, NoOpPartCache, CacheToken, NoOpCacheToken, BooleanStrategy
 
 from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_EDGE
 
@@ -40,3 +42,92 @@ class TestPartBool(unittest.TestCase):
 
         self.assertTrue(part_a.bool.intersects(part_a.tr.mv(5, 5, 5)))
         self.assertFalse(part_a.bool.intersects(part_a.tr.mv(25, 25, 25)))
+
+    def test_intersects_overlapping_without_boolean(self):
+        part_a = self._factory.box(10, 10, 10)
+
+        overlapping = [
+            part_a.tr.mv(5, 5, 5),
+            # only the midpoint of the line is inside the box
+            self._factory.x_line(30).tr.mv(-12, 5, 5)
+        ]
+
+        touching = part_a.tr.mv(10)
+
+        with unittest.mock.patch("OCC.Core.BRepAlgoAPI.BRepAlgoAPI_Common",
+                                 side_effect=AssertionError("common should not be computed")):
+            for o in overlapping:
+                self.assertTrue(part_a.bool.intersects(o))
+                self.assertTrue(o.bool.intersects(part_a))
+
+        # touching shapes have no point strictly inside each other, so the boolean decides
+        self.assertEqual(part_a.bool.intersects(touching),
+                         not op.InterrogateUtils.is_empty_compound(part_a.bool.common(touching).shape))
+
+    def test_intersects_many(self):
+        part_a = self._factory.box(10, 10, 10)
+
+        others = [
+            part_a.tr.mv(5, 5, 5),
+            part_a.tr.mv(10),
+            part_a.tr.mv(25, 25, 25),
+            self._factory.vertex(5, 5, 10),
+            self._factory.vertex(5, 5, 10.5)
+        ]
+
+        expected = [not op.InterrogateUtils.is_empty_compound(part_a.bool.common(o).shape) for o in others]
+
+        self.assertEqual(part_a.bool.intersects_many(others), expected)
+        self.assertEqual([part_a.bool.intersects(o) for o in others], expected)
+        self.assertEqual(expected[2:], [False, True, False])
+
+    def test_cut_many(self):
+        plate = self._factory.box(100, 10, 5)
+        holes = [self._factory.cylinder(1, 5).tr.mv(5 + 10 * i, 5) for i in range(0, 10)]
+
+        # the last tool cannot intersect the plate, and is skipped by the grouped strategy
+        holes.append(self._factory.cylinder(1, 5).tr.mv(500, 500))
+
+        expected_volume = 100 * 10 * 5 - 10 * math.pi * 5
+
+        for strategy in BooleanStrategy:
+            result = plate.bool.cut_many(holes, strategy=strategy)
+            self.assertAlmostEqual(
+                op.InterrogateUtils.volume_properties(result.shape).Mass(), expected_volume, places=3)
+
+    def test_fuse_many_groups_disjoint_parts(self):
+        recorder = PartCacheEventRecorder()
+        self._part_cache.set_instrumentation(recorder)
+
+        box = self._factory.box(10, 10, 10, x_max_face_name="box_xmax").name("box")
+        tools = [box.tr.mv(5).name("a"), box.tr.mv(100).name("b"), box.tr.mv(105).name("c")]
+
+        single = box.bool.fuse_many(tools, strategy=BooleanStrategy.SINGLE_PASS)
+        grouped = box.bool.fuse_many(tools, strategy=BooleanStrategy.GROUPED)
+
+        for result in [single, grouped]:
+            self.assertAlmostEqual(
+                op.InterrogateUtils.volume_properties(result.shape).Mass(), 2 * 15 * 10 * 10, places=3)
+
+        # every name maps into the grouped result as it does into the single pass result
+        for name in ["box", "a", "b", "c", "box_xmax"]:
+            expected = [s.shape for s in single.subshapes.get(name)]
+            actual = [s.shape for s in grouped.subshapes.get(name)]
+
+            self.assertGreater(len(expected), 0, name)
+            self.assertEqual(len(actual), len(expected), name)
+            self.assertEqual(sorted(s.ShapeType() for s in actual), sorted(s.ShapeType() for s in expected), name)
+
+            expected_extents = op.Extents(op.GeomUtils.make_compound(*expected))
+            actual_extents = op.Extents(op.GeomUtils.make_compound(*actual))
+            for a, e in zip(actual_extents.xyz_min + actual_extents.xyz_max,
+                            expected_extents.xyz_min + expected_extents.xyz_max):
+                self.assertAlmostEqual(a, e, places=5, msg=name)
+
+        # the x max faces of the box and b are inside the fused solids
+        self.assertEqual(len(grouped.subshapes.get("box_xmax")), 2)
+
+        events = [e for e in recorder.events if e.kind == "boolean"]
+        self.assertEqual([e.details["strategy"] for e in events], ["single_pass", "grouped"])
+        self.assertEqual(events[1].details["groups"], 2)
+
@@ -0,0 +1,71 @@
+import http.server
+import tempfile
+import threading
+import typing
+import unittest
+
+from ezocc.part_cache_blob_store import BlobStore, LocalDirectoryBlobStore, HttpBlobStore
+
+
+class _StubBlobHandler(http.server.BaseHTTPRequestHandler):
+
+    blobs: typing.Dict[str, bytes] = dict()
+
+    def do_GET(self):
+        if self.path not in self.blobs:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.blobs[self.path])))
+        self.end_headers()
+        self.wfile.write(self.blobs[self.path])
+
+    def do_HEAD(self):
+        self.send_response(200 if self.path in self.blobs else 404)
+        self.end_headers()
+
+    def do_PUT(self):
+        self.blobs[self.path] = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def _test_blob_store(self, store: BlobStore):
+        self.assertIsNone(store.get("a.part.bin"))
+        self.assertFalse(store.has("a.part.bin"))
+
+        store.put("a.part.bin", b"part data")
+
+        self.assertEqual(store.get("a.part.bin"), b"part data")
+        self.assertTrue(store.has("a.part.bin"))
+
+        store.put("a.part.bin", b"replaced")
+        self.assertEqual(store.get("a.part.bin"), b"replaced")
+
+        with self.assertRaises(ValueError):
+            store.get("../a.part.bin")
+
+    def test_local_directory_blob_store(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._test_blob_store(LocalDirectoryBlobStore(tmpdir))
+
+    def test_http_blob_store(self):
+        server = http.server.HTTPServer(("127.0.0.1", 0), _StubBlobHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            self._test_blob_store(HttpBlobStore(f"http://127.0.0.1:{server.server_port}/parts/"))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+import unittest
+import uuid
+
+from ezocc.part_cache_gc import collect_garbage, parse_size
+from ezocc.part_cache_layout import ShardedCacheLayout, BuildManifest
+
+
+class TestCollectGarbage(unittest.TestCase):
+
+    def _write_part(self, layout: ShardedCacheLayout, size: int, age: float = 0) -> str:
+        part_uuid = str(uuid.uuid4())
+
+        with layout.write(part_uuid) as temp_path:
+            with open(temp_path + ShardedCacheLayout.PART_EXTENSION, "wb") as f:
+                f.write(b"x" * size)
+
+        modified = time.time() - age
+        os.utime(layout.part_path(part_uuid), (modified, modified))
+
+        return part_uuid
+
+    def test_unreferenced_parts_are_removed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            layout = ShardedCacheLayout(tmpdir)
+
+            referenced = self._write_part(layout, 10)
+            unreferenced = self._write_part(layout, 10)
+
+            BuildManifest.write(tmpdir, "example", {referenced})
+
+            report = collect_garbage(tmpdir, [layout], dry_run=True)
+            self.assertEqual([e.part_uuid for e in report.removed], [unreferenced])
+            self.assertTrue(layout.has(unreferenced))
+
+            collect_garbage(tmpdir, [layout])
+            self.assertFalse(os.path.exists(layout.part_path(unreferenced)))
+            self.assertTrue(os.path.exists(layout.part_path(referenced)))
+
+            self.assertEqual(ShardedCacheLayout(tmpdir).index.uuids(), {referenced})
+
+    def test_budgets(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            layout = ShardedCacheLayout(tmpdir)
+
+            oldest = self._write_part(layout, 100, age=300)
+            older = self._write_part(layout, 100, age=200)
+            newest = self._write_part(layout, 100, age=0)
+            referenced = self._write_part(layout, 100, age=1000)
+
+            BuildManifest.write(tmpdir, "example", {referenced})
+
+            report = collect_garbage(tmpdir, [layout], max_size=250, dry_run=True)
+            self.assertEqual([e.part_uuid for e in report.removed], [oldest, older])
+
+            report = collect_garbage(tmpdir, [layout], max_age=250, dry_run=True)
+            self.assertEqual([e.part_uuid for e in report.removed], [oldest])
+
+            report = collect_garbage(tmpdir, [layout], max_size=1000, max_age=1e6)
+            self.assertEqual(report.removed, [])
+            self.assertEqual({e.part_uuid for e in report.kept}, {oldest, older, newest, referenced})
+
+    def test_no_manifests(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            layout = ShardedCacheLayout(tmpdir)
+            self._write_part(layout, 10)
+
+            with self.assertRaises(ValueError):
+                collect_garbage(tmpdir, [layout])
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("10G"), 10 ** 10)
+        self.assertEqual(parse_size("1.5MB"), 1500000)
+        self.assertEqual(parse_size("123"), 123)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ezocc.part_cache import InMemoryPartCache, FileBasedPartCache, PartCacheBackend
+from ezocc.part_cache_instrumentation import PartCacheEventRecorder
+from ezocc.part_manager import PartFactory, PartCache
+
+
+class TestPartCacheInstrumentation(unittest.TestCase):
+
+    @staticmethod
+    def _ensure_box(cache: PartCache, *args):
+        token = cache.create_token(*args)
+        return cache.ensure_exists(token, lambda: PartFactory(cache).box(10, 10, 10).with_cache_token(token))
+
+    def test_in_memory_events(self):
+        cache = InMemoryPartCache()
+        recorder = PartCacheEventRecorder()
+        cache.set_instrumentation(recorder)
+
+        TestPartCacheInstrumentation._ensure_box(cache, "box_factory", "box")
+        TestPartCacheInstrumentation._ensure_box(cache, "box_factory", "box")
+
+        self.assertEqual([e.kind for e in recorder.events], ["miss", "build", "hit"])
+        self.assertTrue(all(e.label == "box_factory.box" for e in recorder.events))
+
+        summary = recorder.summary()
+        self.assertEqual(len(summary), 1)
+        self.assertEqual(summary[0]["hits"], 1)
+        self.assertEqual(summary[0]["builds"], 1)
+
+    def test_label_inferred_from_call_site(self):
+        cache = InMemoryPartCache()
+        cache.set_instrumentation(PartCacheEventRecorder())
+
+        token = cache.create_token(10, 20)
+        self.assertIn("test_label_inferred_from_call_site", token.label)
+
+        explicit = cache.create_token(10, 20, label="explicit")
+        self.assertEqual(explicit.label, "explicit")
+        self.assertEqual(explicit.compute_uuid(), token.compute_uuid())
+        self.assertEqual(explicit.mutated("fillet").label, "explicit")
+
+    def test_file_based_events_and_export(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            recorder = PartCacheEventRecorder()
+
+            cache = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)
+            cache.set_instrumentation(recorder)
+            TestPartCacheInstrumentation._ensure_box(cache, "box_factory").shape
+
+            reloaded_cache = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)
+            reloaded_cache.set_instrumentation(recorder)
+            TestPartCacheInstrumentation._ensure_box(reloaded_cache, "box_factory").shape
+
+            self.assertEqual([e.kind for e in recorder.events], ["miss", "build", "save", "load", "hit", "load"])
+            self.assertGreater(recorder.events[2].details["size"], 0)
+
+            trace_path = os.path.join(tmpdir, "trace.json")
+            recorder.write_chrome_trace(trace_path)
+
+            with open(trace_path) as f:
+                trace = json.load(f)
+
+            self.assertEqual(len(trace["traceEvents"]), 6)
+            self.assertTrue(all(e["ph"] == "X" for e in trace["traceEvents"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
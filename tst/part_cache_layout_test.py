@@ -0,0 +1,130 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+import uuid
+
+from ezocc.part_cache_layout import ShardedCacheLayout, CacheIndex
+
+
+class TestShardedCacheLayout(unittest.TestCase):
+
+    def _write_part(self, layout: ShardedCacheLayout, part_uuid: str):
+        # stands in for PartSave.ocaf, which appends the extension to the supplied path
+        with layout.write(part_uuid) as temp_path:
+            with open(temp_path + ShardedCacheLayout.PART_EXTENSION, "w") as f:
+                f.write("part")
+
+    def test_parts_are_sharded_and_indexed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            layout = ShardedCacheLayout(tmpdir)
+            part_uuid = str(uuid.uuid4())
+
+            self.assertFalse(layout.has(part_uuid))
+
+            self._write_part(layout, part_uuid)
+
+            self.assertTrue(layout.has(part_uuid))
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, part_uuid[:2], part_uuid + ".part.cbf")))
+            self.assertEqual([f for f in os.listdir(os.path.join(tmpdir, part_uuid[:2])) if f.startswith("tmp_")], [])
+
+            # a new layout over the same directory knows about the part from the index alone
+            self.assertIn(part_uuid, ShardedCacheLayout(tmpdir).index)
+
+    def test_failed_write_is_not_committed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            layout = ShardedCacheLayout(tmpdir)
+            part_uuid = str(uuid.uuid4())
+
+            with self.assertRaises(RuntimeError):
+                with layout.write(part_uuid) as temp_path:
+                    with open(temp_path + ShardedCacheLayout.PART_EXTENSION, "w") as f:
+                        f.write("partial")
+                    raise RuntimeError("failed")
+
+            self.assertFalse(layout.has(part_uuid))
+            self.assertEqual(os.listdir(os.path.join(tmpdir, part_uuid[:2])), [])
+
+    def test_warm_lookup_does_not_stat(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            part_uuid = str(uuid.uuid4())
+            self._write_part(ShardedCacheLayout(tmpdir), part_uuid)
+
+            layout = ShardedCacheLayout(tmpdir)
+
+            with unittest.mock.patch("ezocc.part_cache_layout.os.path.exists", wraps=os.path.exists) as exists:
+                self.assertTrue(layout.has(part_uuid))
+                exists.assert_not_called()
+
+    def test_removed_part_is_present_until_discarded(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            layout = ShardedCacheLayout(tmpdir)
+            part_uuid = str(uuid.uuid4())
+
+            self._write_part(layout, part_uuid)
+
+            # e.g. removed by garbage collection in another process, the index still lists the part until loading it
+            # fails and the caller discards it
+            os.remove(layout.part_path(part_uuid))
+            self.assertTrue(layout.has(part_uuid))
+
+            layout.discard(part_uuid)
+
+            self.assertFalse(layout.has(part_uuid))
+            self.assertNotIn(part_uuid, layout.index)
+
+    def test_lock_serializes_producers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            part_uuid = str(uuid.uuid4())
+            produced = []
+
+            def produce():
+                layout = ShardedCacheLayout(tmpdir)
+                with layout.lock(part_uuid):
+                    if not layout.has(part_uuid):
+                        time.sleep(0.05)
+                        self._write_part(layout, part_uuid)
+                        produced.append(True)
+
+            threads = [threading.Thread(target=produce) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertEqual(len(produced), 1)
+
+    def test_lock_is_reentrant(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            layout = ShardedCacheLayout(tmpdir)
+            part_uuid = str(uuid.uuid4())
+
+            with layout.lock(part_uuid):
+                with ShardedCacheLayout(tmpdir).lock(part_uuid):
+                    self._write_part(layout, part_uuid)
+
+                # still held by this thread, so other threads wait
+                acquired = []
+
+                def acquire():
+                    with layout.lock(part_uuid):
+                        acquired.append(True)
+
+                t = threading.Thread(target=acquire)
+                t.start()
+                t.join(0.1)
+                self.assertEqual(acquired, [])
+
+            t.join()
+            self.assertEqual(len(acquired), 1)
+
+    def test_index_rewrite(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            index = CacheIndex(tmpdir)
+            index.add("a")
+            index.add("b")
+            index.rewrite({"b"})
+
+            self.assertEqual(CacheIndex(tmpdir).uuids(), {"b"})
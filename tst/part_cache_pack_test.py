@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from ezocc.part_cache import FileBasedPartCache, PartCacheBackend
+from ezocc.part_cache_pack import PartPack, compact, verify, main
+from ezocc.part_manager import PartFactory
+
+
+class TestPartCachePack(unittest.TestCase):
+
+    def _populate(self, cache: FileBasedPartCache, names):
+        for name in names:
+            token = cache.create_token(name)
+            cache.ensure_exists(
+                token, lambda: PartFactory(cache).box(10, 10, 10, x_min_face_name="xmin").with_cache_token(token))
+
+    def test_compact_and_load_from_pack(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ocaf_directory = os.path.join(tmpdir, "ocaf")
+            binary_directory = os.path.join(tmpdir, "binary")
+            pack_path = os.path.join(tmpdir, "cache.pack")
+
+            self._populate(FileBasedPartCache(ocaf_directory), ["a", "b"])
+            self._populate(FileBasedPartCache(binary_directory, backend=PartCacheBackend.BINARY), ["c"])
+
+            self.assertEqual(compact(ocaf_directory, pack_path), 2)
+            self.assertEqual(compact(binary_directory, pack_path), 1)
+
+            # already packed parts are skipped
+            self.assertEqual(compact(ocaf_directory, pack_path), 0)
+
+            self.assertEqual(verify(pack_path), [])
+            self.assertEqual(main(["verify", pack_path]), 0)
+
+            with PartPack(pack_path) as pack:
+                self.assertEqual(len(pack), 3)
+
+            empty_directory = os.path.join(tmpdir, "empty")
+            cache = FileBasedPartCache(empty_directory, pack_paths=[pack_path])
+
+            for name in ["a", "b", "c"]:
+                token = cache.create_token(name)
+                part = cache.ensure_exists(token, lambda: self.fail("Part should be loaded from the pack"))
+
+                self.assertEqual(part.cache_token.compute_uuid(), token.compute_uuid())
+                self.assertEqual(len(part.sp("xmin").explore.face.get()), 1)
+
+    def test_compact_deduplicated_cache_in_batches(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_directory = os.path.join(tmpdir, "dedup")
+            pack_path = os.path.join(tmpdir, "cache.pack")
+
+            # identical boxes, so every part shares a single blob
+            self._populate(FileBasedPartCache(cache_directory, backend=PartCacheBackend.BINARY, deduplicate=True),
+                           ["a", "b", "c"])
+
+            # a batch per part
+            self.assertEqual(compact(cache_directory, pack_path, batch_bytes=1), 3)
+            self.assertEqual(verify(pack_path), [])
+
+            cache = FileBasedPartCache(os.path.join(tmpdir, "empty"), pack_paths=[pack_path])
+            for name in ["a", "b", "c"]:
+                token = cache.create_token(name)
+                part = cache.ensure_exists(token, lambda: self.fail("Part should be loaded from the pack"))
+
+                self.assertEqual(part.cache_token.compute_uuid(), token.compute_uuid())
+                self.assertEqual(len(part.sp("xmin").explore.face.get()), 1)
+
+    def test_invalid_pack(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "not_a.pack")
+            with open(path, "wb") as f:
+                f.write(b"0" * 64)
+
+            with self.assertRaises(ValueError):
+                PartPack(path)
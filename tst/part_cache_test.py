@@ -1,12 +1,18 @@
+import os
 import pdb
 import tempfile
+import threading
+import time
 import unittest
 import uuid
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import OCC.Core.TopoDS
 
-from ezocc.part_cache import DefaultCacheToken, InMemoryPartCache, FileBasedPartCache
+from ezocc.part_cache import DefaultCacheToken, InMemoryPartCache, FileBasedPartCache, PartCacheBackend, \
+    TieredPartCache
+from ezocc.part_cache_blob_store import LocalDirectoryBlobStore
+from ezocc.part_cache_eviction import BoundedPartStore, EvictionPolicy, PartCostEstimator
 from ezocc.part_manager import PartFactory, PartSave, CacheToken, PartCache, NoOpPartCache, Part, LazyLoadedPart
 
 import util_wrapper_swig
@@ -29,6 +35,357 @@ class TestInMemoryPartCache(unittest.TestCase):
             self._test_association_with_part(get_cache())
             self._test_duplication_avoided(get_cache())
 
+    def test_binary_file_based_part_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            get_cache = lambda: FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)
+            self._test_consistent(get_cache())
+            self._test_association_with_part(get_cache())
+            self._test_duplication_avoided(get_cache())
+
+    def test_deduplicating_file_based_part_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            get_cache = lambda: FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True)
+            self._test_consistent(get_cache())
+            self._test_association_with_part(get_cache())
+            self._test_duplication_avoided(get_cache())
+
+    def test_identical_parts_share_blob(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True)
+
+            def ensure_box(name: str) -> Part:
+                token = cache.create_token(name)
+                return cache.ensure_exists(token, lambda: PartFactory(cache).box(10, 10, 10).with_cache_token(token))
+
+            ensure_box("a")
+            ensure_box("b")
+
+            blobs = [f for _, _, files in os.walk(os.path.join(tmpdir, "blobs")) for f in files]
+            self.assertEqual(len(blobs), 1)
+
+            reloaded = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True)
+            token = reloaded.create_token("b")
+            part = reloaded.ensure_exists(token, lambda: self.fail("part should be loaded from the cache"))
+
+            self.assertEqual(part.cache_token.compute_uuid(), token.compute_uuid())
+            self.assertFalse(part.shape.IsNull())
+
+    def test_reordered_compounds_share_blob(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True)
+            factory = PartFactory(cache)
+
+            def ensure_compound(name: str, reverse: bool) -> Part:
+                token = cache.create_token(name)
+
+                def _make_part():
+                    parts = [factory.box(10, 10, 10), factory.sphere(5).tr.mv(dx=20)]
+                    if reverse:
+                        parts.reverse()
+
+                    return factory.compound(*parts).with_cache_token(token)
+
+                return cache.ensure_exists(token, _make_part)
+
+            ensure_compound("ab", False)
+            ensure_compound("ba", True)
+
+            blobs = [f for _, _, files in os.walk(os.path.join(tmpdir, "blobs")) for f in files]
+            self.assertEqual(len(blobs), 1)
+
+            reloaded = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True)
+            token = reloaded.create_token("ba")
+            part = reloaded.ensure_exists(token, lambda: self.fail("part should be loaded from the cache"))
+
+            self.assertEqual(len(part.explore.solid.get()), 2)
+
+    def test_deduplicated_garbage_collection_counts_blobs(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True)
+
+            def ensure_box(name: str, size: float) -> str:
+                token = cache.create_token(name)
+                cache.ensure_exists(token, lambda: PartFactory(cache).box(size, size, size).with_cache_token(token))
+                return token.compute_uuid()
+
+            # a and b share a blob, c has its own. Oldest first
+            part_uuids = [ensure_box("a", 10), ensure_box("b", 10), ensure_box("c", 20)]
+            for age, part_uuid in zip([300, 200, 100], part_uuids):
+                modified = time.time() - age
+                os.utime(os.path.join(tmpdir, part_uuid[:2], part_uuid + ".part.ref"), (modified, modified))
+
+            size_on_disk = sum(os.path.getsize(os.path.join(directory, f))
+                               for directory, _, files in os.walk(tmpdir)
+                               for f in files if f.endswith(".part.ref") or f.endswith(".blob"))
+
+            report = cache.collect_garbage(max_size=size_on_disk, dry_run=True)
+            self.assertEqual(report.removed, [])
+            self.assertEqual(report.kept_bytes, size_on_disk)
+
+            # removing a alone frees only its pointer file, b must be removed too for the shared blob to be freed
+            report = cache.collect_garbage(max_size=size_on_disk - 1)
+            self.assertEqual([e.part_uuid for e in report.removed], part_uuids[:2])
+            self.assertEqual(len(report.removed_blobs), 1)
+            self.assertEqual(report.kept_bytes + report.removed_bytes, size_on_disk)
+
+            blobs = [f for _, _, files in os.walk(os.path.join(tmpdir, "blobs")) for f in files]
+            self.assertEqual(len(blobs), 1)
+
+    def test_removed_blob_is_rebuilt(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            build_calls = []
+
+            def ensure_box(cache: PartCache) -> Part:
+                token = cache.create_token("box")
+
+                def _make_part():
+                    build_calls.append(True)
+                    return PartFactory(cache).box(10, 10, 10).with_cache_token(token)
+
+                return cache.ensure_exists(token, _make_part)
+
+            ensure_box(FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True))
+            self.assertEqual(len(build_calls), 1)
+
+            # the pointer file is still present, but the blob it refers to has been removed
+            for directory, _, files in os.walk(os.path.join(tmpdir, "blobs")):
+                for f in files:
+                    os.remove(os.path.join(directory, f))
+
+            part = ensure_box(FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True))
+
+            self.assertFalse(part.shape.IsNull())
+            self.assertEqual(len(build_calls), 2)
+
+            reloaded = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY, deduplicate=True)
+            self.assertFalse(ensure_box(reloaded).shape.IsNull())
+            self.assertEqual(len(build_calls), 2)
+
+    def test_removed_part_file_is_rebuilt(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            build_calls = []
+
+            def ensure_box(cache: PartCache) -> Part:
+                token = cache.create_token("box")
+
+                def _make_part():
+                    build_calls.append(True)
+                    return PartFactory(cache).box(10, 10, 10).with_cache_token(token)
+
+                return cache.ensure_exists(token, _make_part)
+
+            part_uuid = ensure_box(FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)).cache_token.compute_uuid()
+            self.assertEqual(len(build_calls), 1)
+
+            # found in the cache directory, but removed (e.g. by another process) before it is loaded
+            cache = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)
+            part = ensure_box(cache)
+            self.assertEqual(len(build_calls), 1)
+
+            part_path = os.path.join(tmpdir, part_uuid[:2], part_uuid + PartSave.BINARY_EXTENSION)
+            os.remove(part_path)
+
+            self.assertFalse(part.shape.IsNull())
+            self.assertEqual(len(build_calls), 2)
+            self.assertIsNotNone(cache.read_part_file(part_uuid))
+
+            # removed before it is requested
+            os.remove(part_path)
+            self.assertFalse(ensure_box(FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)).shape.IsNull())
+            self.assertEqual(len(build_calls), 3)
+
+    def test_warm_lookup_does_not_stat(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def ensure_box(cache: PartCache) -> Part:
+                token = cache.create_token("box")
+                return cache.ensure_exists(token, lambda: PartFactory(cache).box(10, 10, 10).with_cache_token(token))
+
+            ensure_box(FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY))
+
+            # the part is found in the index read by the new cache, without touching its file until it is loaded
+            cache = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)
+            with patch("ezocc.part_cache_layout.os.path.exists", wraps=os.path.exists) as layout_exists, \
+                    patch("ezocc.part_cache.os.path.exists", wraps=os.path.exists) as cache_exists:
+                part = ensure_box(cache)
+
+                layout_exists.assert_not_called()
+                cache_exists.assert_not_called()
+
+            self.assertFalse(part.shape.IsNull())
+
+    def test_prefetch_manifest(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def ensure_box(cache: PartCache, name: str) -> Part:
+                token = cache.create_token(name)
+                return cache.ensure_exists(token, lambda: PartFactory(cache).box(10, 10, 10).with_cache_token(token))
+
+            cache = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)
+            for name in ["a", "b", "c"]:
+                ensure_box(cache, name)
+
+            cache.write_manifest("boxes")
+
+            reloaded = FileBasedPartCache(tmpdir, backend=PartCacheBackend.BINARY)
+            futures = reloaded.prefetch_manifest("boxes")
+            self.assertEqual(len(futures), 3)
+
+            for f in futures:
+                f.result()
+
+            part = reloaded.ensure_exists(reloaded.create_token("b"), lambda: self.fail("part should be prefetched"))
+            self.assertIsInstance(part, LazyLoadedPart)
+            self.assertTrue(part.is_loaded)
+
+            # already loaded parts are not prefetched again
+            self.assertEqual(reloaded.prefetch_manifest("boxes"), [])
+            self.assertEqual(reloaded.prefetch_manifest("unknown"), [])
+
+    def test_tiered_part_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            get_cache = lambda: TieredPartCache(
+                InMemoryPartCache(),
+                FileBasedPartCache(tmpdir + "/local", backend=PartCacheBackend.BINARY),
+                LocalDirectoryBlobStore(tmpdir + "/remote"))
+
+            self._test_consistent(get_cache())
+            self._test_association_with_part(get_cache())
+            self._test_duplication_avoided(get_cache())
+
+    def test_tiered_part_cache_shares_through_remote(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            remote = LocalDirectoryBlobStore(tmpdir + "/remote")
+
+            builder = TieredPartCache(file=FileBasedPartCache(tmpdir + "/a", backend=PartCacheBackend.BINARY),
+                                      remote=remote)
+            consumer_file = FileBasedPartCache(tmpdir + "/b", backend=PartCacheBackend.BINARY)
+            consumer = TieredPartCache(file=consumer_file, remote=remote)
+
+            build_calls = []
+
+            def ensure_box(cache: PartCache):
+                token = cache.create_token("shared box")
+
+                def _make_part():
+                    build_calls.append(cache)
+                    return PartFactory(cache).box(10, 10, 10).with_cache_token(token)
+
+                return cache.ensure_exists(token, _make_part)
+
+            ensure_box(builder)
+            part = ensure_box(consumer)
+
+            self.assertEqual(build_calls, [builder])
+
+            # the part was promoted to the consumer's file tier, and its token refers to the tiered cache
+            self.assertIsNotNone(consumer_file.read_part_file(part.cache_token.compute_uuid()))
+            self.assertIs(part.cache_token.get_cache(), consumer)
+            self.assertIs(ensure_box(consumer), part)
+
+    def test_tiered_part_cache_builds_once(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            remote = LocalDirectoryBlobStore(tmpdir + "/remote")
+            build_calls = []
+
+            def ensure_box():
+                # each builder has its own tiers, as separate processes would, sharing the file tier's directory
+                cache = TieredPartCache(file=FileBasedPartCache(tmpdir + "/local", backend=PartCacheBackend.BINARY),
+                                        remote=remote)
+                token = cache.create_token("shared box")
+
+                def _make_part():
+                    build_calls.append(True)
+                    time.sleep(0.05)
+                    return PartFactory(cache).box(10, 10, 10).with_cache_token(token)
+
+                cache.ensure_exists(token, _make_part)
+
+            threads = [threading.Thread(target=ensure_box) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertEqual(len(build_calls), 1)
+
+    def test_bounded_in_memory_part_cache(self):
+        box_cost = PartCostEstimator.estimate(PartFactory(NoOpPartCache.instance()).box(10, 10, 10))
+        cache = InMemoryPartCache(max_cost=box_cost * 2)
+
+        def ensure_box(name: str):
+            token = cache.create_token(name)
+            return cache.ensure_exists(token, lambda: PartFactory(cache).box(10, 10, 10).with_cache_token(token))
+
+        ensure_box("a")
+        ensure_box("b")
+        ensure_box("a")
+        ensure_box("c")
+
+        self.assertEqual(cache.statistics.misses, 3)
+        self.assertEqual(cache.statistics.hits, 1)
+        self.assertEqual(cache.statistics.evictions, 1)
+        self.assertEqual(cache.statistics.entries, 2)
+
+        # "b" was the least recently used, so was evicted
+        ensure_box("b")
+        self.assertEqual(cache.statistics.misses, 4)
+
+    def test_bounded_part_store_policies(self):
+        factory = PartFactory(NoOpPartCache.instance())
+        parts = {n: factory.box(1, 1, 1) for n in "abc"}
+
+        lru = BoundedPartStore(max_cost=2, policy=EvictionPolicy.LRU, cost_estimator=lambda p: 1)
+        lfu = BoundedPartStore(max_cost=2, policy=EvictionPolicy.LFU, cost_estimator=lambda p: 1)
+
+        for store in [lru, lfu]:
+            store.put("a", parts["a"])
+            store.put("b", parts["b"])
+            store.get("a")
+            store.get("a")
+            store.get("b")
+            store.put("c", parts["c"])
+
+        self.assertEqual({"b", "c"}, {k for k in "abc" if k in lru})
+        self.assertEqual({"a", "c"}, {k for k in "abc" if k in lfu})
+        self.assertEqual(lru.statistics.evictions, 1)
+        self.assertEqual(lru.statistics.estimated_cost, 2)
+
+    def test_lazy_part_is_estimated_once_loaded(self):
+        factory = PartFactory(NoOpPartCache.instance())
+        box_cost = PartCostEstimator.estimate(factory.box(1, 1, 1))
+
+        store = BoundedPartStore(max_cost=box_cost + PartCostEstimator.UNLOADED_PART_COST)
+
+        store.put("a", factory.box(1, 1, 1))
+
+        lazy = LazyLoadedPart(factory.box(1, 1, 1).cache_token, lambda: factory.box(1, 1, 1))
+        store.put("b", lazy)
+        self.assertEqual(store.statistics.evictions, 0)
+
+        # loaded through attribute access rather than through the store
+        self.assertFalse(lazy.shape.IsNull())
+
+        self.assertEqual(store.statistics.evictions, 1)
+        self.assertNotIn("a", store)
+        self.assertEqual(store.cost("b"), box_cost)
+        self.assertEqual(store.statistics.estimated_cost, box_cost)
+
+    def test_unbounded_part_store_does_not_estimate(self):
+        estimated = []
+
+        def _estimate(p: Part) -> int:
+            estimated.append(p)
+            return 1
+
+        store = BoundedPartStore(cost_estimator=_estimate)
+        store.put("a", PartFactory(NoOpPartCache.instance()).box(1, 1, 1))
+        store.get("a")
+
+        self.assertEqual(estimated, [])
+        self.assertEqual(store.statistics.estimated_cost, 0)
+
+        # estimated on request
+        self.assertEqual(store.cost("a"), 1)
+
     def _test_duplication_avoided(self, cache: PartCache):
 
         token = cache.create_token("custom expensive operation")
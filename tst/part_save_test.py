@@ -2,6 +2,13 @@ import pdb
 import tempfile
 import unittest
 
+import OCC.Core.IFSelect
+import OCC.Core.Interface
+import OCC.Core.STEPControl
+import OCC.Core.TopAbs
+import OCC.Core.TopExp
+import OCC.Core.gp
+
 from ezocc.part_cache import InMemoryPartCache
 from ezocc.part_manager import NoOpPartCache, PartFactory, PartSave
 
@@ -31,3 +38,57 @@ class TestPartSave(unittest.TestCase):
 
         self.assertEqual(box.annotation("foo"), "bar")
         self.assertEqual(box.sp("xmin").annotation("baz"), "qux")
+
+    def test_save_and_load_binary(self):
+        box = PartFactory(InMemoryPartCache()).box(10, 10, 10, x_min_face_name="xmin").annotate("foo", "bar")
+        box = box.annotate_subshape("xmin", ("baz", "qux"))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = tmpdir + "/box"
+
+            box.save.binary(filename)
+
+            loaded = PartSave.load_binary(filename, InMemoryPartCache())
+
+        self.assertEqual(box.cache_token.compute_uuid(), loaded.cache_token.compute_uuid())
+        self.assertEqual(
+            util_wrapper_swig.UtilWrapper.shape_to_string(box.shape),
+            util_wrapper_swig.UtilWrapper.shape_to_string(loaded.shape))
+
+        self.assertEqual(box.annotations, loaded.annotations)
+        self.assertEqual(box.sp("xmin").annotations, loaded.sp("xmin").annotations)
+        self.assertEqual(box.sp("xmin").shape.Orientation(), loaded.sp("xmin").shape.Orientation())
+
+        # labelled subshapes refer to the topology of the loaded root shape, rather than a copy of it
+        self.assertTrue(loaded.inspect.contains(loaded.sp("xmin")))
+
+    def test_save_step_assembly_round_trip(self):
+        box = PartFactory(NoOpPartCache.instance()).box(10, 10, 10)
+        pattern = box.instanced_pattern(range(0, 3), lambda i, t: t.SetTranslation(OCC.Core.gp.gp_Vec(20 * i, 0, 0)))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pattern.save.step(tmpdir + "/pattern", assembly=True)
+
+            reader = OCC.Core.STEPControl.STEPControl_Reader()
+            self.assertEqual(reader.ReadFile(tmpdir + "/pattern.step"), OCC.Core.IFSelect.IFSelect_RetDone)
+
+        reader.TransferRoots()
+
+        solids = 0
+        explorer = OCC.Core.TopExp.TopExp_Explorer(reader.OneShape(), OCC.Core.TopAbs.TopAbs_SOLID)
+        while explorer.More():
+            solids += 1
+            explorer.Next()
+
+        self.assertEqual(solids, 3)
+
+    def test_save_step_assembly_restores_setting(self):
+        previous = OCC.Core.Interface.Interface_Static.CVal("write.step.assembly")
+
+        box = PartFactory(NoOpPartCache.instance()).box(10, 10, 10)
+        pattern = box.instanced_pattern(range(0, 2), lambda i, t: t.SetTranslation(OCC.Core.gp.gp_Vec(20 * i, 0, 0)))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pattern.save.step(tmpdir + "/pattern", assembly=True)
+
+        self.assertEqual(OCC.Core.Interface.Interface_Static.CVal("write.step.assembly"), previous)
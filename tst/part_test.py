@@ -1,6 +1,7 @@
 import math
 import pdb
 import unittest
+import unittest.mock
 
 import OCC
 import OCC.Core.BOPAlgo
@@ -22,7 +23,8 @@ from OCC.Core.gp import gp_Vec
 
 import ezocc.occutils_python as op
 from ezocc.part_cache import InMemoryPartCache
-from ezocc.part_manager import Part, PartFactory, NoOpPartCache, CacheToken, NoOpCacheToken
+from ezocc.part_manager import Part, PartFactory, NoOpPartCache, CacheToken, NoOpCacheToken, DeferredTransformPart, \
+    PartTransformer
 
 from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_EDGE
 
@@ -146,6 +148,131 @@ class TestPart(unittest.TestCase):
         self.assertEqual(p0_extents.xyz_mid, [0.5, 0.5, 0.5])
         self.assertEqual(p1_extents.xyz_mid, [1.5, 0.5, 0.5])
 
+    def test_rigid_transform_shares_geometry(self):
+        p0 = PartFactory(self._part_cache).box(1, 2, 3, x_max_face_name="xmax")
+
+        p1 = p0.tr.located.rz(math.radians(90)).tr.located.mv(dz=1)
+        self.assertTrue(p1.shape.IsPartner(p0.shape))
+        self.assertTrue(p1.sp("xmax").shape.IsPartner(p0.sp("xmax").shape))
+
+        p1_extents = p1.sp("xmax").extents
+        self.assertAlmostEqual(p1_extents.y_mid, 1)
+        self.assertAlmostEqual(p1_extents.z_mid, 2.5)
+
+        # transformations copy unless a location is requested
+        copied = p0.tr.rz(math.radians(90)).tr.mv(dz=1)
+        self.assertFalse(copied.shape.IsPartner(p0.shape))
+        self.assertAlmostEqual(copied.extents.x_min, p1.extents.x_min)
+        self.assertNotEqual(copied.cache_token.compute_uuid(), p1.cache_token.compute_uuid())
+
+        # scaling cannot be applied as a location, so copies
+        self.assertFalse(p0.tr.located.scale(2).shape.IsPartner(p0.shape))
+
+    def test_deferred_transforms(self):
+        p0 = PartFactory(self._part_cache).box(1, 2, 3)
+
+        deferred = p0.defer_transforms().tr.mv(dx=1).tr.mv(dy=2).align().stack_z1(p0)
+        self.assertIsInstance(deferred, DeferredTransformPart)
+
+        # the extents of a translation are computed without creating the transformed part
+        self.assertAlmostEqual(deferred.xts.z_min, 3)
+        self.assertFalse(deferred.is_loaded)
+
+        eager = p0.tr.mv(dx=1).tr.mv(dy=2).align().stack_z1(p0)
+        for actual, expected in zip(op.Extents(deferred.shape).xyz_min, eager.xts.xyz_min):
+            self.assertAlmostEqual(actual, expected)
+
+        self.assertTrue(deferred.is_loaded)
+
+        rotated = p0.defer_transforms().tr.rz(math.radians(90)).tr.mv(dz=1)
+        self.assertAlmostEqual(rotated.xts.x_min, -2)
+        self.assertAlmostEqual(rotated.xts.z_min, 1)
+
+        self.assertEqual(p0.defer_transforms().tr.mv(dx=1).cache_token.compute_uuid(),
+                         p0.tr.mv(dx=1).cache_token.compute_uuid())
+
+        self.assertTrue(p0.defer_transforms().tr.located.rz(1).tr.located.mv(dx=1).shape.IsPartner(p0.shape))
+        self.assertFalse(p0.defer_transforms().tr.located.rz(1).tr.mv(dx=1).shape.IsPartner(p0.shape))
+
+    def test_deferred_rotation_is_applied_once(self):
+        p0 = PartFactory(self._part_cache).box(1, 2, 3)
+
+        with unittest.mock.patch.object(PartTransformer, "__call__", autospec=True,
+                                        side_effect=PartTransformer.__call__) as transform:
+            deferred = p0.defer_transforms().tr.rz(math.radians(90)).tr.mv(dz=1).align().stack_z1(p0)
+
+            # aligning needs the extents of the rotated part, which are computed without creating it
+            self.assertFalse(deferred.is_loaded)
+            self.assertAlmostEqual(deferred.xts.z_min, 3)
+
+            shape = deferred.shape
+
+        # calls on a DeferredTransformPart only compose the transformation
+        applied = [c for c in transform.call_args_list if not isinstance(c.args[0]._part, DeferredTransformPart)]
+        self.assertEqual(len(applied), 1)
+
+        eager = p0.tr.rz(math.radians(90)).tr.mv(dz=1).align().stack_z1(p0)
+        for actual, expected in zip(op.Extents(shape).xyz_min, eager.xts.xyz_min):
+            self.assertAlmostEqual(actual, expected)
+
+    def test_extents_propagation(self):
+        p0 = PartFactory(self._part_cache).box(1, 2, 3)
+        p0_extents = p0.extents
+
+        translated = p0.tr.mv(dx=5)
+        self.assertEqual(translated.xts.xyz_min, [5, 0, 0])
+
+        rotated = p0.tr.rz(math.radians(45))
+        self.assertLessEqual(rotated.xts_fast.x_min, rotated.xts.x_min)
+        self.assertGreaterEqual(rotated.xts_fast.y_max, rotated.xts.y_max)
+
+        compound = p0.add(translated)
+        self.assertEqual(compound.xts.xyz_min, p0_extents.xyz_min)
+        self.assertEqual(compound.xts.xyz_max, [6, 2, 3])
+
+        for actual, expected in zip(p0.align(fast=True).stack_z1(translated).xts.xyz_min, [0, 0, 3]):
+            self.assertAlmostEqual(actual, expected, places=5)
+
+    def test_instanced_pattern(self):
+        p0 = PartFactory(self._part_cache).box(1, 2, 3, x_max_face_name="xmax")
+
+        pattern = p0.instanced_pattern(range(0, 3), lambda i, t: t.SetTranslation(gp_Vec(10 * i, 0, 0)), prefix="box_")
+
+        solids = pattern.explore.solid.get()
+        self.assertEqual(len(solids), 3)
+        self.assertTrue(all(s.shape.IsPartner(p0.shape) for s in solids))
+
+        self.assertAlmostEqual(pattern.sp("box_2").xts.x_min, 20)
+        self.assertAlmostEqual(pattern.sp("box_2/xmax").xts.x_mid, 21)
+
+        expected = p0.pattern(range(0, 3), lambda i, p: p.tr.mv(dx=10 * i))
+        self.assertEqual(pattern.xts.xyz_min, expected.xts.xyz_min)
+        self.assertEqual(pattern.xts.xyz_max, expected.xts.xyz_max)
+
+        with self.assertRaises(ValueError):
+            p0.instanced_pattern(range(0, 3), lambda i, t: t.SetScale(gp.gp_Pnt(0, 0, 0), i + 1))
+
+    def test_pick(self):
+        part = PartFactory(self._part_cache).box(1, 2, 3, z_min_face_name="bottom")
+
+        pick = part.pick.from_dir(0, 0, 1)
+        self.assertEqual(len(pick.hits), 2)
+        self.assertAlmostEqual(pick.hits[1].parameter - pick.hits[0].parameter, 3)
+        self.assertAlmostEqual(pick.first().xts.z_mid, 0)
+
+        self.assertTrue(pick.first_face().shape.IsSame(part.sp("bottom").shape))
+
+        # the ray passes through the middle of the faces, so meets no edges
+        with self.assertRaises(ValueError):
+            pick.first_edge()
+
+        edge = part.pick.dir((0.5, -1, 0), (0, 1, 0)).first_edge()
+        self.assertAlmostEqual(edge.xts.x_span, 1)
+        self.assertAlmostEqual(edge.xts.y_mid, 0)
+
+        self.assertEqual(len(part.spatial_index.near((0, 0, 0), 0.1, TopAbs_FACE)), 3)
+        self.assertEqual(len(part.spatial_index.near((0, 0, 0), 0.1, TopAbs_EDGE)), 3)
+
     def test_create_part_with_named_subpart(self):
         mkbox = OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(10, 2, 3)
 
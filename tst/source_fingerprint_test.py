@@ -0,0 +1,46 @@
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+
+from ezocc.source_fingerprint import SourceFingerprints
+
+
+class TestSourceFingerprints(unittest.TestCase):
+
+    def setUp(self) -> None:
+        SourceFingerprints.clear()
+
+    def test_fingerprint_is_stable(self):
+        self.assertEqual(SourceFingerprints.of(SourceFingerprints), SourceFingerprints.of(SourceFingerprints))
+        self.assertNotEqual(SourceFingerprints.of(SourceFingerprints), SourceFingerprints.of(SourceFingerprints.of))
+
+    def test_lambdas_share_fingerprint(self):
+        fingerprints = [SourceFingerprints.of(lambda x: x + 1) for _ in range(2)]
+
+        self.assertEqual(fingerprints[0], fingerprints[1])
+
+    def test_modified_source_is_refingerprinted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            module_path = os.path.join(directory, "fingerprinted_module.py")
+
+            with open(module_path, "w") as f:
+                f.write("def fn():\n    return 1\n")
+
+            sys.path.insert(0, directory)
+            try:
+                module = importlib.import_module("fingerprinted_module")
+                original = SourceFingerprints.of(module.fn)
+
+                with open(module_path, "w") as f:
+                    f.write("def fn():\n    return 2\n")
+
+                # ensure the mtime changes, even on filesystems with coarse timestamps
+                stat = os.stat(module_path)
+                os.utime(module_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+                self.assertNotEqual(SourceFingerprints.of(module.fn), original)
+            finally:
+                sys.path.remove(directory)
+                sys.modules.pop("fingerprinted_module", None)
@@ -13,6 +13,7 @@ import OCC.Core.BRepOffsetAPI
 import OCC.Core.BRepPrimAPI
 import OCC.Core.GeomAbs
 import OCC.Core.ShapeUpgrade
+import OCC.Core.TopLoc
 import OCC.Core.TopOpeBRepBuild
 import OCC.Core.TopoDS
 import OCC.Core.gp
@@ -120,3 +121,147 @@ class TestSubshapeMap(unittest.TestCase):
 
         self.assertTrue(map.contains_shape(AnnotatedShape(v0)))
         self.assertTrue(map.contains_shape(AnnotatedShape(v1)))
+
+    def test_clone_is_copy_on_write(self):
+        comp = OCC.Core.TopoDS.TopoDS_Compound()
+        builder = OCC.Core.BRep.BRep_Builder()
+        builder.MakeCompound(comp)
+
+        v0 = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeVertex(gp_Pnt(0, 0, 0)).Shape()
+        v1 = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeVertex(gp_Pnt(1, 0, 0)).Shape()
+
+        builder.Add(comp, v0)
+        builder.Add(comp, v1)
+
+        map = SubshapeMap.from_unattributed_shapes(comp, {"v0": {v0}})
+
+        map_modified = map.clone()
+        map_modified.place("v0", AnnotatedShape(v1))
+        map_modified.place("v1", AnnotatedShape(v1))
+        map_modified.rename("v1", "v1-renamed")
+
+        self.assertEqual(len(map.get("v0")), 1)
+        self.assertEqual(set(map.keys()), {"v0"})
+
+        self.assertEqual(len(map_modified.get("v0")), 2)
+        self.assertEqual(set(map_modified.keys()), {"v0", "v1-renamed"})
+
+        map_modified.remove(AnnotatedShape(v0))
+
+        self.assertTrue(map.contains_shape(AnnotatedShape(v0)))
+        self.assertFalse(map_modified.get("v0").__contains__(AnnotatedShape(v0)))
+
+    def test_pruned_removes_orphans(self):
+        comp = OCC.Core.TopoDS.TopoDS_Compound()
+        builder = OCC.Core.BRep.BRep_Builder()
+        builder.MakeCompound(comp)
+
+        v0 = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeVertex(gp_Pnt(0, 0, 0)).Shape()
+        orphan = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeVertex(gp_Pnt(1, 0, 0)).Shape()
+
+        builder.Add(comp, v0)
+
+        map = SubshapeMap.from_unattributed_shapes(comp, {
+            "v0": {v0},
+            "orphan": {orphan}
+        })
+
+        pruned = map.pruned()
+
+        self.assertTrue(pruned.contains_shape(AnnotatedShape(v0)))
+        self.assertFalse(pruned.contains_shape(AnnotatedShape(orphan)))
+        self.assertEqual(set(pruned.keys()), {"v0"})
+
+        # the source map is unaffected
+        self.assertTrue(map.contains_shape(AnnotatedShape(orphan)))
+
+    def test_shape_index(self):
+        comp = OCC.Core.TopoDS.TopoDS_Compound()
+        builder = OCC.Core.BRep.BRep_Builder()
+        builder.MakeCompound(comp)
+
+        v0 = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeVertex(gp_Pnt(0, 0, 0)).Shape()
+        v1 = OCC.Core.BRepBuilderAPI.BRepBuilderAPI_MakeVertex(gp_Pnt(1, 0, 0)).Shape()
+
+        builder.Add(comp, v0)
+        builder.Add(comp, v1)
+
+        map = SubshapeMap.from_unattributed_shapes(comp, {"a": {v0}, "b": {v0, v1}})
+
+        self.assertEqual(map.name_for_shape(AnnotatedShape(v0)), "a")
+        self.assertEqual(map.name_for_shape(AnnotatedShape(v1)), "b")
+        self.assertEqual(map.find_annotated_shapes(op.SetPlaceableShape(v1)), {AnnotatedShape(v1)})
+
+        with self.assertRaises(ValueError):
+            map.place("c", AnnotatedShape(v1, {"foo": "bar"}))
+
+        # annotating a shape updates it under every name, so the map remains unambiguous
+        map.annotate_subshape("a", "foo", "bar")
+
+        self.assertEqual(map.get("a"), {AnnotatedShape(v0, {"foo": "bar"})})
+        self.assertIn(AnnotatedShape(v0, {"foo": "bar"}), map.get("b"))
+
+        map.remove(AnnotatedShape(v0, {"foo": "bar"}))
+
+        self.assertFalse(map.contains_shape(op.SetPlaceableShape(v0)))
+        self.assertTrue(map.contains_shape(op.SetPlaceableShape(v1)))
+
+    def test_all_subshapes_set_deduplicates_shared_subshapes(self):
+        box = OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(1, 1, 1).Shape()
+
+        subshapes = op.InterrogateUtils.all_subshapes_set(box)
+        traversed = {op.SetPlaceableShape(s) for s in op.InterrogateUtils.traverse_all_subshapes(box)}
+        traversed.add(op.SetPlaceableShape(box))
+
+        # solid, shell, 6 faces, 6 wires, 12 edges, 8 vertices
+        self.assertEqual(len(subshapes), 34)
+        self.assertEqual(subshapes, traversed)
+
+    def test_set_placeable_shape_of_many(self):
+        box = OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(1, 1, 1).Shape()
+        faces = op.Explorer.face_explorer(box).get()
+
+        batched = op.SetPlaceableShape.of_many(faces)
+
+        self.assertEqual(batched, [op.SetPlaceableShape(f) for f in faces])
+        self.assertEqual([hash(s) for s in batched], [hash(op.SetPlaceableShape(f)) for f in faces])
+        self.assertEqual(op.SetPlaceableShape.of_many([]), [])
+
+    def test_lazy_entries_loaded_once_on_first_access(self):
+        box = OCC.Core.BRepPrimAPI.BRepPrimAPI_MakeBox(1, 1, 1).Shape()
+        face = op.Explorer.face_explorer(box).get()[0]
+
+        load_count = [0]
+
+        def loader():
+            load_count[0] += 1
+            return {"face": [AnnotatedShape(face)]}
+
+        map = SubshapeMap.lazy(AnnotatedShape(box), loader, is_pruned=True)
+        copy = map.pruned().clone()
+
+        self.assertEqual(load_count[0], 0)
+        self.assertEqual(copy.root_shape, AnnotatedShape(box))
+        self.assertEqual(load_count[0], 0)
+
+        self.assertEqual(copy.get_single("face"), AnnotatedShape(face))
+        self.assertEqual(map.get_single("face"), AnnotatedShape(face))
+        self.assertEqual(load_count[0], 1)
+
+    def test_moved(self):
+        box = self._part_factory.box(10, 10, 10, x_max_face_name="xmax")\
+            .annotate_subshape("xmax", ("color", "white"))
+
+        trsf = gp.gp_Trsf()
+        trsf.SetTranslation(gp_Vec(5, 0, 0))
+        moved = box.subshapes.moved(OCC.Core.TopLoc.TopLoc_Location(trsf))
+
+        moved_face = moved.get_single("xmax")
+        self.assertEqual(moved_face.attributes["color"], "white")
+        self.assertTrue(moved_face.shape.IsPartner(box.sp("xmax").shape))
+        self.assertFalse(moved_face.shape.IsSame(box.sp("xmax").shape))
+
+        # the moved face is a subshape of the moved root shape
+        self.assertIn(moved_face.set_placeable_shape,
+                      op.InterrogateUtils.all_subshapes_set(moved.root_shape.shape))
+        self.assertAlmostEqual(op.Extents(moved_face.shape).x_mid, 15)